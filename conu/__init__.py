@@ -7,39 +7,76 @@
 """
 TODO: add docs here, so `help(conu)` looks good
 """
-# docker backend
-from conu.backend.docker.backend import DockerBackend
-from conu.backend.docker.container import (
-    DockerContainer, DockerRunBuilder, DockerContainerViaExportFS
-)
-from conu.backend.docker.image import (
-    DockerImage, S2IDockerImage, DockerImagePullPolicy, DockerImageViaArchiveFS
-)
-
-# podman backend
-from conu.backend.podman.backend import PodmanBackend
-from conu.backend.podman.container import PodmanContainer, PodmanRunBuilder
-from conu.backend.podman.image import PodmanImage, PodmanImagePullPolicy
-
-# k8s backend
-from conu.backend.k8s.backend import K8sBackend, K8sCleanupPolicy
+import importlib
 
-# OpenShift
-from conu.backend.origin.backend import OpenshiftBackend
-
-# utils
-from conu.utils.filesystem import Directory
-from conu.utils.probes import Probe, ProbeTimeout, CountExceeded
-from conu.utils import run_cmd, check_port, get_selinux_status, random_str
+# light-weight modules without third-party dependencies are imported right away
+from conu.utils.probes import (
+    Probe, ProbeGroup, ProbeMode, ProbeTimeout, CountExceeded,
+    ExponentialBackoff, DecorrelatedJitter, FastStart
+)
+from conu.utils import run_cmd, check_port, wait_for_ports, get_selinux_status, random_str
 
 # exceptions
 from conu.exceptions import ConuException
 
 from conu.version import __version__ as version  # `conu.version == "3.1.4"` should work as well
 
-# enumerations
-from conu.apidefs.backend import CleanupPolicy
-
 # PEP-396
 # https://www.python.org/dev/peps/pep-0396/
 __version__ = version
+
+# backends pull in docker, kubernetes, requests and yaml: they are imported on first access
+# of the attribute (PEP-562), so e.g. `from conu import PodmanBackend` doesn't load
+# the kubernetes client
+_LAZY_ATTRIBUTES = {
+    # docker backend
+    "DockerBackend": "conu.backend.docker.backend",
+    "DockerContainer": "conu.backend.docker.container",
+    "DockerRunBuilder": "conu.backend.docker.run_builder",
+    "DockerContainerViaExportFS": "conu.backend.docker.container",
+    "DockerImage": "conu.backend.docker.image",
+    "S2IDockerImage": "conu.backend.docker.image",
+    "DockerImagePullPolicy": "conu.backend.docker.image",
+    "DockerImageViaArchiveFS": "conu.backend.docker.image",
+    # podman backend
+    "PodmanBackend": "conu.backend.podman.backend",
+    "PodmanContainer": "conu.backend.podman.container",
+    "PodmanRunBuilder": "conu.backend.podman.container",
+    "PodmanImage": "conu.backend.podman.image",
+    "PodmanImagePullPolicy": "conu.backend.podman.image",
+    # k8s backend
+    "K8sBackend": "conu.backend.k8s.backend",
+    "K8sCleanupPolicy": "conu.backend.k8s.backend",
+    # OpenShift
+    "OpenshiftBackend": "conu.backend.origin.backend",
+    # helpers
+    "ContainerPool": "conu.helpers.container_pool",
+    "ContainerResetPolicy": "conu.helpers.container_pool",
+    # utils
+    "Directory": "conu.utils.filesystem",
+    "configure_http_session": "conu.utils.http_client",
+    # enumerations
+    "CleanupPolicy": "conu.apidefs.backend",
+}
+
+__all__ = [
+    "Probe", "ProbeGroup", "ProbeMode", "ProbeTimeout", "CountExceeded",
+    "ExponentialBackoff", "DecorrelatedJitter", "FastStart",
+    "run_cmd", "check_port", "wait_for_ports", "get_selinux_status", "random_str",
+    "ConuException", "version", "__version__",
+] + sorted(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    try:
+        module_name = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module(module_name), name)
+    # cache it, __getattr__ is not called for this name again
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -15,7 +15,7 @@ import enum
 
 from conu.apidefs.container import Container
 from conu.apidefs.image import Image
-from conu import version
+from conu.version import __version__ as conu_version
 from conu.utils import mkdtemp
 from conu.exceptions import ConuException
 
@@ -111,7 +111,7 @@ class Backend(object):
         logging_kwargs = logging_kwargs or {}
         self.logger = set_logging(level=self.logging_level, **logging_kwargs)
         self.logger.info("conu has initiated, welcome to the party!")
-        self.logger.debug("conu version: %s", version.__version__)
+        self.logger.debug("conu version: %s", conu_version)
 
         self.cleanup = cleanup or [CleanupPolicy.NOTHING]
 
@@ -134,6 +134,68 @@ class Backend(object):
         """
         raise NotImplementedError("list_images method is not implemented")
 
+    def iter_containers(self):
+        """
+        iterate over available containers for this backend, backends which can create
+        the container objects lazily override this method
+
+        :return: iterator of instances of :class:`conu.apidefs.container.Container`
+        """
+        return iter(self.list_containers())
+
+    def iter_images(self):
+        """
+        iterate over available images for this backend, backends which can create
+        the image objects lazily override this method
+
+        :return: iterator of instances of :class:`conu.apidefs.image.Image`
+        """
+        return iter(self.list_images())
+
+    def inspect_containers(self, container_ids):
+        """
+        inspect multiple containers at once, this is more efficient than inspecting them
+        one by one
+
+        :param container_ids: list of str
+        :return: list of instances of :class:`conu.apidefs.metadata.ContainerMetadata`,
+                 in the order of container_ids
+        """
+        raise NotImplementedError("inspect_containers method is not implemented")
+
+    def inspect_images(self, image_ids):
+        """
+        inspect multiple images at once, this is more efficient than inspecting them
+        one by one
+
+        :param image_ids: list of str
+        :return: list of instances of :class:`conu.apidefs.metadata.ImageMetadata`,
+                 in the order of image_ids
+        """
+        raise NotImplementedError("inspect_images method is not implemented")
+
+    def ensure_present(self, images):
+        """
+        apply pull policy of images which were created with `lazy=True` at once: presence of
+        all the images is checked with a single listing of images, only the missing ones
+        are pulled
+
+        :param images: list of instances of :class:`conu.apidefs.image.Image`
+        :return: None
+        """
+        pending = [i for i in images if getattr(i, "_pull_policy_pending", False)]
+        if not pending:
+            return
+        present = self._get_present_images()
+        for image in pending:
+            image._apply_pull_policy(present=present)
+
+    def _get_present_images(self):
+        """
+        :return: set of str, names and IDs of all the images present on the system
+        """
+        raise NotImplementedError("_get_present_images method is not implemented")
+
     def _clean_tmp_dirs(self):
         """
         Remove temporary dir associated with this backend instance.
@@ -9,10 +9,12 @@ Abstract class definitions for containers.
 """
 from __future__ import print_function, unicode_literals
 
+import time
+
 from conu.apidefs.image import Image
-from conu.utils.http_client import HttpClient, get_url
+from conu.utils import wait_for_ports
+from conu.utils.probes import Probe
 
-import requests
 from six.moves.urllib.parse import urlunsplit
 from contextlib import contextmanager
 
@@ -40,9 +42,62 @@ class Container(object):
             raise RuntimeError("image argument is not an instance of Image class")
         self.image = image
         self._metadata = None
+        # seconds it took to obtain ID of the container when it was being started,
+        # set by the run_via_binary* methods
+        self.time_to_id = None
+
+        # requests.Session, created on first use
+        self._http_session = None
+        # default host and port for HTTP requests, resolved on first use
+        self._http_host = None
+        self._http_port = None
+
+    @property
+    def http_session(self):
+        """
+        HTTP client (requests.Session) of this container: headers, auth and cookies set on it
+        apply only to this container while connection pools are shared by all containers, their
+        size and retry policy can be configured via
+        :func:`conu.utils.http_client.configure_http_session`
+
+        :return: instance of requests.Session
+        """
+        if self._http_session is None:
+            # requests is imported on first use
+            from conu.utils.http_client import new_http_session
+            self._http_session = new_http_session()
+        return self._http_session
+
+    @http_session.setter
+    def http_session(self, session):
+        self._http_session = session
+
+    def get_http_endpoint(self, host=None, port=None):
+        """
+        provide host and port for HTTP requests, the defaults are resolved only once
+
+        :param host: str, if None, set to self.get_IPv4s()[0]
+        :param port: str or int, if None, set to self.get_ports()[0]
+        :return: (str, str or int)
+        """
+        if not host:
+            if self._http_host is None:
+                self._http_host = self.get_IPv4s()[0]
+            host = self._http_host
+        if not port:
+            if self._http_port is None:
+                self._http_port = self.get_ports()[0]
+            port = self._http_port
+        return host, port
 
-        # provides HTTP client (requests.Session)
-        self.http_session = requests.Session()
+    def invalidate_http_endpoint(self):
+        """
+        resolve host and port for HTTP requests again, e.g. after the container was restarted
+
+        :return: None
+        """
+        self._http_host = None
+        self._http_port = None
 
     def http_request(self, path="/", method="GET", host=None, port=None, json=False, data=None):
         """
@@ -56,8 +111,9 @@ class Container(object):
         :param data: data to send (can be dict, list, str)
         :return: dict
         """
-        host = host or self.get_IPv4s()[0]
-        port = port or self.get_ports()[0]
+        from conu.utils.http_client import get_url
+
+        host, port = self.get_http_endpoint(host, port)
         url = get_url(host=host, port=port, path=path)
 
         return self.http_session.request(method, url, json=json, data=data)
@@ -77,12 +133,39 @@ class Container(object):
         :param port: str or int, if None, set to self.get_ports()[0]
         :return: instance of :class:`conu.utils.http_client.HttpClient`
         """
+        from conu.utils.http_client import HttpClient
 
-        host = host or self.get_IPv4s()[0]
-        port = port or self.get_ports()[0]
-
+        host, port = self.get_http_endpoint(host, port)
         yield HttpClient(host, port, self.http_session)
 
+    def http_load(self, path="/", concurrency=10, duration=None, requests=None, method="GET",
+                  host=None, port=None, data=None, timeout=10):
+        """
+        generate HTTP load against the container and measure how it copes with it, e.g.:
+
+        .. code-block:: python
+
+            result = container.http_load("/api/version", concurrency=20, duration=10)
+            assert result.errors == 0
+            assert result.latency_percentiles()[99] < 0.1
+
+        :param path: str, path within the request, e.g. "/api/version"
+        :param concurrency: int, number of concurrent keep-alive connections
+        :param duration: int or float, seconds, the load test stops after this time
+        :param requests: int, the load test stops after this number of requests
+        :param method: str, HTTP method
+        :param host: str, if None, set self.get_IPv4s()[0]
+        :param port: str or int, if None, set to self.get_ports()[0]
+        :param data: data to send (can be dict, list, str)
+        :param timeout: int or float, timeout of a single request (seconds)
+        :return: instance of :class:`conu.utils.http_load.HttpLoadResult`
+        """
+        from conu.utils.http_load import run_http_load
+
+        host, port = self.get_http_endpoint(host, port)
+        return run_http_load(host, port, path=path, concurrency=concurrency, duration=duration,
+                             requests=requests, method=method, data=data, timeout=timeout)
+
     def get_id(self):
         """
         get unique identifier of this container
@@ -190,6 +273,31 @@ class Container(object):
         """
         raise NotImplementedError("is_port_open method is not implemented")
 
+    def wait_for_ports(self, ports, timeout=10, pause=0.1):
+        """
+        block until all the ports accept connections on the IP address of this container,
+        raises an exc ProbeTimeout if timeout is reached; the address is resolved once and
+        all the ports are checked concurrently, see :func:`conu.utils.wait_for_ports`
+
+        :param ports: list of int
+        :param timeout: int or float (seconds), -1 means forever
+        :param pause: int, float or instance of :class:`conu.utils.probes.PauseSchedule`, how
+                      long to wait before connecting to a closed port again
+        :return: None
+        """
+        start = time.time()
+        addresses = []
+
+        def resolve():
+            addresses[:] = self.get_IPv4s()
+            return bool(addresses)
+
+        # the address is not assigned until the container is started
+        Probe(timeout=timeout, pause=0.1, fnc=resolve).run()
+        if timeout != -1:
+            timeout = max(timeout - (time.time() - start), 0)
+        wait_for_ports([(addresses[0], port) for port in ports], timeout=timeout, pause=pause)
+
     def open_connection(self, port=None):
         """
         open a TCP connection to service running in the container, if port is None and
@@ -239,6 +347,22 @@ class Container(object):
         """
         raise NotImplementedError("execute method is not implemented")
 
+    def session(self, shell="/bin/sh"):
+        """
+        start a persistent shell in this container: commands sent through the session
+        don't need a new exec process each, e.g.:
+
+        .. code-block:: python
+
+            with container.session() as s:
+                assert s.execute(["id", "-u"]) == "0\\n"
+                exit_code, output = s.run("rpm -q bash")
+
+        :param shell: str, path to the shell in the container
+        :return: instance of :class:`conu.utils.exec_session.ExecSession`
+        """
+        raise NotImplementedError("session method is not implemented")
+
     def logs(self, follow=False):
         """
         Get logs from this container.
@@ -266,6 +390,16 @@ class Container(object):
         """
         raise NotImplementedError("kill method is not implemented")
 
+    def commit(self, repository, tag="latest"):
+        """
+        create an image from the current state of this container
+
+        :param repository: str, name of the new image
+        :param tag: str, tag of the new image
+        :return: instance of Image
+        """
+        raise NotImplementedError("commit method is not implemented")
+
     def delete(self, force=False, **kwargs):
         """
         remove this container; kwargs indicate that some container runtimes
@@ -9,6 +9,17 @@ Abstract definition for an Image
 """
 from __future__ import print_function, unicode_literals
 
+import copy
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed as futures_as_completed
+
+from conu.exceptions import ConuException
+from conu.utils.probes import Probe, ProbeGroup
+
+
+logger = logging.getLogger(__name__)
+
 
 class Image(object):
     """
@@ -160,6 +171,118 @@ class Image(object):
         """
         raise NotImplementedError("create_container method is not implemented")
 
+    def run_from_spec(self, run_spec=None):
+        """
+        create a container using this image and start it; `run_spec` is copied, so the same
+        one can be used for many containers
+
+        :param run_spec: how to run the container:
+
+            * instance of ContainerParameters, e.g. DockerContainerParameters:
+              `run_via_api()` is used and the container is started
+            * run builder, e.g. DockerRunBuilder or PodmanRunBuilder:
+              `run_via_binary(run_command_instance=run_spec)` is used
+            * dict: keyword arguments of `run_via_binary()`, e.g. for NspawnImage
+            * None: `run_via_api()` if the backend supports it, `run_via_binary()` otherwise
+        :return: instance of Container
+        """
+        run_spec = copy.deepcopy(run_spec)
+        if isinstance(run_spec, dict):
+            return self.run_via_binary(**run_spec)
+        if run_spec is not None and hasattr(run_spec, "build"):
+            return self.run_via_binary(run_command_instance=run_spec)
+        try:
+            container = self.run_via_api(run_spec)
+        except NotImplementedError:
+            if run_spec is not None:
+                raise
+            return self.run_via_binary()
+        container.start()
+        return container
+
+    def run_many(self, n, run_spec=None, max_parallel=8, ready=None, timeout=60,
+                 as_completed=False):
+        """
+        create and start `n` containers concurrently, e.g.:
+
+        .. code-block:: python
+
+            nodes = image.run_many(30, run_spec, ready=lambda c: c.is_port_open(8080))
+
+        if one of the containers can't be started, the others are removed (except those already
+        yielded when `as_completed` is set) and the exception is raised
+
+        :param n: int, number of containers
+        :param run_spec: how to run the containers, see :meth:`run_from_spec`; the spec must not
+                         set a name of the container
+        :param max_parallel: int, maximum number of containers being started at the same time
+        :param ready: callable, accepts a container and returns True when it's ready; all the
+                      containers are checked by a single ProbeGroup
+        :param timeout: int or float, how long to wait for the containers to be ready (seconds)
+        :param as_completed: bool, return an iterator which yields the containers as they become
+                             ready instead of a list
+        :return: list or iterator of Container instances
+        """
+        if n < 1:
+            return iter([]) if as_completed else []
+        executor = ThreadPoolExecutor(max_workers=min(max_parallel, n))
+        futures = [executor.submit(self.run_from_spec, run_spec) for _ in range(n)]
+        executor.shutdown(wait=False)
+        containers = self._iter_started(futures, ready, timeout, max_parallel)
+        if as_completed:
+            return containers
+        result = []
+        try:
+            for container in containers:
+                result.append(container)
+        except Exception:
+            for container in result:
+                self._discard_container(container)
+            raise
+        return result
+
+    def _iter_started(self, futures, ready, timeout, workers):
+        """ yield containers started by run_many() once they are ready """
+        handed_out = set()
+        try:
+            for future in futures_as_completed(futures):
+                container = future.result()
+                if ready is None:
+                    handed_out.add(container)
+                    yield container
+            if ready is None:
+                return
+            probes = {}
+            for future in futures:
+                container = future.result()
+                probes[Probe(timeout=timeout, pause=0.1,
+                             fnc=functools.partial(ready, container))] = container
+            for probe, error in ProbeGroup(list(probes), workers=workers).as_completed():
+                container = probes[probe]
+                if error is not None:
+                    raise ConuException("container %s is not ready: %r" % (container, error))
+                handed_out.add(container)
+                yield container
+        except Exception:
+            for future in futures:
+                future.cancel()
+            # wait for the containers which are being started and remove all which were
+            # not handed out yet
+            for future in futures:
+                if future.cancelled() or future.exception() is not None:
+                    continue
+                if future.result() not in handed_out:
+                    self._discard_container(future.result())
+            raise
+
+    @staticmethod
+    def _discard_container(container):
+        """ remove a container started by run_many() which won't be handed out """
+        try:
+            container.delete(force=True)
+        except Exception as ex:
+            logger.warning("can't remove container %s: %r", container, ex)
+
     def run_in_pod(self, namespace="default"):
         """
         run image inside Kubernetes Pod
@@ -4,8 +4,14 @@ import enum
 class Metadata(object):
     """
     Common metadata for container and image
+
+    The attributes are stored in slots to keep the objects small; other attributes can still
+    be set, they are stored in __dict__ which is allocated only when needed.
     """
 
+    __slots__ = ("name", "identifier", "labels", "command", "creation_timestamp",
+                 "env_variables", "__dict__", "__weakref__")
+
     def __init__(self, name=None, identifier=None, labels=None, command=None,
                  creation_timestamp=None, env_variables=None):
         """
@@ -33,6 +39,9 @@ class ContainerMetadata(Metadata):
     Specific metadata for container
     """
 
+    __slots__ = ("exposed_ports", "port_mappings", "hostname", "image", "ipv4_addresses",
+                 "ipv6_addresses", "status")
+
     def __init__(self, name=None, identifier=None, labels=None, command=None,
                  creation_timestamp=None, env_variables=None,
                  image=None, exposed_ports=None, port_mappings=None, hostname=None,
@@ -79,6 +88,8 @@ class ImageMetadata(Metadata):
     Specific metadata for image
     """
 
+    __slots__ = ("exposed_ports", "image_names", "digest", "repo_digests")
+
     def __init__(self, name=None, identifier=None, labels=None, command=None,
                  creation_timestamp=None, env_variables=None, exposed_ports=None, image_names=None,
                  digest=None, repo_digests=None):
@@ -108,6 +119,90 @@ class ImageMetadata(Metadata):
         self.repo_digests = repo_digests
 
 
+class LazyField(object):
+    """
+    Attribute of a lazy metadata object: the value is decoded from the raw data (usually inspect
+    output) when the attribute is accessed for the first time. The decoded value is stored in
+    the slot of the same name defined by a parent class, so it doesn't take extra memory.
+    """
+
+    def __init__(self, decode):
+        """
+        :param decode: callable, accepts the raw data, returns value of the attribute
+        """
+        self.decode = decode
+        self.slot = None
+
+    def __set_name__(self, owner, name):
+        for klass in owner.__mro__[1:]:
+            if name in vars(klass).get("__slots__", ()):
+                self.slot = vars(klass)[name]
+                return
+        raise TypeError("no parent class of %s has slot %s" % (owner.__name__, name))
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        try:
+            return self.slot.__get__(obj, owner)
+        except AttributeError:
+            value = self.decode(obj._raw)
+            self.slot.__set__(obj, value)
+            return value
+
+    def __set__(self, obj, value):
+        self.slot.__set__(obj, value)
+
+    def reset(self, obj):
+        """
+        forget the decoded value, it will be decoded again on next access
+
+        :param obj: instance of the lazy metadata class
+        :return: None
+        """
+        try:
+            self.slot.__delete__(obj)
+        except AttributeError:
+            pass
+
+
+class LazyMetadata(object):
+    """
+    Mixin for metadata classes whose attributes are instances of LazyField. Subclasses need to
+    define the `_raw` slot:
+
+    ::
+
+        class MyContainerMetadata(LazyMetadata, ContainerMetadata):
+            __slots__ = ("_raw", )
+            hostname = LazyField(lambda raw: raw["Config"]["Hostname"])
+    """
+
+    __slots__ = ()
+
+    def load(self, raw):
+        """
+        replace the raw data, the attributes are decoded again on next access
+
+        :param raw: raw data, usually a dict with inspect output
+        :return: None
+        """
+        self._raw = raw
+        for klass in type(self).__mro__:
+            for attr in vars(klass).values():
+                if isinstance(attr, LazyField):
+                    attr.reset(self)
+
+    @property
+    def raw(self):
+        """
+        raw data the attributes are decoded from
+
+        :return: usually a dict with inspect output
+        """
+        return self._raw
+
+
 class ContainerStatus(enum.Enum):
     """
     This Enum defines the status of container
@@ -10,11 +10,14 @@ This is backend for buildah
 import json
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 from conu.apidefs.backend import Backend
-from conu.backend.buildah.container import BuildahContainer
-from conu.backend.buildah.image import BuildahImage, BuildahImagePullPolicy
-from conu.utils import run_cmd, parse_reference
+from conu.backend.buildah.container import BuildahContainer, \
+    buildah_container_inspect_to_metadata
+from conu.backend.buildah.image import BuildahImage, BuildahImagePullPolicy, get_image_cache, \
+    buildah_image_inspect_to_metadata
+from conu.utils import run_cmd, parse_reference, make_filters, filters_to_cli_options
 
 
 logger = logging.getLogger(__name__)
@@ -58,45 +61,127 @@ class BuildahBackend(Backend):
             logger.error("unable to parse version from `buildah version`")
             return
 
-    def list_containers(self):
+    def list_containers(self, name=None, ancestor=None):
         """
         List all available buildah containers.
 
+        The filters are evaluated by buildah, see `buildah containers --filter` for their
+        semantics.
+
+        :param name: str, list only containers whose name matches this string
+        :param ancestor: str, list only containers created from this image (name or ID)
         :return: collection of instances of :class:`conu.BuildahContainer`
         """
-        containers = []
-        for container in self._list_buildah_containers():
+        return list(self.iter_containers(name=name, ancestor=ancestor))
+
+    def iter_containers(self, name=None, ancestor=None):
+        """
+        Same as list_containers, but the container objects are created lazily, one by one.
+
+        :param name: str
+        :param ancestor: str
+        :return: generator of instances of :class:`conu.BuildahContainer`
+        """
+        filters = make_filters(name=name, ancestor=ancestor)
+        # one image handle per image ID; the images are used by the containers so they
+        # are present and there's no need to check it
+        images = {}
+        for container in self._list_buildah_containers(filters=filters):
             identifier = container["id"]
             container_name = container["containername"]
             image_id = container["imageid"]
             image_name = container["imagename"]
-            image = BuildahImage(image_name, identifier=image_id)
-            container = BuildahContainer(image, container_id=identifier, name=container_name,
-                                         image_class=self.ImageClass)
-            containers.append(container)
-        return containers
+            image = images.get(image_id)
+            if image is None:
+                image = BuildahImage(image_name, identifier=image_id,
+                                     pull_policy=BuildahImagePullPolicy.NEVER)
+                images[image_id] = image
+            yield BuildahContainer(image, container_id=identifier, name=container_name,
+                                   image_class=self.ImageClass)
+
+    @staticmethod
+    def _inspect_many(inspect, identifiers, max_workers):
+        """
+        `buildah inspect` accepts a single object only, so the commands are run concurrently
+        using a bounded pool of threads
+
+        :return: list of dicts, in the order of identifiers
+        """
+        if len(identifiers) <= 1:
+            return [inspect(i) for i in identifiers]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(identifiers))) as executor:
+            return list(executor.map(inspect, identifiers))
+
+    def inspect_containers(self, container_ids, max_workers=8):
+        """
+        Inspect multiple buildah containers at once.
+
+        :param container_ids: list of str
+        :param max_workers: int, maximum number of concurrent `buildah inspect` processes
+        :return: list of instances of ContainerMetadata, in the order of container_ids
+        """
+        return [buildah_container_inspect_to_metadata(inspect_data) for inspect_data in
+                self._inspect_many(BuildahContainer._inspect, list(container_ids), max_workers)]
+
+    def inspect_images(self, image_ids, max_workers=8):
+        """
+        Inspect multiple images; images which are not in the image cache yet are inspected
+        concurrently and stored in the cache.
 
-    def list_images(self):
+        :param image_ids: list of str
+        :param max_workers: int, maximum number of concurrent `buildah inspect` processes
+        :return: list of instances of ImageMetadata, in the order of image_ids
+        """
+        image_ids = list(image_ids)
+        cache = get_image_cache().images
+        cached = {i: cache.lookup(i) for i in image_ids}
+        missing = [i for i in image_ids if cached[i] is None]
+        for image_id, inspect_data in zip(
+                missing, self._inspect_many(BuildahImage._inspect, missing, max_workers)):
+            cache.put(image_id, inspect_data)
+            cached[image_id] = inspect_data
+        return [buildah_image_inspect_to_metadata(cached[i]) for i in image_ids]
+
+    def _get_present_images(self):
+        present = set()
+        for image in self._list_all_buildah_images():
+            present.add(image.get("id") or image.get("Id"))
+            present.update(image.get("names") or image.get("Names") or [])
+        return present
+
+    def list_images(self, name=None, label=None):
         """
         List all available buildah images.
 
+        The filters are evaluated by buildah, see `buildah images --filter` for their semantics.
+
+        :param name: str, list only images matching this reference, e.g. "fedora:29"
+        :param label: str, list of str ("key" or "key=value") or dict, list only images
+                      with these labels
         :return: collection of instances of :class:`conu.BuildahImage`
         """
-        images = []
-        for image in self._list_all_buildah_images():
+        return list(self.iter_images(name=name, label=label))
+
+    def iter_images(self, name=None, label=None):
+        """
+        Same as list_images, but the image objects are created lazily, one by one.
+
+        :param name: str
+        :param label: str, list of str ("key" or "key=value") or dict
+        :return: generator of instances of :class:`conu.BuildahImage`
+        """
+        filters = make_filters(reference=name, label=label)
+        for image in self._list_all_buildah_images(filters=filters):
             try:
                 i_name, tag = parse_reference(image["names"][0])
             except (IndexError, TypeError):
                 i_name, tag = None, None
-            d_im = BuildahImage(
+            yield BuildahImage(
                 i_name, tag=tag, identifier=image["id"],
                 pull_policy=BuildahImagePullPolicy.NEVER)
-            images.append(d_im)
-
-        return images
 
     @staticmethod
-    def _list_all_buildah_images():
+    def _list_all_buildah_images(filters=None):
         """
         List all buildah images
 
@@ -106,9 +191,10 @@ class BuildahBackend(Backend):
             "docker.io/library/fedora:30"
         ]
 
+        :param filters: dict, filter name -> list of str, see make_filters
         :return: list of dicts with image info
         """
-        cmdline = ["buildah", "images", "--json"]
+        cmdline = ["buildah", "images"] + filters_to_cli_options(filters or {}) + ["--json"]
         output = run_cmd(cmdline, return_output=True)
         images = json.loads(output)
         if not images:
@@ -116,9 +202,9 @@ class BuildahBackend(Backend):
         return images
 
     @staticmethod
-    def _list_buildah_containers(filter=None):
+    def _list_buildah_containers(filters=None):
         """
-        Enumerate buildah containers using a filter or list all
+        Enumerate all buildah containers, or the ones matching the filters
 
         sample container:
          {'id': '839e3dc37673530f26277baf1cb839f4f435f6f55cad941ed63c1919417727e4',
@@ -127,11 +213,11 @@ class BuildahBackend(Backend):
           'imagename': '',
           'containername': 'd474c1e8e5bcb9f2a37b8ba30fea895398b3dc926bf5334c3df0b294e9866190-working-container'},
 
-        :param filter: filter to use, see `man buildah-containers` for more info
+        :param filters: dict, filter name -> list of str, see make_filters and
+                        `man buildah-containers` for more info
         :return: list of dicts with containers info
         """
-        option = ["--filter", filter] if filter else ["-a"]
-        cmdline = ["buildah", "ps"] + option + ["--json"]
+        cmdline = ["buildah", "ps", "-a"] + filters_to_cli_options(filters or {}) + ["--json"]
         output = run_cmd(cmdline, return_output=True)
         containers = json.loads(output)
         if not containers:
@@ -18,6 +18,8 @@ from conu.apidefs.metadata import ContainerMetadata
 from conu.backend.buildah.utils import buildah_common_inspect_to_metadata
 from conu.exceptions import ConuException
 from conu.utils import run_cmd, graceful_get, parse_reference
+from conu.utils.exec_session import ProcessExecSession
+from conu.utils.output_sinks import ListSink, stream_cmd
 
 logger = logging.getLogger(__name__)
 
@@ -262,19 +264,39 @@ class BuildahContainer(Container):
         """
         return graceful_get(self.inspect(refresh=True), "State", "ExitCode")
 
-    def execute(self, command, options=None, **kwargs):
+    def execute(self, command, options=None, sink=None, stderr_sink=None, log_output=True,
+                log_rate_limit=None, **kwargs):
         """
         Execute a command in this container
 
         :param command: list of str, command to execute in the container
         :param options: list of str, additional options to run command
-        :return: str
+        :param sink: instance of OutputSink, the output is streamed into it instead of being
+                     returned, see :mod:`conu.utils.output_sinks`
+        :param stderr_sink: instance of OutputSink, receives stderr separately from stdout
+        :param log_output: bool, log the streamed output line by line
+        :param log_rate_limit: int, maximum number of lines logged per second, no limit if None
+        :return: str, output of the command with stderr merged into stdout (only stdout if
+                 `stderr_sink` is set), or `sink` if it was provided
         """
         options = options or []
         logger.info("running command %s", command)
         cmd = ["buildah", "run"] + options + [self.get_id()] + command
-        output = run_cmd(cmd, return_output=True)
-        return output
+        if sink is None and stderr_sink is None:
+            return run_cmd(cmd, return_output=True)
+        response = ListSink() if sink is None else sink
+        stream_cmd(cmd, response, stderr_sink=stderr_sink, log_output=log_output,
+                   log_rate_limit=log_rate_limit)
+        return response.getvalue().decode("utf-8") if sink is None else sink
+
+    def session(self, shell="/bin/sh"):
+        """
+        start a persistent shell in this container via `buildah run`
+
+        :param shell: str, path to the shell in the container
+        :return: instance of :class:`conu.utils.exec_session.ProcessExecSession`
+        """
+        return ProcessExecSession(["buildah", "run", self.get_id(), "--", shell], shell=shell)
 
     @property
     def metadata(self):
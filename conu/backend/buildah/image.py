@@ -14,6 +14,7 @@ import json
 import logging
 import os
 import subprocess
+import time
 
 import six
 
@@ -24,11 +25,26 @@ from conu.backend.buildah.container import BuildahContainer, BuildahRunBuilder
 from conu.backend.buildah.utils import buildah_common_inspect_to_metadata
 from conu.exceptions import ConuException
 from conu.utils import run_cmd, random_tmp_filename, graceful_get
+from conu.utils.cache import ImageInspectCache
+from conu.utils.cidfile import wait_for_cidfile
 from conu.utils.filesystem import Volume
-from conu.utils.probes import Probe
 
 logger = logging.getLogger(__name__)
 
+image_cache = None
+
+
+def get_image_cache():
+    """
+    provide cache of `buildah inspect` data shared by all the buildah images
+
+    :return: instance of :class:`conu.utils.cache.ImageInspectCache`
+    """
+    global image_cache
+    if image_cache is None:
+        image_cache = ImageInspectCache.for_backend("buildah", id_key="FromImageID")
+    return image_cache
+
 
 class BuildahImagePullPolicy(enum.Enum):
     """
@@ -66,13 +82,16 @@ class BuildahImage(Image):
     """
 
     def __init__(self, repository, tag="latest", identifier=None,
-                 pull_policy=BuildahImagePullPolicy.IF_NOT_PRESENT):
+                 pull_policy=BuildahImagePullPolicy.IF_NOT_PRESENT, lazy=False):
         """
         :param repository: str, image name, examples: "fedora", "registry.fedoraproject.org/fedora",
                             "tomastomecek/sen", "docker.io/tomastomecek/sen"
         :param tag: str, tag of the image, when not specified, "latest" is implied
         :param identifier: str, unique identifier for this image
         :param pull_policy: enum, strategy to apply for pulling the image
+        :param lazy: bool, apply the pull policy once the image is used for the first time
+                     (e.g. when a container is created), not in the constructor; see also
+                     `ensure_present` method of the backend
         """
         super(BuildahImage, self).__init__(repository, tag=tag)
         if not isinstance(tag, (six.string_types, None.__class__)):
@@ -86,15 +105,9 @@ class BuildahImage(Image):
         self._inspect_data = None
         self._metadata = None
 
-        if self.pull_policy == BuildahImagePullPolicy.ALWAYS:
-            logger.debug("pull policy set to 'always', pulling the image")
-            self.pull()
-        elif self.pull_policy == BuildahImagePullPolicy.IF_NOT_PRESENT and not self.is_present():
-            logger.debug("pull policy set to 'if_not_present' and image is not present, "
-                         "pulling the image")
-            self.pull()
-        elif self.pull_policy == BuildahImagePullPolicy.NEVER:
-            logger.debug("pull policy set to 'never'")
+        self._pull_policy_pending = True
+        if not lazy:
+            self._apply_pull_policy()
 
     def __repr__(self):
         return "BuildahImage(repository=%s, tag=%s)" % (self.name, self.tag)
@@ -113,12 +126,45 @@ class BuildahImage(Image):
         else:
             return self.name
 
+    def _is_in(self, present):
+        """
+        :param present: set of str, names and IDs of images present on the system, or None
+        :return: bool, True if the image is present
+        """
+        if present is not None:
+            if self.get_full_name() in present or (self._id and self._id in present):
+                return True
+        # a different form of the name or a short ID may have been used, ask directly
+        return self.is_present()
+
+    def _apply_pull_policy(self, present=None):
+        """
+        apply the pull policy unless it was applied already
+
+        :param present: set of str, names and IDs of images present on the system; if it's not
+                        provided, the presence of the image is checked directly
+        :return: None
+        """
+        if not self._pull_policy_pending:
+            return
+        self._pull_policy_pending = False
+        if self.pull_policy == BuildahImagePullPolicy.ALWAYS:
+            logger.debug("pull policy set to 'always', pulling the image")
+            self.pull()
+        elif self.pull_policy == BuildahImagePullPolicy.IF_NOT_PRESENT and not self._is_in(present):
+            logger.debug("pull policy set to 'if_not_present' and image is not present, "
+                         "pulling the image")
+            self.pull()
+        elif self.pull_policy == BuildahImagePullPolicy.NEVER:
+            logger.debug("pull policy set to 'never'")
+
     def get_id(self):
         """
         get unique identifier of this image
 
         :return: str
         """
+        self._apply_pull_policy()
         if self._id is None:
             self._id = graceful_get(self.inspect(refresh=False), "FromImageID")
         return self._id
@@ -129,8 +175,12 @@ class BuildahImage(Image):
 
         :return: bool, True if it is, False if it's not
         """
+        identifier = self._id or self.get_full_name()
+        if not identifier:
+            raise ConuException("This image does not have a valid identifier.")
         try:
-            return bool(self.inspect())
+            # the image cache can't tell whether the image is still present
+            return bool(self._inspect(identifier))
         except subprocess.CalledProcessError:
             return False
 
@@ -146,6 +196,7 @@ class BuildahImage(Image):
             logger.warning("scratch image can't be pulled")
             return
         run_cmd(["buildah", "pull", self.get_full_name()])
+        get_image_cache().invalidate_names(self.get_full_name())
 
     def tag_image(self, repository=None, tag=None):
         """
@@ -162,20 +213,27 @@ class BuildahImage(Image):
         t = tag or "latest"
         identifier = self._id or self.get_id()
         run_cmd(["buildah", "tag", identifier, "%s:%s" % (r, t)])
+        get_image_cache().invalidate_names("%s:%s" % (r, t))
         return BuildahImage(r, tag=t)
 
     def inspect(self, refresh=True):
         """
         provide metadata about the image; flip refresh=True if cached metadata are enough
 
-        :param refresh: bool, update the metadata with up to date content
+        :param refresh: bool, update the metadata with up to date content; data of an image ID
+                        never change, so they are served from the image cache, only the name
+                        of the image is resolved to an ID again, see :func:`get_image_cache`
         :return: dict
         """
+        self._apply_pull_policy()
         if refresh or not self._inspect_data:
             identifier = self._id or self.get_full_name()
             if not identifier:
                 raise ConuException("This image does not have a valid identifier.")
-            self._inspect_data = self._inspect(identifier)
+            if self._id:
+                self._inspect_data = get_image_cache().get_by_id(self._id, self._inspect)
+            else:
+                self._inspect_data = get_image_cache().get_by_name(identifier, self._inspect)
         return self._inspect_data
 
     @staticmethod
@@ -198,19 +256,10 @@ class BuildahImage(Image):
             # buildah doesn't like the trailing ""
             cmdline += ["--force"]
         run_cmd(cmdline + [identifier])
-
-    @staticmethod
-    def _file_not_empty(tmpfile):
-        """
-        Returns True if file exists and it is not empty
-        to check if it is time to read container ID from cidfile
-        :param tmpfile: str, path to file
-        :return: bool, True if container id is written to the file
-        """
-        if os.path.exists(tmpfile):
-            return os.stat(tmpfile).st_size != 0
-        else:
-            return False
+        cache = get_image_cache()
+        cache.invalidate_names(self.get_full_name())
+        # inspect() of this image must not be served from the cache anymore
+        cache.invalidate_id(self._id, graceful_get(self._inspect_data, cache.id_key))
 
     def run_via_binary(self, run_command_instance=None, command=None, volumes=None,
                        additional_opts=None, **kwargs):
@@ -229,6 +278,7 @@ class BuildahImage(Image):
         :param additional_opts: list of str, additional options for `buildah from`
         :return: instance of BuildahContainer
         """
+        self._apply_pull_policy()
         logger.info("create buildah container")
         if not run_command_instance:
             run_command_instance = BuildahRunBuilder(
@@ -247,13 +297,16 @@ class BuildahImage(Image):
         # if volumes:
         #     cmd += self.get_volume_options(volumes=volumes)
 
+        start = time.time()
         run_cmd(cmd)
-
-        Probe(timeout=10, count=10, pause=0.1, fnc=lambda: self._file_not_empty(tmpfile)).run()
-        with open(tmpfile, 'r') as fd:
-            container_id = fd.read()
-
-        return BuildahContainer(self, container_id, image_class=self.__class__)
+        # `buildah from` prints name of the container, its ID is in the cidfile which is
+        # written once the command exits
+        container_id = wait_for_cidfile(tmpfile, timeout=10)
+        time_to_id = time.time() - start
+
+        container = BuildahContainer(self, container_id, image_class=self.__class__)
+        container.time_to_id = time_to_id
+        return container
 
     @staticmethod
     def get_volume_options(volumes):
@@ -8,14 +8,18 @@
 This is backend for docker engine
 """
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import six
 
 from conu.apidefs.backend import Backend
-from conu.backend.docker.client import get_client
+from conu.backend.docker.client import get_client, get_client_pool
 from conu.backend.docker.constants import CONU_ARTIFACT_TAG
-from conu.backend.docker.container import DockerContainer
-from conu.backend.docker.image import DockerImage, DockerImagePullPolicy
-from conu.backend.docker.utils import inspect_to_metadata, inspect_to_container_metadata
-from conu.utils import parse_reference
+from conu.backend.docker.container import DockerContainer, get_inspect_cache
+from conu.backend.docker.events import get_event_monitor
+from conu.backend.docker.image import DockerImage, DockerImagePullPolicy, get_image_cache
+from conu.backend.docker.utils import DockerContainerMetadata, DockerImageMetadata
+from conu.utils import make_filters, parse_reference
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +34,8 @@ class DockerBackend(Backend):
     ContainerClass = DockerContainer
     ImageClass = DockerImage
 
-    def __init__(self, logging_level=logging.INFO, logging_kwargs=None, cleanup=None):
+    def __init__(self, logging_level=logging.INFO, logging_kwargs=None, cleanup=None,
+                 inspect_ttl=None, max_connections=None):
         """
         This method serves as a configuration interface for conu.
 
@@ -41,11 +46,58 @@ class DockerBackend(Backend):
             - [CleanupPolicy.EVERYTHING]
             - [CleanupPolicy.VOLUMES, CleanupPolicy.TMP_DIRS]
             - [CleanupPolicy.NOTHING]
+        :param inspect_ttl: int or float, number of seconds container inspect data are cached
+                            for, 0 disables the cache; the default (1 second) is kept if None;
+                            the cache is shared by all the backend instances in the process,
+                            the previous value is restored when this backend is exited;
+                            once set, inspect(refresh=True) of containers returns cached
+                            data up to `inspect_ttl` seconds old
+        :param max_connections: int, maximum number of connections to the docker daemon kept
+                                open by every thread, the default (10) is kept if None
         """
         super(DockerBackend, self).__init__(
             logging_level=logging_level, logging_kwargs=logging_kwargs, cleanup=cleanup)
+        self.inspect_cache = get_inspect_cache()
+        self._previous_inspect_ttl = None
+        if inspect_ttl is not None:
+            self._previous_inspect_ttl = (self.inspect_cache.ttl,
+                                          self.inspect_cache.explicit_ttl)
+            self.inspect_cache.ttl = inspect_ttl
+            self.inspect_cache.explicit_ttl = True
+        if max_connections is not None:
+            get_client_pool().configure(max_connections=max_connections)
         self.d = get_client()
 
+    @property
+    def events(self):
+        """
+        monitor of the docker event stream shared within the process
+
+        :return: instance of :class:`conu.backend.docker.events.DockerEventMonitor`
+        """
+        return get_event_monitor()
+
+    def wait_all(self, containers, status="running", timeout=None):
+        """
+        Block until all the provided containers get to the selected status; all of them are
+        watched using a single docker event stream.
+
+        :param containers: list of :class:`conu.DockerContainer`
+        :param status: str or list of str, one of: 'created', 'running', 'paused', 'exited',
+                       'removed'
+        :param timeout: int or float (seconds), None means forever
+        :return: dict, {container_id: ContainerState}
+        """
+        statuses = [status] if isinstance(status, six.string_types) else list(status)
+        return self.events.wait_for([c.get_id() for c in containers],
+                                    lambda s: s.status in statuses, timeout=timeout)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        super(DockerBackend, self).__exit__(exc_type, exc_val, exc_tb)
+        if self._previous_inspect_ttl is not None:
+            self.inspect_cache.ttl, self.inspect_cache.explicit_ttl = \
+                self._previous_inspect_ttl
+
     def cleanup_containers(self):
         conu_containers = self.d.containers(filters={'label': CONU_ARTIFACT_TAG}, all=True)
         for c in conu_containers:
@@ -53,8 +105,9 @@ class DockerBackend(Backend):
             logger.debug("Removing container %s created by conu", id)
             self.d.stop(id)
             self.d.remove_container(id)
+        self.inspect_cache.invalidate()
 
-    def list_containers(self):
+    def list_containers(self, label=None, name=None, status=None, ancestor=None):
         """
         List all available docker containers.
 
@@ -62,22 +115,112 @@ class DockerBackend(Backend):
         amount of metadata in property `short_metadata`. These are just a subset
         of `.inspect()`, but don't require an API call against dockerd.
 
+        The filters are evaluated by dockerd, see `docker ps --filter` for their semantics.
+
+        :param label: str, list of str ("key" or "key=value") or dict, list only containers
+                      with these labels
+        :param name: str, list only containers whose name contains this string
+        :param status: str, one of: created, restarting, running, removing, paused, exited, dead
+        :param ancestor: str, list only containers created from this image (name or ID)
         :return: collection of instances of :class:`conu.DockerContainer`
         """
-        result = []
-        for c in self.d.containers(all=True):
-            name = None
+        return list(self.iter_containers(label=label, name=name, status=status,
+                                         ancestor=ancestor))
+
+    def iter_containers(self, label=None, name=None, status=None, ancestor=None):
+        """
+        Same as list_containers, but the container objects are created lazily, one by one.
+
+        :param label: str, list of str ("key" or "key=value") or dict
+        :param name: str
+        :param status: str
+        :param ancestor: str
+        :return: generator of instances of :class:`conu.DockerContainer`
+        """
+        filters = make_filters(label=label, name=name, status=status, ancestor=ancestor)
+        # one image handle per image ID; the images are used by the containers so they
+        # are present and there's no need to check it
+        images = {}
+        for c in self.d.containers(all=True, filters=filters or None):
+            container_name = None
             names = c.get("Names", None)
             if names:
-                name = names[0]
-            i = DockerImage(None, identifier=c["ImageID"])
-            cont = DockerContainer(i, c["Id"], name=name)
+                container_name = names[0]
+            i = images.get(c["ImageID"])
+            if i is None:
+                i = DockerImage(None, identifier=c["ImageID"],
+                                pull_policy=DockerImagePullPolicy.NEVER)
+                images[c["ImageID"]] = i
+            cont = DockerContainer(i, c["Id"], name=container_name)
             # TODO: docker_client.containers produces different metadata than inspect
-            inspect_to_container_metadata(cont.metadata, c, i)
-            result.append(cont)
+            cont.metadata = DockerContainerMetadata(c, i)
+            yield cont
+
+    def _inspect_many(self, inspect, identifiers, max_workers):
+        """
+        call inspect for every identifier using a bounded pool of threads, every thread uses
+        its own docker client from the client pool
+
+        :return: list of dicts, in the order of identifiers
+        """
+        if len(identifiers) <= 1:
+            return [inspect(i) for i in identifiers]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(identifiers))) as executor:
+            return list(executor.map(inspect, identifiers))
+
+    def inspect_containers(self, container_ids, max_workers=8):
+        """
+        Inspect multiple containers at once, the requests are sent concurrently. Inspect data
+        are also stored in the inspect cache, so the following calls of inspect() on these
+        containers are served from it.
+
+        :param container_ids: list of str
+        :param max_workers: int, maximum number of concurrent requests
+        :return: list of instances of ContainerMetadata, in the order of container_ids
+        """
+        container_ids = list(container_ids)
+        # resolve the method in the worker threads, so they use their own docker clients
+        inspected = self._inspect_many(lambda i: self.d.inspect_container(i), container_ids,
+                                       max_workers)
+        images = {}
+        result = []
+        for container_id, inspect_data in zip(container_ids, inspected):
+            self.inspect_cache.put(container_id, inspect_data)
+            image_id = inspect_data.get("Image")
+            if image_id not in images:
+                images[image_id] = DockerImage(None, identifier=image_id,
+                                               pull_policy=DockerImagePullPolicy.NEVER)
+            result.append(DockerContainerMetadata(inspect_data, images[image_id]))
         return result
 
-    def list_images(self):
+    def inspect_images(self, image_ids, max_workers=8):
+        """
+        Inspect multiple images at once; images which are not in the image cache yet are
+        inspected concurrently and stored in the cache.
+
+        :param image_ids: list of str
+        :param max_workers: int, maximum number of concurrent requests
+        :return: list of instances of ImageMetadata, in the order of image_ids
+        """
+        image_ids = list(image_ids)
+        cache = get_image_cache().images
+        cached = {i: cache.lookup(i) for i in image_ids}
+        missing = [i for i in image_ids if cached[i] is None]
+        inspected = self._inspect_many(lambda i: self.d.inspect_image(i), missing, max_workers)
+        for image_id, inspect_data in zip(missing, inspected):
+            cache.put(image_id, inspect_data)
+            cached[image_id] = inspect_data
+        return [DockerImageMetadata(cached[i]) for i in image_ids]
+
+    def _get_present_images(self):
+        present = set()
+        for im in self.d.images():
+            # both sha256:123... and 123...
+            present.update([im["Id"], im["Id"].split(":", 1)[-1]])
+            present.update(im.get("RepoTags") or [])
+        return present
+
+    def list_images(self, name=None, label=None):
         """
         List all available docker images.
 
@@ -85,20 +228,33 @@ class DockerBackend(Backend):
         amount of metadata in property `short_metadata`. These are just a subset
         of `.inspect()`, but don't require an API call against dockerd.
 
+        The filters are evaluated by dockerd, see `docker images --filter` for their semantics.
+
+        :param name: str, list only images of this repository, e.g. "fedora" or "fedora:29"
+        :param label: str, list of str ("key" or "key=value") or dict, list only images
+                      with these labels
         :return: collection of instances of :class:`conu.DockerImage`
         """
-        response = []
-        for im in self.d.images():
+        return list(self.iter_images(name=name, label=label))
+
+    def iter_images(self, name=None, label=None):
+        """
+        Same as list_images, but the image objects are created lazily, one by one.
+
+        :param name: str
+        :param label: str, list of str ("key" or "key=value") or dict
+        :return: generator of instances of :class:`conu.DockerImage`
+        """
+        filters = make_filters(label=label)
+        for im in self.d.images(name=name, filters=filters or None):
             try:
                 i_name, tag = parse_reference(im["RepoTags"][0])
             except (IndexError, TypeError):
                 i_name, tag = None, None
             d_im = DockerImage(i_name, tag=tag, identifier=im["Id"],
                                pull_policy=DockerImagePullPolicy.NEVER)
-            inspect_to_metadata(d_im.metadata, im)
-
-            response.append(d_im)
-        return response
+            d_im.metadata = DockerImageMetadata(im)
+            yield d_im
 
     def login(self, username, password=None, email=None, registry=None, reauth=False,
               dockercfg_path=None):
@@ -5,26 +5,188 @@
 #
 
 """
-singleton instance of docker.APIClient
+pool of docker.APIClient instances shared within the process
+
+docker.APIClient is a requests.Session and it's not safe to use a single instance from many
+threads at once, so every thread gets its own client with its own pool of connections.
+`get_client()` provides a proxy which forwards calls to the client of the calling thread,
+so it can be stored in objects used from multiple threads.
+
+Limit of connections per thread can be set via `DockerBackend(max_connections=...)` or
+`get_client_pool().configure(max_connections=...)`.
 """
 from __future__ import print_function, unicode_literals
 
+import logging
+import threading
+import weakref
+
 from conu.utils import check_docker_command_works
+from conu.utils.capabilities import get_capabilities
 
 import docker
 
 
+logger = logging.getLogger(__name__)
+
+
+class _ClientHolder(object):
+    """
+    Client assigned to a thread; when the thread ends, the holder is garbage collected and
+    the client is returned to the pool.
+    """
+
+    __slots__ = ("client", "generation", "__weakref__")
+
+    def __init__(self, client, generation):
+        self.client = client
+        self.generation = generation
+
+
+class DockerClientPool(object):
+    """
+    Provides a docker.APIClient for every thread. Clients of finished threads are kept
+    for reuse by new threads, e.g. by the workers of thread pools, so their connections
+    to the daemon stay open.
+    """
+
+    def __init__(self, max_connections=10, max_idle_clients=8, timeout=60):
+        """
+        :param max_connections: int, maximum number of connections to the docker daemon kept
+                                open by the client of a single thread
+        :param max_idle_clients: int, maximum number of clients kept for reuse
+        :param timeout: int, timeout of API calls (seconds)
+        """
+        self.max_connections = max_connections
+        self.max_idle_clients = max_idle_clients
+        self.timeout = timeout
+        self._local = threading.local()
+        # holders may be garbage collected while the lock is held
+        self._lock = threading.RLock()
+        self._idle = []
+        # incremented on configuration changes, clients from older generations are replaced
+        self._generation = 0
+
+    def _new_client(self, version):
+        try:
+            return docker.APIClient(version=version, timeout=self.timeout,  # >= 2
+                                    max_pool_size=self.max_connections)
+        except TypeError:
+            # max_pool_size is available since docker 4.3
+            return docker.APIClient(version=version, timeout=self.timeout)
+        except AttributeError:
+            return docker.Client(version=version, timeout=self.timeout)  # < 2
+
+    def _create_client(self):
+        # both are probed only once, see conu.utils.capabilities
+        check_docker_command_works()
+        negotiated = []
+
+        def negotiate():
+            negotiated.append(self._new_client("auto"))
+            return negotiated[0].api_version
+
+        version = get_capabilities().get("docker:api-version", negotiate)
+        return negotiated[0] if negotiated else self._new_client(version)
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        logger.debug("creating docker client for thread %s", threading.current_thread().name)
+        return self._create_client()
+
+    def _release(self, client, generation):
+        with self._lock:
+            if generation == self._generation and len(self._idle) < self.max_idle_clients:
+                self._idle.append(client)
+                return
+        client.close()
+
+    def get(self):
+        """
+        provide client of the calling thread
+
+        :return: instance of docker.APIClient
+        """
+        holder = getattr(self._local, "holder", None)
+        if holder is None or holder.generation != self._generation:
+            generation = self._generation
+            holder = _ClientHolder(self._acquire(), generation)
+            weakref.finalize(holder, self._release, holder.client, generation)
+            self._local.holder = holder
+        return holder.client
+
+    def configure(self, max_connections=None, timeout=None):
+        """
+        change parameters of the clients, threads get new clients on their next call
+
+        :param max_connections: int, maximum number of connections to the docker daemon kept
+                                open by the client of a single thread
+        :param timeout: int, timeout of API calls (seconds)
+        :return: None
+        """
+        if max_connections is not None:
+            self.max_connections = max_connections
+        if timeout is not None:
+            self.timeout = timeout
+        self.close()
+
+    def close(self):
+        """
+        close connections of the idle clients, threads get new clients on their next call
+
+        :return: None
+        """
+        with self._lock:
+            self._generation += 1
+            idle, self._idle = self._idle, []
+        for client in idle:
+            client.close()
+
+
+class DockerClientProxy(object):
+    """
+    Forwards attribute access to the docker.APIClient of the calling thread. Attributes are
+    resolved when accessed, so bound methods should not be passed to other threads.
+    """
+
+    def __init__(self, pool):
+        """
+        :param pool: instance of DockerClientPool
+        """
+        self._pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self._pool.get(), name)
+
+    def __repr__(self):
+        return "DockerClientProxy(%s)" % self._pool.get()
+
+
+_pool = None
 client = None
 
 
+def get_client_pool():
+    """
+    provide pool of docker clients shared within the process
+
+    :return: instance of DockerClientPool
+    """
+    global _pool
+    if _pool is None:
+        _pool = DockerClientPool()
+    return _pool
+
+
 def get_client():
+    """
+    provide docker client which can be used from any thread
+
+    :return: instance of DockerClientProxy, it has the same interface as docker.APIClient
+    """
     global client
     if client is None:
-        # FIXME: once we implement `run_via_api`, move this elsewhere; ideally to run_via_binary
-        #        and check only once
-        check_docker_command_works()
-        try:
-            client = docker.APIClient(version="auto")  # >= 2
-        except AttributeError:
-            client = docker.Client(version="auto")  # < 2
+        client = DockerClientProxy(get_client_pool())
     return client
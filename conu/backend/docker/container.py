@@ -13,210 +13,58 @@ import functools
 import logging
 import shutil
 import subprocess
+import time
 from tempfile import mkdtemp
 
+import six
+
 from docker.errors import NotFound
-from docker.types import Healthcheck
 
 from conu.apidefs.container import Container
 from conu.apidefs.image import Image
 from conu.apidefs.metadata import ContainerStatus
-from conu.backend.docker.container_parameters import DockerContainerParameters
 from conu.apidefs.filesystem import Filesystem
 from conu.apidefs.metadata import ContainerMetadata
 from conu.backend.docker.client import get_client
+from conu.backend.docker.events import get_event_monitor
+from conu.backend.docker.exec_session import DockerExecSession
+# DockerRunBuilder used to live here
+from conu.backend.docker.run_builder import DockerRunBuilder  # noqa: F401
 from conu.backend.docker.utils import inspect_to_container_metadata
 from conu.exceptions import ConuException
 from conu.utils import check_port, run_cmd, export_docker_container_to_directory, graceful_get
-from conu.utils.probes import Probe
-from conu.backend.docker.constants import CONU_ARTIFACT_TAG
+from conu.utils.cache import TTLCache
+from conu.utils.output_sinks import ListSink, OutputPump
+from conu.utils.probes import PauseSchedule, Probe
+from conu.utils.probe_stats import AdaptiveSchedule
 
 logger = logging.getLogger(__name__)
 
+inspect_cache = None
+
 
-class DockerRunBuilder(object):
+def get_inspect_cache():
     """
-    helper to execute `docker run` -- users can easily change or override anything
+    provide cache of `docker container inspect` data shared by all the docker containers; entries
+    are invalidated by lifecycle methods of DockerContainer and by docker events (while the
+    event monitor is running); it's used by inspect(refresh=True) only while the event monitor
+    is running or when `inspect_ttl` was set on the backend, otherwise such calls always ask
+    the daemon
+
+    :return: instance of :class:`conu.utils.cache.TTLCache`
     """
+    global inspect_cache
+    if inspect_cache is None:
+        inspect_cache = TTLCache()
 
-    def __init__(self, command=None, additional_opts=None):
-        """
-        Build `docker run` command
+        def invalidate(container_id, event):
+            name = graceful_get(event, "Actor", "Attributes", "name")
+            # containers may be addressed by a short ID, events carry the full one
+            inspect_cache.invalidate_if(
+                lambda key: key == name or (key and container_id.startswith(key)))
 
-        :param command: list of str, command to run in the container, examples:
-            - ["ls", "/"]
-            - ["bash", "-c", "ls / | grep bin"]
-        :param additional_opts: list of str, additional options for `docker run`
-        """
-        self.binary = ["docker"]
-        self.global_options = []
-        # there is no `docker container` on centos (docker-1.12.6-71.git3e8e77d.el7.centos.1.x86_64)
-        self.command = ["run"]
-        self.options = additional_opts or []
-        self.image_name = None
-        self.arguments = command or []
-
-    def __str__(self):
-        return str(self.build())
-
-    def build(self):
-        return self.binary + self.global_options + self.command + self.options + \
-            ["-l", CONU_ARTIFACT_TAG] + [self.image_name] + self.arguments
-
-    def get_parameters(self):
-        """
-        Parse DockerRunBuilder options and create object with properties for docker-py run command
-        :return: DockerContainerParameters
-        """
-        import argparse
-        parser = argparse.ArgumentParser(add_help=False)
-
-        # without parameter
-        parser.add_argument("-i", "--interactive", action="store_true", dest="stdin_open")
-        parser.add_argument("-d", "--detach", action="store_true", dest="detach")
-        parser.add_argument("-t", "--tty", action="store_true", dest="tty")
-        parser.add_argument("--init", action="store_true", dest="init")
-        parser.add_argument("--privileged", action="store_true", dest="privileged")
-        parser.add_argument("-P", "--publish-all", action="store_true", dest="publish_all_ports")
-        parser.add_argument("--read-only", action="store_true", dest="read_only")
-        parser.add_argument("--rm", action="store_true", dest="remove")
-
-        # string parameter
-        parser.add_argument("--entrypoint", action="store", dest="entrypoint")
-        parser.add_argument("-h", "--hostname", action="store", dest="hostname")
-        parser.add_argument("--name", action="store", dest="name")
-        parser.add_argument("--ipc", action="store", dest="ipc_mode")
-        parser.add_argument("--isolation", action="store", dest="isolation")
-        parser.add_argument("--mac-address", action="store", dest="mac_address")
-        parser.add_argument("-m", "--memory", action="store", dest="mem_limit")
-        parser.add_argument("--network", action="store", dest="network")
-        parser.add_argument("--platform", action="store", dest="platform")
-        parser.add_argument("--runtime", action="store", dest="runtime")
-        parser.add_argument("--stop-signal", action="store", dest="stop_signal")
-        parser.add_argument("-u", "--user", action="store", dest="user")
-        parser.add_argument("-w", "--workdir", action="store", dest="working_dir")
-
-        # int parameter
-        parser.add_argument("--pids-limit", action="store", dest="pids_limit", type=int)
-
-        # list parameter
-        parser.add_argument("-e", "--env", action="append", dest="env_variables")
-        parser.add_argument("--cap-add", action="append", dest="cap_add")
-        parser.add_argument("--cap-drop", action="append", dest="cap_drop")
-        parser.add_argument("--device", action="append", dest="devices")
-        parser.add_argument("--dns", action="append", dest="dns")
-        parser.add_argument("--group-add", action="append", dest="group_add")
-        parser.add_argument("--mount", action="append", dest="mounts")
-        parser.add_argument("-v", "--volume", action="append", dest="volumes")
-
-        # dict parameter
-        parser.add_argument("-l", "--label", action="append", dest="labels")
-        parser.add_argument("-p", "--publish", action="append", dest="port_mappings")
-
-        # health
-        parser.add_argument("--health-cmd", action="store", dest="health_cmd")
-        parser.add_argument("--health-interval", action="store", dest="health_interval", type=int)
-        parser.add_argument("--health-retries", action="store", dest="health_retries", type=int)
-        parser.add_argument("--health-timeout", action="store", dest="health_timeout", type=int)
-        parser.add_argument("--no-healthcheck", action="store_true", dest="no_healthcheck")
-
-        args, _ = parser.parse_known_args(args=self.options)
-        command = self.arguments
-
-        options_dict = vars(args)
-
-        # create Healthcheck object
-        if not options_dict.pop("no_healthcheck", None):
-            options_dict["healthcheck"] = Healthcheck(
-                test=options_dict.pop("health_cmd", None),
-                interval=options_dict.pop("health_interval", None),
-                timeout=options_dict.pop("health_timeout", None),
-                retries=options_dict.pop("health_retries", None)
-            )
-        else:
-            options_dict['healthcheck'] = None
-
-        # parse dictionary
-        # {'name': 'separator'}
-        with_dictionary_parameter = {'labels': '='}
-        for name, separator in with_dictionary_parameter.items():
-            if options_dict[name] is not None:
-                dictionary = {}
-                for item in options_dict[name]:
-                    try:
-                        key, value = item.split(separator)
-                        dictionary[key] = value
-                    except ValueError:
-                        dictionary = options_dict[name]
-                        raise ConuException('Wrong format of dictionary: {name}'.format(name=name))
-                        break
-                options_dict[name] = dictionary
-
-        # parse ports
-        # create dictionary according to https://docker-py.readthedocs.io/en/stable/containers.html
-        if options_dict['port_mappings'] is not None:
-            dictionary = {}
-            for port_string in options_dict['port_mappings']:
-                colon_count = port_string.count(':')
-                if colon_count == 2:
-                    split_array = port_string.split(':')
-                    if split_array[1] == '':
-                        # format - ip::containerPort
-                        # create dictionary - {'1111/tcp': ('127.0.0.1', None)}
-                        dictionary[split_array[2]] = (split_array[0], None)
-                    else:
-                        # format - ip:hostPort:containerPort
-                        # create dictionary - {'1111/tcp': ('127.0.0.1', 1111)}
-                        dictionary[split_array[2]] = (split_array[0], int(split_array[1]))
-                elif colon_count == 1:
-                    # format - hostPort:containerPort
-                    # create dictionary - {'2222/tcp': 3333}
-                    split_array = port_string.split(':')
-                    dictionary[split_array[1]] = int(split_array[0])
-                elif colon_count == 0:
-                    # format - containerPort
-                    # create dictionary - {'2222/tcp': None}
-                    dictionary[port_string] = None
-                else:
-                    raise ConuException('Wrong format of port mappings')
-
-            options_dict['port_mappings'] = dictionary
-
-        container_parameters = DockerContainerParameters(cap_add=options_dict['cap_add'],
-                                                         cap_drop=options_dict['cap_drop'],
-                                                         command=command, detach=options_dict['detach'],
-                                                         devices=options_dict['devices'], dns=options_dict['dns'],
-                                                         entrypoint=options_dict['entrypoint'],
-                                                         env_variables=options_dict['env_variables'],
-                                                         group_add=options_dict['group_add'],
-                                                         healthcheck=options_dict['healthcheck'],
-                                                         hostname=options_dict['hostname'],
-                                                         init=options_dict['init'],
-                                                         ipc_mode=options_dict['ipc_mode'],
-                                                         isolation=options_dict['isolation'],
-                                                         labels=options_dict['labels'],
-                                                         mac_address=options_dict['mac_address'],
-                                                         mem_limit=options_dict['mem_limit'],
-                                                         mounts=options_dict['mounts'],
-                                                         name=options_dict['name'],
-                                                         network=options_dict['network'],
-                                                         pids_limit=options_dict['pids_limit'],
-                                                         platform=options_dict['platform'],
-                                                         port_mappings=options_dict['port_mappings'],
-                                                         privileged=options_dict['privileged'],
-                                                         publish_all_ports=options_dict['publish_all_ports'],
-                                                         read_only=options_dict['read_only'],
-                                                         remove=options_dict['remove'],
-                                                         runtime=options_dict['runtime'],
-                                                         stdin_open=options_dict['stdin_open'],
-                                                         stop_signal=options_dict['stop_signal'],
-                                                         tty=options_dict['tty'],
-                                                         user=options_dict['user'],
-                                                         volumes=options_dict['volumes'],
-                                                         working_dir=options_dict['working_dir']
-                                                         )
-
-        return container_parameters
+        get_event_monitor().add_callback(invalidate)
+    return inspect_cache
 
 
 class DockerContainerViaExportFS(Filesystem):
@@ -287,20 +135,37 @@ class DockerContainer(Container):
         """
         return cached metadata by default
 
-        :param refresh: bool, returns up to date metadata if set to True
+        :param refresh: bool, returns up to date metadata if set to True; while the docker
+                        event monitor is running or `inspect_ttl` was set on the backend,
+                        the data may come from the inspect cache shared by all docker
+                        containers, see :func:`get_inspect_cache`
         :return: dict
         """
         if refresh or not self._inspect_data:
             ident = self._id or self.name
             if not ident:
                 raise ConuException("This container does not have a valid identifier.")
-            self._inspect_data = self.d.inspect_container(ident)
+            cache = get_inspect_cache()
+            # without events, the cache doesn't know about changes done outside of conu,
+            # unless the user accepted data up to `ttl` seconds old
+            force = refresh and not cache.explicit_ttl and not get_event_monitor().is_running()
+            self._inspect_data = cache.get(ident, self.d.inspect_container, force=force)
         return self._inspect_data
 
+    def invalidate_inspect_cache(self):
+        """
+        forget cached inspect data of this container, the next call of inspect(refresh=True)
+        asks docker daemon; host and port for HTTP requests are resolved again as well
+
+        :return: None
+        """
+        get_inspect_cache().invalidate(self._id, self.name)
+        self.invalidate_http_endpoint()
+
     def is_running(self):
         """
-        returns True if the container is running, this method should always ask the API and
-        should not use a cached value
+        returns True if the container is running, the value is obtained from the inspect cache
+        while the docker event monitor is running, see :meth:`inspect`
 
         :return: bool
         """
@@ -382,12 +247,11 @@ class DockerContainer(Container):
         if not port:
             return port_mappings
 
-        if str(port) not in self.get_ports():
-            return []
-
-        for p in port_mappings:
+        # look the port up in the same inspect data, get_ports() would inspect again
+        for p in port_mappings or {}:
             if p.split("/")[0] == str(port):
                 return port_mappings[p]
+        return []
 
     def get_image_name(self):
         """
@@ -400,17 +264,32 @@ class DockerContainer(Container):
             return metadata["Config"].get("Image", None)
         return None
 
-    def wait_for_port(self, port, timeout=10, **probe_kwargs):
+    def wait_for_port(self, port, timeout=10, adaptive=False, **probe_kwargs):
         """
         block until specified port starts accepting connections, raises an exc ProbeTimeout
         if timeout is reached
 
         :param port: int, port number
         :param timeout: int or float (seconds), time to wait for establishing the connection
-        :param probe_kwargs: arguments passed to Probe constructor
+        :param adaptive: bool, learn how long it takes until the port is open for this image
+                         and check the port mostly around that time, see
+                         :class:`conu.utils.probe_stats.AdaptiveSchedule`
+        :param probe_kwargs: arguments passed to Probe constructor, e.g.
+                             pause=conu.utils.probes.FastStart(); when only `pause` is set,
+                             the port is checked via :meth:`wait_for_ports`
         :return: None
         """
-        Probe(timeout=timeout, fnc=functools.partial(self.is_port_open, port), **probe_kwargs).run()
+        if adaptive and "pause" not in probe_kwargs:
+            probe_kwargs["pause"] = AdaptiveSchedule(self.image.get_id(), "wait_for_port:%s" % port)
+        if set(probe_kwargs) - {"pause"}:
+            Probe(timeout=timeout, fnc=functools.partial(self.is_port_open, port),
+                  **probe_kwargs).run()
+            return
+        pause = probe_kwargs.get("pause", 0.1)
+        start = time.time()
+        self.wait_for_ports([port], timeout=timeout, pause=pause)
+        if isinstance(pause, PauseSchedule):
+            pause.record(time.time() - start)
 
     def copy_to(self, src, dest):
         """
@@ -445,8 +324,10 @@ class DockerContainer(Container):
         :return: None
         """
         self.d.start(self.get_id())
+        self.invalidate_inspect_cache()
 
-    def execute(self, command, blocking=True, exec_create_kwargs=None, exec_start_kwargs=None):
+    def execute(self, command, blocking=True, exec_create_kwargs=None, exec_start_kwargs=None,
+                sink=None, stderr_sink=None, log_output=True, log_rate_limit=None):
         """
         Execute a command in this container -- the container needs to be running.
 
@@ -465,24 +346,51 @@ class DockerContainer(Container):
                 print(line)
             print("command finished")
 
+        Output of a blocking call is kept in memory unless you provide a sink, see
+        :mod:`conu.utils.output_sinks`:
+
+        ::
+
+            tail = RingBufferSink(size=4096)
+            container.execute(["dnf", "-y", "update"], sink=tail, log_output=False)
+
         :param command: list of str, command to execute in the container
         :param blocking: bool, if True blocks until the command finishes
         :param exec_create_kwargs: dict, params to pass to exec_create()
         :param exec_start_kwargs: dict, params to pass to exec_start()
-        :return: iterator if non-blocking or list of bytes if blocking
+        :param sink: instance of OutputSink, receives output of a blocking call
+        :param stderr_sink: instance of OutputSink, if set, stderr is demultiplexed and passed
+                            to this sink while stdout goes to `sink`
+        :param log_output: bool, log output of a blocking call line by line
+        :param log_rate_limit: int, maximum number of lines logged per second, no limit if None
+        :return: iterator if non-blocking, `sink` if it was provided, otherwise list of bytes
         """
         logger.info("running command %s", command)
 
         exec_create_kwargs = exec_create_kwargs or {}
         exec_start_kwargs = exec_start_kwargs or {}
         exec_start_kwargs["stream"] = True  # we want stream no matter what
+        demux = blocking and stderr_sink is not None
+        if demux:
+            exec_start_kwargs["demux"] = True
         exec_i = self.d.exec_create(self.get_id(), command, **exec_create_kwargs)
         output = self.d.exec_start(exec_i, **exec_start_kwargs)
         if blocking:
-            response = []
-            for line in output:
-                response.append(line)
-                logger.info("%s", line.decode("utf-8").strip("\n\r"))
+            response = ListSink() if sink is None else sink
+            pump = OutputPump(response, stderr_sink, log_output=log_output,
+                              log_rate_limit=log_rate_limit)
+            try:
+                for chunk in output:
+                    if demux:
+                        stdout, stderr = chunk
+                        if stdout:
+                            pump.write(stdout)
+                        if stderr:
+                            pump.write(stderr, stderr=True)
+                    else:
+                        pump.write(chunk)
+            finally:
+                pump.close()
 
             e_inspect = self.d.exec_inspect(exec_i)
             exit_code = e_inspect["ExitCode"]
@@ -491,10 +399,20 @@ class DockerContainer(Container):
                 logger.info("exec metadata: %s", e_inspect)
                 raise ConuException("failed to execute command %s, exit code %s" % (
                                     command, exit_code))
-            return response
+            return response.chunks if sink is None else sink
         # TODO: for interactive use cases we need to provide API so users can do exec_inspect
         return output
 
+    def session(self, shell="/bin/sh"):
+        """
+        start a persistent shell in this container, all the commands go through
+        a single exec instance
+
+        :param shell: str, path to the shell in the container
+        :return: instance of :class:`conu.backend.docker.exec_session.DockerExecSession`
+        """
+        return DockerExecSession(self.d, self.get_id(), shell=shell)
+
     def logs(self, follow=False):
         """
         Get logs from this container. Every item of the iterator contains one log line
@@ -548,6 +466,7 @@ class DockerContainer(Container):
         :return: None
         """
         self.d.stop(self.get_id())
+        self.invalidate_inspect_cache()
 
     def kill(self, signal=None):
         """
@@ -558,6 +477,22 @@ class DockerContainer(Container):
         :return: None
         """
         self.d.kill(self.get_id(), signal=signal)
+        self.invalidate_inspect_cache()
+
+    def commit(self, repository, tag="latest"):
+        """
+        create an image from the current state of this container
+
+        :param repository: str, name of the new image
+        :param tag: str, tag of the new image
+        :return: instance of DockerImage
+        """
+        # conu.backend.docker.image imports this module
+        from conu.backend.docker.image import DockerImage, DockerImagePullPolicy
+
+        response = self.d.commit(self.get_id(), repository=repository, tag=tag)
+        return DockerImage(repository, tag=tag, identifier=response["Id"],
+                           pull_policy=DockerImagePullPolicy.NEVER)
 
     def delete(self, force=False, volumes=False, **kwargs):
         """
@@ -569,6 +504,7 @@ class DockerContainer(Container):
         :return: None
         """
         self.d.remove_container(self.get_id(), v=volumes, force=force)
+        self.invalidate_inspect_cache()
 
     def mount(self, mount_point=None):
         """
@@ -595,7 +531,59 @@ class DockerContainer(Container):
         :param timeout: int, Request timeout
         :return: int, exit code
         """
-        return self.d.wait(self.get_id(), timeout)
+        try:
+            return self.d.wait(self.get_id(), timeout)
+        finally:
+            self.invalidate_inspect_cache()
+
+    def wait_for_status(self, status, timeout=None):
+        """
+        Block until the container gets to the selected status. State changes are received
+        from the docker event stream, so the container is not polled.
+
+        :param status: str or list of str, one of: 'created', 'running', 'paused', 'exited',
+                       'removed'
+        :param timeout: int or float (seconds), None means forever
+        :return: instance of ContainerState
+        """
+        statuses = [status] if isinstance(status, six.string_types) else list(status)
+        states = get_event_monitor().wait_for(
+            [self.get_id()], lambda s: s.status in statuses, timeout=timeout)
+        return states[self.get_id()]
+
+    def wait_for_exit(self, timeout=None):
+        """
+        Block until the container exits; unlike :meth:`wait`, this method doesn't keep an HTTP
+        request open per container, it utilizes the shared docker event stream.
+
+        :param timeout: int or float (seconds), None means forever
+        :return: int, exit code (None if the container was removed and the code is not known)
+        """
+        return self.wait_for_status(["exited", "dead", "removed"], timeout=timeout).exit_code
+
+    def wait_for_healthy(self, timeout=None):
+        """
+        Block until the HEALTHCHECK of the container reports a result. The check is performed
+        by docker daemon itself (see `--health-cmd` and friends), this method only listens for
+        `health_status` events, so nothing is executed in the container by conu.
+
+        :param timeout: int or float (seconds), None means forever
+        :return: bool, True if the container is healthy, False if it's unhealthy or it stopped
+        """
+        healthcheck = graceful_get(self.inspect(refresh=True), "Config", "Healthcheck", "Test")
+        if not healthcheck or healthcheck[0] == "NONE":
+            raise ConuException("Container %s doesn't have a healthcheck configured." % self)
+
+        def is_decided(state):
+            return state.health in ("healthy", "unhealthy") or \
+                state.status in ("exited", "dead", "removed")
+
+        states = get_event_monitor().wait_for([self.get_id()], is_decided, timeout=timeout)
+        state = states[self.get_id()]
+        logger.debug("container %s: status=%s, health=%s", self, state.status, state.health)
+        # the status is None if no lifecycle event was seen: the container is not known
+        # to be stopped
+        return state.health == "healthy" and state.status in ("running", None)
 
     def exit_code(self):
         """
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Consumer of the docker daemon's event stream: a single connection to `/events` is shared by
+everything which waits for a container state change.
+"""
+from __future__ import print_function, unicode_literals
+
+import collections
+import logging
+import threading
+import time
+
+import docker.errors
+
+from conu.backend.docker.client import get_client
+from conu.exceptions import ProbeTimeout
+from conu.utils import graceful_get
+
+logger = logging.getLogger(__name__)
+
+
+# container event action -> status as reported by `docker inspect`; "removed" is not a docker
+# status, it signals that the container doesn't exist anymore
+EVENT_TO_STATUS = {
+    "create": "created",
+    "start": "running",
+    "restart": "running",
+    "unpause": "running",
+    "pause": "paused",
+    "die": "exited",
+    "destroy": "removed",
+}
+
+# how many IDs of removed containers are remembered
+REMOVED_HISTORY_SIZE = 1024
+
+
+class ContainerState(object):
+    """
+    Last known state of a container.
+    """
+
+    def __init__(self, status=None, exit_code=None, health=None):
+        """
+        :param status: str, one of: 'created', 'restarting', 'running', 'paused', 'exited',
+                       'dead', 'removed'
+        :param exit_code: int or None
+        :param health: str or None, one of: 'starting', 'healthy', 'unhealthy'
+        """
+        self.status = status
+        self.exit_code = exit_code
+        self.health = health
+
+    def __repr__(self):
+        return "ContainerState(status=%s, exit_code=%s, health=%s)" % (
+            self.status, self.exit_code, self.health)
+
+    @classmethod
+    def from_inspect(cls, inspect_data):
+        """
+        :param inspect_data: dict, output of `docker container inspect`
+        :return: instance of ContainerState
+        """
+        return cls(status=graceful_get(inspect_data, "State", "Status"),
+                   exit_code=graceful_get(inspect_data, "State", "ExitCode"),
+                   health=graceful_get(inspect_data, "State", "Health", "Status"))
+
+
+class DockerEventMonitor(object):
+    """
+    Reads container events from docker daemon in a background thread, keeps the last known
+    state of every container and wakes up the threads waiting for a state change. States are
+    keyed by full container IDs and dropped once the container is removed. Other
+    components can register callbacks which are invoked for every container event.
+
+    The monitor is started lazily, by the first waiter.
+    """
+
+    def __init__(self, client=None):
+        """
+        :param client: instance of docker.APIClient, the shared client is used if not set
+        """
+        self._client = client
+        self._condition = threading.Condition()
+        self._states = {}
+        # short IDs and names used by callers -> full container IDs
+        self._aliases = {}
+        # full IDs of recently removed containers, their states are not kept
+        self._removed = collections.OrderedDict()
+        self._callbacks = []
+        self._stream = None
+        self._thread = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_client()
+        return self._client
+
+    def is_running(self):
+        """
+        :return: bool, True if the event stream is being consumed
+        """
+        return self._stream is not None
+
+    def start(self):
+        """
+        subscribe to the event stream, no-op if already subscribed; once this method returns,
+        no event is missed
+
+        :return: None
+        """
+        with self._condition:
+            if self.is_running():
+                return
+            # the HTTP request is done here, events are buffered from now on
+            stream = self.client.events(decode=True, filters={"type": "container"})
+            self._stream = stream
+            # the states may be out of date since we were not listening
+            self._states = {}
+            self._aliases = {}
+            self._thread = threading.Thread(target=self._loop, args=(stream, ))
+            self._thread.daemon = True
+            self._thread.start()
+        logger.debug("subscribed to docker events")
+
+    def stop(self):
+        """
+        close the event stream
+
+        :return: None
+        """
+        with self._condition:
+            stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception as ex:
+                logger.debug("error while closing the event stream: %s", ex)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def add_callback(self, callback):
+        """
+        invoke the callback for every container event, it is called from the monitor thread
+        with two arguments: container ID and the raw event (dict)
+
+        :param callback: callable
+        :return: None
+        """
+        with self._condition:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        """
+        :param callback: callable, previously registered via add_callback
+        :return: None
+        """
+        with self._condition:
+            self._callbacks.remove(callback)
+
+    def _loop(self, stream):
+        try:
+            for event in stream:
+                self.process_event(event)
+        except Exception as ex:
+            # closing the stream from another thread ends up here as well
+            logger.debug("docker event stream ended: %s", ex)
+        finally:
+            with self._condition:
+                if self._stream is stream:
+                    self._stream = None
+                self._condition.notify_all()
+            logger.debug("unsubscribed from docker events")
+
+    def process_event(self, event):
+        """
+        update state of a container using the provided event and notify waiters
+
+        :param event: dict, decoded docker event
+        :return: None
+        """
+        if graceful_get(event, "Type") not in (None, "container"):
+            return
+        container_id = graceful_get(event, "Actor", "ID") or graceful_get(event, "id")
+        action = graceful_get(event, "Action") or graceful_get(event, "status") or ""
+        if not container_id:
+            return
+        logger.debug("docker event: %s %s", action, container_id)
+        with self._condition:
+            if action == "destroy":
+                state = self._states.pop(container_id, None) or ContainerState()
+                self._forget(container_id)
+            elif container_id in self._states or action in EVENT_TO_STATUS:
+                state = self._states.setdefault(container_id, ContainerState())
+            else:
+                # e.g. exec_start or health_status of a container which started before we
+                # subscribed: a state without status would be served to waiters instead of
+                # inspecting the container, so none is stored
+                state = ContainerState()
+            if action in EVENT_TO_STATUS:
+                state.status = EVENT_TO_STATUS[action]
+            if action == "die":
+                exit_code = graceful_get(event, "Actor", "Attributes", "exitCode")
+                state.exit_code = int(exit_code) if exit_code is not None else None
+            elif action == "start":
+                state.exit_code = 0
+                state.health = None
+            elif action.startswith("health_status"):
+                # e.g. "health_status: healthy"
+                state.health = action.split(":", 1)[-1].strip()
+            callbacks = list(self._callbacks)
+        # callbacks are invoked before waking up the waiters so they can rely on them,
+        # e.g. on invalidation of cached data
+        for callback in callbacks:
+            try:
+                callback(container_id, event)
+            except Exception as ex:
+                logger.error("callback %s failed on event %s: %s", callback, event, ex)
+        with self._condition:
+            self._condition.notify_all()
+
+    def _forget(self, full_id):
+        """ drop aliases of a removed container and remember it was removed """
+        for alias in [a for a, i in self._aliases.items() if i == full_id]:
+            del self._aliases[alias]
+        self._removed[full_id] = None
+        while len(self._removed) > REMOVED_HISTORY_SIZE:
+            self._removed.popitem(last=False)
+
+    def get_state(self, container_id):
+        """
+        provide the last known state of the container, if the monitor doesn't know the
+        container yet, it's inspected
+
+        :param container_id: str, full or short ID, or name of the container
+        :return: instance of ContainerState
+        """
+        with self._condition:
+            full_id = self._aliases.get(container_id, container_id)
+            if full_id in self._removed:
+                return ContainerState(status="removed")
+            state = self._states.get(full_id)
+        if state is not None:
+            return state
+        try:
+            inspect_data = self.client.inspect_container(container_id)
+        except docker.errors.NotFound:
+            return ContainerState(status="removed")
+        # events carry full IDs
+        full_id = graceful_get(inspect_data, "Id") or container_id
+        with self._condition:
+            if full_id in self._removed:
+                return ContainerState(status="removed")
+            if full_id != container_id:
+                self._aliases[container_id] = full_id
+            # an event which arrived in the meantime is more recent than the inspect data
+            return self._states.setdefault(full_id, ContainerState.from_inspect(inspect_data))
+
+    def wait_for(self, container_ids, predicate, timeout=None):
+        """
+        block until predicate is true for the state of all the containers
+
+        :param container_ids: list of str
+        :param predicate: callable, accepts ContainerState, returns bool
+        :param timeout: int or float (seconds), None means forever
+        :return: dict, {container_id: ContainerState}
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            self.start()
+            states = {c: self.get_state(c) for c in container_ids}
+            with self._condition:
+                while self.is_running():
+                    if all(predicate(s) for s in states.values()):
+                        return states
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        raise ProbeTimeout("Timeout exceeded.")
+                    self._condition.wait(remaining)
+            logger.info("docker event stream was interrupted, subscribing again")
+
+
+_monitor = None
+
+
+def get_event_monitor():
+    """
+    provide event monitor shared within the process
+
+    :return: instance of DockerEventMonitor
+    """
+    global _monitor
+    if _monitor is None:
+        _monitor = DockerEventMonitor()
+    return _monitor
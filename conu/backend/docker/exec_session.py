@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Persistent shell session in a docker container, attached via the exec API.
+"""
+
+import logging
+import socket
+import struct
+
+from conu.utils.exec_session import ExecSession
+
+
+logger = logging.getLogger(__name__)
+
+
+class DockerExecSession(ExecSession):
+    """
+    Shell started by a single exec instance; stdin and stdout are attached to a socket
+    of the exec API, the output is multiplexed into frames: an 8 byte header (stream type,
+    3 zero bytes, big endian size) followed by the data.
+    """
+
+    def __init__(self, client, container_id, shell="/bin/sh"):
+        """
+        :param client: instance of docker.APIClient
+        :param container_id: str
+        :param shell: str, path to the shell in the container
+        """
+        super(DockerExecSession, self).__init__(shell=shell)
+        exec_id = client.exec_create(container_id, [shell], stdin=True, stdout=True,
+                                     stderr=True, tty=False)
+        response = client.exec_start(exec_id, socket=True)
+        # SocketIO or a socket depending on docker-py version
+        self._sock = getattr(response, "_sock", response)
+        self._frame_remaining = 0
+
+    def _write(self, data):
+        self._sock.sendall(data)
+
+    def _recv_exactly(self, n):
+        data = b""
+        while len(data) < n:
+            chunk = self._sock.recv(n - len(data))
+            if not chunk:
+                return b""
+            data += chunk
+        return data
+
+    def _read(self):
+        while not self._frame_remaining:
+            header = self._recv_exactly(8)
+            if not header:
+                return b""
+            _, self._frame_remaining = struct.unpack(">BxxxL", header)
+        data = self._sock.recv(min(self._frame_remaining, 65536))
+        self._frame_remaining -= len(data)
+        return data
+
+    def _close(self):
+        try:
+            self._sock.shutdown(socket.SHUT_WR)
+        except (IOError, OSError):
+            pass
+        self._sock.close()
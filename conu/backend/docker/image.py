@@ -13,35 +13,49 @@ import logging
 import os
 import shutil
 import subprocess
+import time
 import enum
 from tempfile import mkdtemp
 
 import six
 
-from kubernetes.client.rest import ApiException
-
 from conu.apidefs.metadata import ImageMetadata
 from conu.apidefs.backend import get_backend_tmpdir
 from conu.apidefs.filesystem import Filesystem
 from conu.apidefs.image import Image, S2Image
 from conu.backend.docker.client import get_client
-from conu.backend.docker.container import DockerContainer, DockerRunBuilder
+from conu.backend.docker.constants import CONU_ARTIFACT_TAG
+from conu.backend.docker.container import DockerContainer
+from conu.backend.docker.run_builder import DockerRunBuilder
 from conu.backend.docker.container_parameters import DockerContainerParameters
 from conu.backend.docker.utils import inspect_to_metadata
 from conu.backend.docker.skopeo import transport_param, SkopeoTransport
 from conu.exceptions import ConuException
-from conu.utils import run_cmd, random_tmp_filename, s2i_command_exists, \
+from conu.utils import run_cmd, random_str, random_tmp_filename, s2i_command_exists, \
     graceful_get, export_docker_container_to_directory
+from conu.utils.cache import ImageInspectCache
+from conu.utils.cidfile import wait_for_cidfile
 from conu.utils.filesystem import Volume
-from conu.utils.probes import Probe
 from conu.utils.rpms import check_signatures
-from conu.backend.k8s.pod import Pod
-from conu.backend.k8s.client import get_core_api
 
 import docker.errors
 
 logger = logging.getLogger(__name__)
 
+image_cache = None
+
+
+def get_image_cache():
+    """
+    provide cache of `docker image inspect` data shared by all the docker images
+
+    :return: instance of :class:`conu.utils.cache.ImageInspectCache`
+    """
+    global image_cache
+    if image_cache is None:
+        image_cache = ImageInspectCache.for_backend("docker")
+    return image_cache
+
 
 class DockerImageViaArchiveFS(Filesystem):
     def __init__(self, image, mount_point=None):
@@ -101,13 +115,16 @@ class DockerImage(Image):
     """
 
     def __init__(self, repository, tag="latest", identifier=None,
-                 pull_policy=DockerImagePullPolicy.IF_NOT_PRESENT):
+                 pull_policy=DockerImagePullPolicy.IF_NOT_PRESENT, lazy=False):
         """
         :param repository: str, image name, examples: "fedora", "registry.fedoraproject.org/fedora",
                             "tomastomecek/sen", "docker.io/tomastomecek/sen"
         :param tag: str, tag of the image, when not specified, "latest" is implied
         :param identifier: str, unique identifier for this image
         :param pull_policy: enum, strategy to apply for pulling the image
+        :param lazy: bool, apply the pull policy once the image is used for the first time
+                     (e.g. when a container is created), not in the constructor; see also
+                     `ensure_present` method of the backend
         """
         super(DockerImage, self).__init__(repository, tag=tag)
         if not isinstance(tag, (six.string_types, None.__class__)):
@@ -126,15 +143,9 @@ class DockerImage(Image):
             else SkopeoTransport.DOCKER_DAEMON
         self.path = None
 
-        if self.pull_policy == DockerImagePullPolicy.ALWAYS:
-            logger.debug("pull policy set to 'always', pulling the image")
-            self.pull()
-        elif self.pull_policy == DockerImagePullPolicy.IF_NOT_PRESENT and not self.is_present():
-            logger.debug("pull policy set to 'if_not_present' and image is not present, "
-                         "pulling the image")
-            self.pull()
-        elif self.pull_policy == DockerImagePullPolicy.NEVER:
-            logger.debug("pull policy set to 'never'")
+        self._pull_policy_pending = True
+        if not lazy:
+            self._apply_pull_policy()
 
     def __repr__(self):
         return "DockerImage(repository=%s, tag=%s)" % (self.name, self.tag)
@@ -150,12 +161,45 @@ class DockerImage(Image):
         """
         return "%s:%s" % (self.name, self.tag)
 
+    def _is_in(self, present):
+        """
+        :param present: set of str, names and IDs of images present on the system, or None
+        :return: bool, True if the image is present
+        """
+        if present is not None:
+            if self.get_full_name() in present or (self._id and self._id in present):
+                return True
+        # a different form of the name or a short ID may have been used, ask directly
+        return self.is_present()
+
+    def _apply_pull_policy(self, present=None):
+        """
+        apply the pull policy unless it was applied already
+
+        :param present: set of str, names and IDs of images present on the system; if it's not
+                        provided, the presence of the image is checked directly
+        :return: None
+        """
+        if not self._pull_policy_pending:
+            return
+        self._pull_policy_pending = False
+        if self.pull_policy == DockerImagePullPolicy.ALWAYS:
+            logger.debug("pull policy set to 'always', pulling the image")
+            self.pull()
+        elif self.pull_policy == DockerImagePullPolicy.IF_NOT_PRESENT and not self._is_in(present):
+            logger.debug("pull policy set to 'if_not_present' and image is not present, "
+                         "pulling the image")
+            self.pull()
+        elif self.pull_policy == DockerImagePullPolicy.NEVER:
+            logger.debug("pull policy set to 'never'")
+
     def get_id(self):
         """
         get unique identifier of this image
 
         :return: str
         """
+        self._apply_pull_policy()
         if self._id is None:
             self._id = self.inspect(refresh=False)["Id"]
         return self._id
@@ -168,7 +212,8 @@ class DockerImage(Image):
         """
         # TODO: move this method to generic API
         try:
-            return bool(self.inspect())
+            # the image cache can't tell whether the image is still present
+            return bool(self.d.inspect_image(self._id or self.get_full_name()))
         except docker.errors.DockerException:
             return False
 
@@ -189,6 +234,7 @@ class DockerImage(Image):
                 logger.error(status)
                 raise ConuException("There was an error while pulling the image %s: %s",
                                     self.name, error)
+        get_image_cache().invalidate_names(self.get_full_name())
         self.using_transport(SkopeoTransport.DOCKER_DAEMON)
 
     def push(self, repository=None, tag=None):
@@ -342,20 +388,28 @@ class DockerImage(Image):
         r = repository or self.name
         t = "latest" if not tag else tag
         self.d.tag(image=self.get_full_name(), repository=r, tag=t)
+        get_image_cache().invalidate_names("%s:%s" % (r, t))
         return DockerImage(r, tag=t)
 
     def inspect(self, refresh=True):
         """
         provide metadata about the image; flip refresh=True if cached metadata are enough
 
-        :param refresh: bool, update the metadata with up to date content
+        :param refresh: bool, update the metadata with up to date content; data of an image ID
+                        never change, so they are served from the image cache, only the name
+                        of the image is resolved to an ID again, see :func:`get_image_cache`
         :return: dict
         """
+        self._apply_pull_policy()
         if refresh or not self._inspect_data:
             identifier = self._id or self.get_full_name()
             if not identifier:
                 raise ConuException("This image does not have a valid identifier.")
-            self._inspect_data = self.d.inspect_image(identifier)
+            if self._id:
+                self._inspect_data = get_image_cache().get_by_id(self._id, self.d.inspect_image)
+            else:
+                self._inspect_data = get_image_cache().get_by_name(
+                    identifier, self.d.inspect_image)
         return self._inspect_data
 
     def rmi(self, force=False, via_name=False):
@@ -367,6 +421,10 @@ class DockerImage(Image):
         :return: None
         """
         self.d.remove_image(self.get_full_name() if via_name else self.get_id(), force=force)
+        cache = get_image_cache()
+        cache.invalidate_names(self.get_full_name())
+        # inspect() of this image must not be served from the cache anymore
+        cache.invalidate_id(self._id, graceful_get(self._inspect_data, cache.id_key))
 
     def mount(self, mount_point=None):
         """
@@ -376,6 +434,7 @@ class DockerImage(Image):
                              provided, mkdtemp(dir="/var/tmp") is used
         :return: instance of :class:`conu.apidefs.filesystem.Filesystem`
         """
+        self._apply_pull_policy()
         return DockerImageViaArchiveFS(self, mount_point=mount_point)
 
     def _run_container(self, run_command_instance, callback):
@@ -385,25 +444,15 @@ class DockerImage(Image):
         run_command_instance.options += ["--cidfile=%s" % tmpfile]
         logger.debug("docker command: %s" % run_command_instance)
         response = callback()
-
-        def get_cont_id():
-            if not os.path.exists(tmpfile):
-                return False
-            with open(tmpfile, 'r') as fd:
-                content = fd.read()
-            return bool(content)
-
-        Probe(timeout=2, count=10, pause=0.1, fnc=get_cont_id).run()
-
-        with open(tmpfile, 'r') as fd:
-            container_id = fd.read()
-
-        if not container_id:
+        try:
+            container_id = wait_for_cidfile(tmpfile, timeout=2, process=response)
+        except ConuException as ex:
+            logger.info("exception while running a container: %s", ex)
             raise ConuException("We could not get container's ID, it probably was not created")
         return container_id, response
 
     def run_via_binary(self, run_command_instance=None, command=None, volumes=None,
-                       additional_opts=None, **kwargs):
+                       additional_opts=None, via_api=False, **kwargs):
         """
         create a container using this image and run it in background;
         this method is useful to test real user scenarios when users invoke containers using
@@ -422,10 +471,14 @@ class DockerImage(Image):
                 Directory instance)
 
         :param additional_opts: list of str, additional options for `docker run`
+        :param via_api: bool, translate the options to API parameters and create and start
+            the container via API instead of executing the docker binary, which is a lot faster;
+            the binary is still used if some of the options can't be translated
         :return: instance of DockerContainer
         """
+        self._apply_pull_policy()
 
-        logger.info("run container via binary in background")
+        logger.info("run container via %s in background", "API" if via_api else "binary")
 
         if (command is not None or additional_opts is not None) \
                 and run_command_instance is not None:
@@ -455,6 +508,11 @@ class DockerImage(Image):
         if volumes:
             run_command_instance.options += self.get_volume_options(volumes=volumes)
 
+        if via_api:
+            container = self._run_via_api_fast(run_command_instance)
+            if container is not None:
+                return container
+
         def callback():
             try:
                 # FIXME: catch std{out,err}, print stdout to logger.debug, stderr to logger.error
@@ -462,10 +520,48 @@ class DockerImage(Image):
             except subprocess.CalledProcessError as ex:
                 raise ConuException("Container exited with an error: %s" % ex.returncode)
 
+        start = time.time()
         container_id, _ = self._run_container(run_command_instance, callback)
+        time_to_id = time.time() - start
 
         container_name = self.d.inspect_container(container_id)['Name'][1:]
-        return DockerContainer(self, container_id, name=container_name)
+        container = DockerContainer(self, container_id, name=container_name)
+        container.time_to_id = time_to_id
+        return container
+
+    def _run_via_api_fast(self, run_command_instance):
+        """
+        equivalent of `docker run -d` done via API: create and start the container
+
+        :param run_command_instance: instance of DockerRunBuilder
+        :return: instance of DockerContainer or None if the options can't be translated
+        """
+        try:
+            container_params = run_command_instance.get_parameters(strict=True)
+        except ConuException as ex:
+            logger.info("can't run the container via API, using the binary: %s", ex)
+            return None
+        if container_params.mounts or container_params.platform:
+            logger.info("can't run the container via API, using the binary: "
+                        "--mount and --platform are not supported")
+            return None
+
+        labels = container_params.labels or {}
+        labels[CONU_ARTIFACT_TAG] = ""
+        container_params.labels = labels
+        # the name is not in the response of the create call, set it so we don't need to inspect
+        container_params.name = container_params.name or "conu-%s" % random_str()
+
+        start = time.time()
+        container_id = self._create_container(container_params, from_cli_options=True)["Id"]
+        time_to_id = time.time() - start
+        try:
+            self.d.start(container_id)
+        except docker.errors.APIError as ex:
+            raise ConuException("Container exited with an error: %s" % ex)
+        container = DockerContainer(self, container_id, name=container_params.name)
+        container.time_to_id = time_to_id
+        return container
 
     def run_via_binary_in_foreground(
             self, run_command_instance=None, command=None, volumes=None,
@@ -501,6 +597,7 @@ class DockerImage(Image):
         :param container_name: str, pretty container identifier
         :return: instance of DockerContainer
         """
+        self._apply_pull_policy()
         logger.info("run container via binary in foreground")
 
         if (command is not None or additional_opts is not None) \
@@ -537,7 +634,9 @@ class DockerImage(Image):
         def callback():
             return subprocess.Popen(run_command_instance.build(), **popen_params)
 
+        start = time.time()
         container_id, popen_instance = self._run_container(run_command_instance, callback)
+        time_to_id = time.time() - start
 
         actual_name = self.d.inspect_container(container_id)['Name'][1:]
         if container_name and container_name != actual_name:
@@ -546,8 +645,10 @@ class DockerImage(Image):
                 + str(container_name) + " Actual = " + str(actual_name))
         if not container_name:
             container_name = actual_name
-        return DockerContainer(
+        container = DockerContainer(
             self, container_id, popen_instance=popen_instance, name=container_name)
+        container.time_to_id = time_to_id
+        return container
 
     def run_via_api(self, container_params=None):
         """
@@ -558,10 +659,35 @@ class DockerImage(Image):
         :param container_params: DockerContainerParameters
         :return: instance of DockerContainer
         """
+        self._apply_pull_policy()
 
         if not container_params:
             container_params = DockerContainerParameters()
 
+        container = self._create_container(container_params)
+        return DockerContainer(self, container['Id'], name=container_params.name)
+
+    def _create_container(self, container_params, from_cli_options=False):
+        """
+        create a container from this image via API
+
+        :param container_params: DockerContainerParameters
+        :param from_cli_options: bool, the parameters were translated from `docker run`
+            options: `-v` host paths are bind mounts, ports of `-p` mappings are exposed
+            and `--network` is honoured
+        :return: dict, response of the create call
+        """
+        volumes = container_params.volumes
+        ports = container_params.exposed_ports
+        host_config_kwargs = {}
+        if from_cli_options:
+            # `-v /host/path:/container/path` are bind mounts, only the container path is a volume
+            volumes = volumes or []
+            host_config_kwargs["binds"] = [v for v in volumes if ":" in v] or None
+            volumes = [v.split(":")[1] if ":" in v else v for v in volumes] or None
+            ports = ports or list(container_params.port_mappings or []) or None
+            host_config_kwargs["network_mode"] = container_params.network
+
         # Host-specific configuration
         host_config = self.d.create_host_config(auto_remove=container_params.remove,
                                                 cap_add=container_params.cap_add,
@@ -578,7 +704,8 @@ class DockerImage(Image):
                                                 privileged=container_params.privileged,
                                                 publish_all_ports=container_params.publish_all_ports,
                                                 port_bindings=container_params.port_mappings,
-                                                read_only=container_params.read_only)
+                                                read_only=container_params.read_only,
+                                                **host_config_kwargs)
 
         container = self.d.create_container(self.get_id(), command=container_params.command,
                                             detach=True,
@@ -586,9 +713,9 @@ class DockerImage(Image):
                                             user=container_params.user,
                                             stdin_open=container_params.stdin_open,
                                             tty=container_params.tty,
-                                            ports=container_params.exposed_ports,
+                                            ports=ports,
                                             environment=container_params.env_variables,
-                                            volumes=container_params.volumes,
+                                            volumes=volumes,
                                             name=container_params.name,
                                             entrypoint=container_params.entrypoint,
                                             working_dir=container_params.working_dir,
@@ -599,7 +726,7 @@ class DockerImage(Image):
                                             healthcheck=container_params.healthcheck,
                                             runtime=container_params.runtime)
 
-        return DockerContainer(self, container['Id'], name=container_params.name)
+        return container
 
     def run_in_pod(self, namespace="default"):
         """
@@ -607,6 +734,10 @@ class DockerImage(Image):
         :param namespace: str, name of namespace where pod will be created
         :return: Pod instance
         """
+        # the kubernetes client is heavy, import it only when it's needed
+        from kubernetes.client.rest import ApiException
+        from conu.backend.k8s.pod import Pod
+        from conu.backend.k8s.client import get_core_api
 
         core_api = get_core_api()
 
@@ -684,6 +815,8 @@ class DockerImage(Image):
                                                   rm=True, tag=tag,
                                                   dockerfile=dockerfile,
                                                   quiet=True)]
+        # the tag may point to a different image now
+        get_image_cache().invalidate_names()
         if not response:
             raise ConuException('Failed to get ID of image')
 
@@ -738,18 +871,20 @@ class DockerImage(Image):
 
 class S2IDockerImage(DockerImage, S2Image):
     def __init__(self, repository, tag="latest",  identifier=None,
-                 pull_policy=DockerImagePullPolicy.IF_NOT_PRESENT):
+                 pull_policy=DockerImagePullPolicy.IF_NOT_PRESENT, lazy=False):
         """
         :param repository: str, image name, examples: "fedora", "registry.fedoraproject.org/fedora",
                             "tomastomecek/sen", "docker.io/tomastomecek/sen"
         :param tag: str, tag of the image, when not specified, "latest" is implied
         :param identifier: str, unique identifier for this image
         :param pull_policy: enum, strategy to apply for pulling the image
+        :param lazy: bool, apply the pull policy once the image is used for the first time
         """
         super(S2IDockerImage, self).__init__(repository,
                                              tag=tag,
                                              identifier=identifier,
-                                             pull_policy=pull_policy)
+                                             pull_policy=pull_policy,
+                                             lazy=lazy)
         self._s2i_exists = None
 
     def _s2i_command(self, args):
@@ -3,91 +3,59 @@ utility functions for related to docker
 """
 import logging
 
-from conu.apidefs.metadata import ContainerStatus
+from conu.apidefs.metadata import (ContainerMetadata, ContainerStatus, ImageMetadata, LazyField,
+                                   LazyMetadata)
 from conu.utils import graceful_get
 
 
 logger = logging.getLogger(__name__)
 
 
-def inspect_to_metadata(metadata_object, inspect_data):
-    """
-    process data from `docker inspect` and update provided metadata object
+def _strip_digest_algorithm(identifier):
+    # format of image name from docker inspect:
+    # sha256:8f0e66c924c0c169352de487a3c2463d82da24e9442fc097dddaa5f800df7129
+    if identifier and ":" in identifier:
+        return identifier.split(':')[1]
+    return identifier
 
-    :param metadata_object: instance of Metadata
-    :param inspect_data: dict, metadata from `docker inspect` or `dockert_client.images()`
-    :return: instance of Metadata
-    """
-    identifier = graceful_get(inspect_data, 'Id')
-    if identifier:
-        if ":" in identifier:
-            # format of image name from docker inspect:
-            # sha256:8f0e66c924c0c169352de487a3c2463d82da24e9442fc097dddaa5f800df7129
-            metadata_object.identifier = identifier.split(':')[1]
-        else:
-            # container
-            metadata_object.identifier = identifier
 
+def _get_identifier(inspect_data):
+    return _strip_digest_algorithm(graceful_get(inspect_data, 'Id'))
+
+
+def _get_env_variables(inspect_data):
     # format of Environment Variables from docker inspect:
     # ['DISTTAG=f33container', 'FGC=f33']
-    raw_env_vars = graceful_get(inspect_data, "Config", "Env") or []
-    if raw_env_vars:
-        metadata_object.env_variables = {}
-        for env_variable in raw_env_vars:
-            splits = env_variable.split("=", 1)
-            name = splits[0]
-            value = splits[1] if len(splits) > 1 else None
-            if value is not None:
-                metadata_object.env_variables.update({name: value})
-
-    raw_exposed_ports = graceful_get(inspect_data, "Config", "ExposedPorts")
-    if raw_exposed_ports:
-        metadata_object.exposed_ports = list(raw_exposed_ports.keys())
+    env_variables = {}
+    for env_variable in graceful_get(inspect_data, "Config", "Env") or []:
+        splits = env_variable.split("=", 1)
+        if len(splits) > 1:
+            env_variables[splits[0]] = splits[1]
+    return env_variables
 
-    # specific to images
-    raw_repo_tags = graceful_get(inspect_data, 'RepoTags')
-    if raw_repo_tags:
-        metadata_object.name = raw_repo_tags[0]
-    metadata_object.labels = graceful_get(inspect_data, 'Config', 'Labels')
-    metadata_object.command = graceful_get(inspect_data, 'Config', 'Cmd')
-    metadata_object.creation_timestamp = inspect_data.get('Created', None)
-    # specific to images
-    metadata_object.image_names = inspect_data.get('RepoTags', None)
-    # specific to images
-    digests = inspect_data.get("RepoDigests", None)
-    if digests:
-        metadata_object.repo_digests = digests
-        metadata_object.digest = digests[0]
 
-    return metadata_object
+def _get_exposed_ports(inspect_data):
+    return list((graceful_get(inspect_data, "Config", "ExposedPorts") or {}).keys())
 
 
-def inspect_to_container_metadata(c_metadata_object, inspect_data, image_instance):
-    """
-    process data from `docker container inspect` and update provided container metadata object
+def _get_repo_tag(inspect_data):
+    raw_repo_tags = graceful_get(inspect_data, 'RepoTags')
+    return raw_repo_tags[0] if raw_repo_tags else None
 
-    :param c_metadata_object: instance of ContainerMetadata
-    :param inspect_data: dict, metadata from `docker inspect` or `dockert_client.images()`
-    :param image_instance: instance of DockerImage
-    :return: instance of ContainerMetadata
-    """
-    inspect_to_metadata(c_metadata_object, inspect_data)
 
-    status = ContainerStatus.get_from_docker(
+def _get_digest(inspect_data):
+    digests = graceful_get(inspect_data, "RepoDigests")
+    return digests[0] if digests else None
+
+
+def _get_status(inspect_data):
+    return ContainerStatus.get_from_docker(
         graceful_get(inspect_data, "State", "Status"),
         graceful_get(inspect_data, "State", "ExitCode"),
     )
 
-    image_id = graceful_get(inspect_data, "Image")
-    if image_id:
-        if ":" in image_id:
-            # format of image name from docker inspect:
-            # sha256:8f0e66c924c0c169352de487a3c2463d82da24e9442fc097dddaa5f800df7129
-            image_instance.identifier = image_id.split(':')[1]
-        else:
-            # container
-            image_instance.identifier = image_id
 
+def _get_port_mappings(inspect_data):
     # format of Port mappings from docker inspect:
     # {'12345/tcp': [
     #   {'HostIp': '0.0.0.0', 'HostPort': '123'},
@@ -111,22 +79,159 @@ def inspect_to_container_metadata(c_metadata_object, inspect_data, image_instanc
                     continue
             li.append(int_port)
             port_mappings.update({key: li})
+    return port_mappings
 
-    c_metadata_object.status = status
-    c_metadata_object.port_mappings = port_mappings
-    c_metadata_object.hostname = graceful_get(inspect_data, 'Config', 'Hostname')
-    raw_networks = graceful_get(inspect_data, "NetworkSettings", "Networks").values()
-    if raw_networks:
-        c_metadata_object.ipv4_addresses = [
-            graceful_get(x, "IPAddress")
-            for x in raw_networks if graceful_get(x, "IPAddress")]
-        c_metadata_object.ipv6_addresses = [
-            graceful_get(x, "GlobalIPv6Address")
-            for x in raw_networks if graceful_get(x, "GlobalIPv6Address")]
-    c_metadata_object.image = image_instance
+
+def _get_addresses(inspect_data, key):
+    """
+    :return: list of str, None if the container is not connected to any network
+    """
+    raw_networks = (graceful_get(inspect_data, "NetworkSettings", "Networks") or {}).values()
+    if not raw_networks:
+        return None
+    return [graceful_get(x, key) for x in raw_networks if graceful_get(x, key)]
+
+
+def _get_container_name(inspect_data):
     name = graceful_get(inspect_data, "Name")
     if name:
         name = name[1:] if name.startswith("/") else name  # remove / at the beginning
+    return name or None
+
+
+def _update_image_identifier(image_instance, inspect_data):
+    image_id = _strip_digest_algorithm(graceful_get(inspect_data, "Image"))
+    if image_id:
+        image_instance.identifier = image_id
+
+
+class DockerImageMetadata(LazyMetadata, ImageMetadata):
+    """
+    Image metadata which keep a reference to output of `docker image inspect` (or an item of
+    `docker_client.images()`) and decode the attributes on first access.
+    """
+
+    __slots__ = ("_raw", )
+
+    identifier = LazyField(_get_identifier)
+    name = LazyField(_get_repo_tag)
+    labels = LazyField(lambda d: graceful_get(d, 'Config', 'Labels'))
+    command = LazyField(lambda d: graceful_get(d, 'Config', 'Cmd'))
+    creation_timestamp = LazyField(lambda d: graceful_get(d, 'Created'))
+    env_variables = LazyField(_get_env_variables)
+    exposed_ports = LazyField(_get_exposed_ports)
+    image_names = LazyField(lambda d: graceful_get(d, 'RepoTags'))
+    digest = LazyField(_get_digest)
+    repo_digests = LazyField(lambda d: graceful_get(d, 'RepoDigests'))
+
+    def __init__(self, inspect_data):
+        """
+        :param inspect_data: dict, metadata from `docker inspect` or `docker_client.images()`
+        """
+        self._raw = inspect_data
+
+
+class DockerContainerMetadata(LazyMetadata, ContainerMetadata):
+    """
+    Container metadata which keep a reference to output of `docker container inspect` (or an
+    item of `docker_client.containers()`) and decode the attributes on first access.
+    """
+
+    __slots__ = ("_raw", )
+
+    identifier = LazyField(_get_identifier)
+    name = LazyField(_get_container_name)
+    labels = LazyField(lambda d: graceful_get(d, 'Config', 'Labels'))
+    command = LazyField(lambda d: graceful_get(d, 'Config', 'Cmd'))
+    creation_timestamp = LazyField(lambda d: graceful_get(d, 'Created'))
+    env_variables = LazyField(_get_env_variables)
+    exposed_ports = LazyField(_get_exposed_ports)
+    port_mappings = LazyField(_get_port_mappings)
+    hostname = LazyField(lambda d: graceful_get(d, 'Config', 'Hostname'))
+    ipv4_addresses = LazyField(lambda d: _get_addresses(d, "IPAddress"))
+    ipv6_addresses = LazyField(lambda d: _get_addresses(d, "GlobalIPv6Address"))
+    status = LazyField(_get_status)
+
+    def __init__(self, inspect_data, image_instance):
+        """
+        :param inspect_data: dict, metadata from `docker inspect` or `docker_client.containers()`
+        :param image_instance: instance of DockerImage, its identifier is updated
+        """
+        self._raw = inspect_data
+        self.image = image_instance
+        _update_image_identifier(image_instance, inspect_data)
+
+
+def inspect_to_metadata(metadata_object, inspect_data):
+    """
+    process data from `docker inspect` and update provided metadata object; lazy metadata
+    objects (DockerImageMetadata) just replace their data
+
+    :param metadata_object: instance of Metadata
+    :param inspect_data: dict, metadata from `docker inspect` or `dockert_client.images()`
+    :return: instance of Metadata
+    """
+    if isinstance(metadata_object, LazyMetadata):
+        metadata_object.load(inspect_data)
+        return metadata_object
+
+    identifier = _get_identifier(inspect_data)
+    if identifier:
+        metadata_object.identifier = identifier
+
+    env_variables = _get_env_variables(inspect_data)
+    if env_variables:
+        metadata_object.env_variables = env_variables
+
+    exposed_ports = _get_exposed_ports(inspect_data)
+    if exposed_ports:
+        metadata_object.exposed_ports = exposed_ports
+
+    # specific to images
+    repo_tag = _get_repo_tag(inspect_data)
+    if repo_tag:
+        metadata_object.name = repo_tag
+    metadata_object.labels = graceful_get(inspect_data, 'Config', 'Labels')
+    metadata_object.command = graceful_get(inspect_data, 'Config', 'Cmd')
+    metadata_object.creation_timestamp = inspect_data.get('Created', None)
+    # specific to images
+    metadata_object.image_names = inspect_data.get('RepoTags', None)
+    # specific to images
+    digests = inspect_data.get("RepoDigests", None)
+    if digests:
+        metadata_object.repo_digests = digests
+        metadata_object.digest = digests[0]
+
+    return metadata_object
+
+
+def inspect_to_container_metadata(c_metadata_object, inspect_data, image_instance):
+    """
+    process data from `docker container inspect` and update provided container metadata object;
+    lazy metadata objects (DockerContainerMetadata) just replace their data
+
+    :param c_metadata_object: instance of ContainerMetadata
+    :param inspect_data: dict, metadata from `docker inspect` or `dockert_client.images()`
+    :param image_instance: instance of DockerImage
+    :return: instance of ContainerMetadata
+    """
+    _update_image_identifier(image_instance, inspect_data)
+    c_metadata_object.image = image_instance
+    if isinstance(c_metadata_object, LazyMetadata):
+        c_metadata_object.load(inspect_data)
+        return c_metadata_object
+
+    inspect_to_metadata(c_metadata_object, inspect_data)
+
+    c_metadata_object.status = _get_status(inspect_data)
+    c_metadata_object.port_mappings = _get_port_mappings(inspect_data)
+    c_metadata_object.hostname = graceful_get(inspect_data, 'Config', 'Hostname')
+    ipv4_addresses = _get_addresses(inspect_data, "IPAddress")
+    if ipv4_addresses is not None:
+        c_metadata_object.ipv4_addresses = ipv4_addresses
+        c_metadata_object.ipv6_addresses = _get_addresses(inspect_data, "GlobalIPv6Address")
+    name = _get_container_name(inspect_data)
+    if name:
         c_metadata_object.name = name
 
     return c_metadata_object
@@ -19,7 +19,7 @@ from conu.apidefs.metadata import ImageMetadata
 import conu.backend.k8s.client as k8s_client
 from conu.exceptions import ConuException
 from conu.utils.probes import Probe
-from conu.utils import random_str
+from conu.utils import random_str, make_label_selector
 
 from kubernetes import client
 from kubernetes.client.rest import ApiException
@@ -57,64 +57,135 @@ class K8sBackend(Backend):
         if K8sCleanupPolicy.NOTHING in self.cleanup and len(self.cleanup) != 1:
             raise ConuException("Cleanup policy NOTHING cannot be combined with other values")
 
-    def list_pods(self, namespace=None):
+    @staticmethod
+    def _iter_objects(list_namespaced, list_all, namespace=None, label_selector=None,
+                      field_selector=None, page_size=500):
+        """
+        Iterate over objects returned by the API server, the filtering is done by the server
+        and the objects are fetched in pages of `page_size` items.
+
+        :param list_namespaced: callable, e.g. CoreV1Api.list_namespaced_pod
+        :param list_all: callable, e.g. CoreV1Api.list_pod_for_all_namespaces
+        :param namespace: str, if not specified list objects in all namespaces
+        :param label_selector: str (e.g. "app=db,tier"), dict or list of str
+        :param field_selector: str, e.g. "status.phase=Running"
+        :param page_size: int, maximum number of objects fetched in a single request
+        :return: generator of objects returned by the API
+        """
+        kwargs = {"watch": False, "limit": page_size}
+        label_selector = make_label_selector(label_selector)
+        if label_selector:
+            kwargs["label_selector"] = label_selector
+        if field_selector:
+            kwargs["field_selector"] = field_selector
+        while True:
+            try:
+                if namespace:
+                    response = list_namespaced(namespace, **kwargs)
+                else:
+                    response = list_all(**kwargs)
+            except ApiException as e:
+                raise ConuException("Exception when calling Kubernetes API: %s\n" % e)
+            for item in response.items:
+                yield item
+            _continue = response.metadata and response.metadata._continue
+            if not _continue:
+                break
+            kwargs["_continue"] = _continue
+
+    def iter_pods(self, namespace=None, label_selector=None, field_selector=None):
+        """
+        Same as list_pods, but the pods are fetched in pages and the pod objects are created
+        lazily, one by one.
+
+        :param namespace: str, if not specified list pods for all namespaces
+        :param label_selector: str (e.g. "app=db,tier"), dict or list of str
+        :param field_selector: str, e.g. "status.phase=Running"
+        :return: generator of instances of :class:`conu.backend.k8s.pod.Pod`
+        """
+        for p in self._iter_objects(self.core_api.list_namespaced_pod,
+                                    self.core_api.list_pod_for_all_namespaces,
+                                    namespace=namespace, label_selector=label_selector,
+                                    field_selector=field_selector):
+            yield Pod(name=p.metadata.name, namespace=p.metadata.namespace, spec=p.spec)
+
+    def list_pods(self, namespace=None, label_selector=None, field_selector=None):
         """
         List all available pods.
 
         :param namespace: str, if not specified list pods for all namespaces
+        :param label_selector: str (e.g. "app=db,tier"), dict or list of str, list only pods
+                               with matching labels
+        :param field_selector: str, e.g. "status.phase=Running"
         :return: collection of instances of :class:`conu.backend.k8s.pod.Pod`
         """
+        return list(self.iter_pods(namespace=namespace, label_selector=label_selector,
+                                   field_selector=field_selector))
 
-        if namespace:
-            return [Pod(name=p.metadata.name, namespace=namespace, spec=p.spec)
-                    for p in self.core_api.list_namespaced_pod(namespace, watch=False).items]
-
-        return [Pod(name=p.metadata.name, namespace=p.metadata.namespace, spec=p.spec)
-                for p in self.core_api.list_pod_for_all_namespaces(watch=False).items]
+    def iter_services(self, namespace=None, label_selector=None, field_selector=None):
+        """
+        Same as list_services, but the services are fetched in pages and the service objects
+        are created lazily, one by one.
 
-    def list_services(self, namespace=None):
+        :param namespace: str, if not specified list services for all namespaces
+        :param label_selector: str (e.g. "app=db,tier"), dict or list of str
+        :param field_selector: str, e.g. "metadata.name=db"
+        :return: generator of instances of :class:`conu.backend.k8s.service.Service`
+        """
+        for s in self._iter_objects(self.core_api.list_namespaced_service,
+                                    self.core_api.list_service_for_all_namespaces,
+                                    namespace=namespace, label_selector=label_selector,
+                                    field_selector=field_selector):
+            yield Service(name=s.metadata.name,
+                          ports=k8s_ports_to_metadata_ports(s.spec.ports),
+                          namespace=s.metadata.namespace,
+                          labels=s.metadata.labels, selector=s.spec.selector, spec=s.spec)
+
+    def list_services(self, namespace=None, label_selector=None, field_selector=None):
         """
         List all available services.
 
         :param namespace: str, if not specified list services for all namespaces
+        :param label_selector: str (e.g. "app=db,tier"), dict or list of str, list only
+                               services with matching labels
+        :param field_selector: str, e.g. "metadata.name=db"
         :return: collection of instances of :class:`conu.backend.k8s.service.Service`
         """
+        return list(self.iter_services(namespace=namespace, label_selector=label_selector,
+                                       field_selector=field_selector))
 
-        if namespace:
-            return [Service(name=s.metadata.name,
-                            ports=k8s_ports_to_metadata_ports(s.spec.ports),
-                            namespace=s.metadata.namespace,
-                            labels=s.metadata.labels, selector=s.spec.selector, spec=s.spec)
-                    for s in self.core_api.list_namespaced_service(namespace, watch=False).items]
-
-        return [Service(name=s.metadata.name,
-                        ports=k8s_ports_to_metadata_ports(s.spec.ports),
-                        namespace=s.metadata.namespace,
-                        labels=s.metadata.labels, selector=s.spec.selector, spec=s.spec)
-                for s in self.core_api.list_service_for_all_namespaces(watch=False).items]
+    def iter_deployments(self, namespace=None, label_selector=None, field_selector=None):
+        """
+        Same as list_deployments, but the deployments are fetched in pages and the deployment
+        objects are created lazily, one by one.
 
-    def list_deployments(self, namespace=None):
+        :param namespace: str, if not specified list deployments for all namespaces
+        :param label_selector: str (e.g. "app=db,tier"), dict or list of str
+        :param field_selector: str, e.g. "metadata.name=db"
+        :return: generator of instances of :class:`conu.backend.k8s.deployment.Deployment`
+        """
+        for d in self._iter_objects(self.apps_api.list_namespaced_deployment,
+                                    self.apps_api.list_deployment_for_all_namespaces,
+                                    namespace=namespace, label_selector=label_selector,
+                                    field_selector=field_selector):
+            yield Deployment(name=d.metadata.name,
+                             namespace=d.metadata.namespace,
+                             labels=d.metadata.labels, selector=d.spec.selector,
+                             image_metadata=ImageMetadata(
+                                 name=d.spec.template.spec.containers[0].name.split("-", 1)[0]))
+
+    def list_deployments(self, namespace=None, label_selector=None, field_selector=None):
         """
         List all available deployments.
 
         :param namespace: str, if not specified list deployments for all namespaces
+        :param label_selector: str (e.g. "app=db,tier"), dict or list of str, list only
+                               deployments with matching labels
+        :param field_selector: str, e.g. "metadata.name=db"
         :return: collection of instances of :class:`conu.backend.k8s.deployment.Deployment`
         """
-
-        if namespace:
-            return [Deployment(name=d.metadata.name,
-                               namespace=d.metadata.namespace,
-                               labels=d.metadata.labels, selector=d.spec.selector,
-                               image_metadata=ImageMetadata(
-                                   name=d.spec.template.spec.containers[0].name.split("-", 1)[0]))
-                    for d in self.apps_api.list_namespaced_deployment(namespace, watch=False).items]
-
-        return [Deployment(name=d.metadata.name,
-                           namespace=d.metadata.namespace,
-                           labels=d.metadata.labels, selector=d.spec.selector,
-                           image_metadata=ImageMetadata(
-                               name=d.spec.template.spec.containers[0].name.split("-", 1)[0]))
-                for d in self.apps_api.list_deployment_for_all_namespaces(watch=False).items]
+        return list(self.iter_deployments(namespace=namespace, label_selector=label_selector,
+                                          field_selector=field_selector))
 
     def create_namespace(self):
         """
@@ -198,10 +269,9 @@ class K8sBackend(Backend):
         Delete all pods created in namespaces associated with this backend
         :return: None
         """
-        pods = self.list_pods()
-
-        for pod in pods:
-            if pod.namespace in self.managed_namespaces:
+        # list only the managed namespaces instead of filtering all the objects in the cluster
+        for namespace in self.managed_namespaces:
+            for pod in self.list_pods(namespace=namespace):
                 pod.delete()
 
     def cleanup_services(self):
@@ -209,10 +279,8 @@ class K8sBackend(Backend):
         Delete all services created in namespaces associated with this backend
         :return: None
         """
-        services = self.list_services()
-
-        for service in services:
-            if service.namespace in self.managed_namespaces:
+        for namespace in self.managed_namespaces:
+            for service in self.list_services(namespace=namespace):
                 service.delete()
 
     def cleanup_deployments(self):
@@ -220,10 +288,8 @@ class K8sBackend(Backend):
         Delete all deployments created in namespaces associated with this backend
         :return: None
         """
-        deployments = self.list_deployments()
-
-        for deployment in deployments:
-            if deployment.namespace in self.managed_namespaces:
+        for namespace in self.managed_namespaces:
+            for deployment in self.list_deployments(namespace=namespace):
                 deployment.delete()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -125,14 +125,17 @@ class Deployment(object):
 
         return False
 
-    def wait(self, timeout=15):
+    def wait(self, timeout=15, **probe_kwargs):
         """
         block until all replicas are not ready, raises an exc ProbeTimeout if timeout is reached
         :param timeout: int or float (seconds), time to wait for pods to run
+        :param probe_kwargs: arguments passed to Probe constructor, e.g.
+                             pause=conu.utils.probes.ExponentialBackoff()
         :return: None
         """
 
-        Probe(timeout=timeout, fnc=self.all_pods_ready, expected_retval=True).run()
+        Probe(timeout=timeout, fnc=self.all_pods_ready, expected_retval=True,
+              **probe_kwargs).run()
 
     def create_in_cluster(self):
         """
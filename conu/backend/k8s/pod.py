@@ -159,14 +159,16 @@ class Pod(object):
             return True
         return False
 
-    def wait(self, timeout=15):
+    def wait(self, timeout=15, **probe_kwargs):
         """
         block until pod is not ready, raises an exc ProbeTimeout if timeout is reached
         :param timeout: int or float (seconds), time to wait for pod to run
+        :param probe_kwargs: arguments passed to Probe constructor, e.g.
+                             pause=conu.utils.probes.ExponentialBackoff()
         :return: None
         """
 
-        Probe(timeout=timeout, fnc=self.is_ready, expected_retval=True).run()
+        Probe(timeout=timeout, fnc=self.is_ready, expected_retval=True, **probe_kwargs).run()
 
     @staticmethod
     def create(image_data):
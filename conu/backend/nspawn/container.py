@@ -16,6 +16,7 @@ from copy import deepcopy
 from conu.apidefs.container import Container
 from conu.exceptions import ConuException
 from conu.utils import run_cmd, random_str, convert_kv_to_dict, command_exists
+from conu.utils.exec_session import ProcessExecSession
 from conu.backend.nspawn import constants
 
 
@@ -258,6 +259,21 @@ class NspawnContainer(Container):
         # shell"
         return self.run_systemdrun(deepcopy(command), **kwargs)
 
+    def session(self, shell="/bin/sh"):
+        """
+        start a persistent shell in this machine; the shell is spawned in namespaces
+        of the machine via nsenter
+
+        :param shell: str, path to the shell in the container
+        :return: instance of :class:`conu.utils.exec_session.ProcessExecSession`
+        """
+        # systemd-run can't pass stdin and stdout to a machine, enter its namespaces instead
+        leader = run_cmd(["machinectl", "--no-pager", "show", "--property=Leader", "--value",
+                          self.name], return_output=True).strip()
+        return ProcessExecSession(
+            ["nsenter", "--target", leader, "--mount", "--uts", "--ipc", "--net", "--pid",
+             "--", shell], shell=shell)
+
     def _run_systemdrun_decide(self):
         """
         Internal method
@@ -24,7 +24,7 @@ from conu.backend.nspawn.constants import CONU_IMAGES_STORE
 from conu.apidefs.filesystem import Filesystem
 from conu.apidefs.image import Image
 from conu.exceptions import ConuException
-from conu.utils import run_cmd, random_str, mkstemp, mkdtemp, command_exists
+from conu.utils import run_cmd, random_str, mkstemp, mkdtemp, command_exists, get_selinux_status
 from conu.utils.filesystem import Volume
 
 logger = logging.getLogger(__name__)
@@ -158,7 +158,7 @@ class NspawnImage(Image):
             ["machinectl", "--no-pager", "--help"],
             "Command machinectl does not seems to be present on your system"
             "Do you have system with systemd")
-        if "Enforcing" in run_cmd(["getenforce"], return_output=True, ignore_status=True):
+        if get_selinux_status() == "Enforcing":
             logger.error("Please disable selinux (setenforce 0), selinux blocks some nspawn operations"
                          "This may lead to strange behaviour")
 
@@ -381,16 +381,51 @@ class NspawnImage(Image):
             self.local_location] + additional_opts + command
         logger.debug("Start command: %s" % " ".join(systemd_command))
         callback_method = (subprocess.Popen, systemd_command, inernalargs, internalkw)
-        self.container_process = NspawnContainer.internal_run_container(
+        # a local variable: run_many() calls this method from several threads
+        container_process = NspawnContainer.internal_run_container(
             name=machine_name,
             callback_method=callback_method,
             foreground=foreground
         )
+        # kept for backward compatibility, the process of the last started machine
+        self.container_process = container_process
         if foreground:
-            return self.container_process
+            return container_process
         else:
             return NspawnContainer(self, None, name=machine_name,
-                                   start_process=self.container_process, start_action=callback_method)
+                                   start_process=container_process, start_action=callback_method)
+
+    def run_many(self, n, run_spec=None, max_parallel=8, ready=None, timeout=60,
+                 as_completed=False):
+        """
+        boot `n` machines from this image concurrently, see :meth:`Image.run_many`; the image
+        is shared, so the machines should not write to it, e.g.:
+
+        .. code-block:: python
+
+            image.run_many(5, {"additional_opts": ["--volatile=yes"]})
+
+        :param n: int, number of machines
+        :param run_spec: dict, keyword arguments of run_via_binary(), must not contain name
+        :param max_parallel: int, maximum number of machines being booted at the same time
+        :param ready: callable, accepts a container and returns True when it's ready
+        :param timeout: int or float, how long to wait for the machines to be ready (seconds)
+        :param as_completed: bool, return an iterator instead of a list
+        :return: list or iterator of NspawnContainer instances
+        """
+        if run_spec is not None and not isinstance(run_spec, dict):
+            raise ConuException("run_spec needs to be a dict of arguments of run_via_binary()")
+        return super(NspawnImage, self).run_many(
+            n, run_spec=run_spec or {}, max_parallel=max_parallel, ready=ready,
+            timeout=timeout, as_completed=as_completed)
+
+    @staticmethod
+    def _discard_container(container):
+        # NspawnContainer.delete() removes the image
+        try:
+            container.kill()
+        except Exception as ex:
+            logger.warning("can't terminate machine %s: %r", container.name, ex)
 
     def run_foreground(self, *args, **kwargs):
         """
@@ -11,14 +11,13 @@ This is backend for OpenShift
 import logging
 import subprocess
 import os.path
-import requests
 
 from requests.exceptions import ConnectionError
 
 from conu.backend.k8s.backend import K8sBackend
 from conu.exceptions import ConuException
-from conu.utils import oc_command_exists, run_cmd, random_str, check_port
-from conu.utils.http_client import get_url
+from conu.utils import check_port, oc_command_exists, run_cmd, random_str, wait_for_ports
+from conu.utils.http_client import get_url, new_http_session
 from conu.utils.probes import Probe, ProbeTimeout
 
 
@@ -44,8 +43,8 @@ class OpenshiftBackend(K8sBackend):
                                                logging_level=logging_level,
                                                logging_kwargs=logging_kwargs)
 
-        # provides HTTP client (requests.Session)
-        self.http_session = requests.Session()
+        # provides HTTP client (requests.Session), connection pools are shared with containers
+        self.http_session = new_http_session()
 
         self.project = project
 
@@ -263,9 +262,7 @@ class OpenshiftBackend(K8sBackend):
         :return: bool, True if connection was established False if there was connection error
         """
 
-        # get ip of service
-        ip = [service.get_ip() for service in self.list_services(namespace=self.project)
-              if service.name == app_name][0]
+        ip = self._get_service_ip(app_name)
 
         # make http request to obtain output
         if expected_output is not None:
@@ -280,12 +277,21 @@ class OpenshiftBackend(K8sBackend):
             except ConnectionError as e:
                 logger.info("Connection to service failed %s!", e)
                 return False
-        elif check_port(port, host=ip):  # check if port is open
+        elif check_port(int(port), host=ip):  # check if port is open
             return True
 
         return False
 
-    def wait_for_service(self, app_name, port, expected_output=None, timeout=100):
+    def _get_service_ip(self, app_name):
+        """
+        :param app_name: str, name of the app
+        :return: str, IP address of the service of the app
+        """
+        return [service.get_ip() for service in self.list_services(namespace=self.project)
+                if service.name == app_name][0]
+
+    def wait_for_service(self, app_name, port, expected_output=None, timeout=100,
+                         **probe_kwargs):
         """Block until service is not ready to accept requests,
         raises an exc ProbeTimeout if timeout is reached
 
@@ -294,13 +300,30 @@ class OpenshiftBackend(K8sBackend):
         :param expected_output: If not None method will check output returned from request
                and try to find matching string.
         :param timeout: int or float (seconds), time to wait for pod to run
+        :param probe_kwargs: arguments passed to Probe constructor, e.g.
+                             pause=conu.utils.probes.FastStart(); the pause is 10 seconds
+                             by default; without `expected_output` only the pause is used,
+                             see :func:`conu.utils.wait_for_ports`
         :return: None
         """
         logger.info('Waiting for service to get ready')
+        if expected_output is None:
+            # only the port needs to be open: watch it from a single event loop
+            ports_kwargs = {}
+            if "pause" in probe_kwargs:
+                ports_kwargs["pause"] = probe_kwargs["pause"]
+            try:
+                wait_for_ports([(self._get_service_ip(app_name), port)], timeout=timeout,
+                               **ports_kwargs)
+                return
+            except ProbeTimeout:
+                logger.warning("Timeout: Request to service unsuccessful.")
+                raise ConuException("Timeout: Request to service unsuccessful.")
+        probe_kwargs.setdefault("pause", 10)
         try:
-
-            Probe(timeout=timeout, pause=10, fnc=self.request_service, app_name=app_name,
-                  port=port, expected_output=expected_output, expected_retval=True).run()
+            Probe(timeout=timeout, fnc=self.request_service, app_name=app_name,
+                  port=port, expected_output=expected_output, expected_retval=True,
+                  **probe_kwargs).run()
         except ProbeTimeout:
             logger.warning("Timeout: Request to service unsuccessful.")
             raise ConuException("Timeout: Request to service unsuccessful.")
@@ -12,13 +12,15 @@ import json
 import re
 
 from conu.apidefs.backend import Backend
-from conu.backend.podman.container import PodmanContainer
-from conu.backend.podman.image import PodmanImage, PodmanImagePullPolicy
+from conu.apidefs.metadata import ContainerMetadata, ImageMetadata
+from conu.backend.podman.container import PodmanContainer, get_inspect_cache
+from conu.backend.podman.image import PodmanImage, PodmanImagePullPolicy, get_image_cache
+from conu.backend.podman.utils import inspect_to_metadata, inspect_to_container_metadata
 from conu.backend.podman.constants import CONU_ARTIFACT_TAG
 
 from conu.exceptions import ConuException
 
-from conu.utils import run_cmd, parse_reference
+from conu.utils import run_cmd, parse_reference, make_filters, filters_to_cli_options
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +34,8 @@ class PodmanBackend(Backend):
     ContainerClass = PodmanContainer
     ImageClass = PodmanImage
 
-    def __init__(self, logging_level=logging.INFO, logging_kwargs=None, cleanup=None):
+    def __init__(self, logging_level=logging.INFO, logging_kwargs=None, cleanup=None,
+                 inspect_ttl=None):
         """
         This method serves as a configuration interface for conu.
 
@@ -43,9 +46,22 @@ class PodmanBackend(Backend):
             - [CleanupPolicy.EVERYTHING]
             - [CleanupPolicy.VOLUMES, CleanupPolicy.TMP_DIRS]
             - [CleanupPolicy.NOTHING]
+        :param inspect_ttl: int or float, number of seconds container inspect data are cached
+                            for, 0 disables the cache; the default (1 second) is kept if None;
+                            the cache is shared by all the backend instances in the process,
+                            the previous value is restored when this backend is exited;
+                            once set, inspect(refresh=True) of containers returns cached
+                            data up to `inspect_ttl` seconds old
         """
         super(PodmanBackend, self).__init__(
             logging_level=logging_level, logging_kwargs=logging_kwargs, cleanup=cleanup)
+        self.inspect_cache = get_inspect_cache()
+        self._previous_inspect_ttl = None
+        if inspect_ttl is not None:
+            self._previous_inspect_ttl = (self.inspect_cache.ttl,
+                                          self.inspect_cache.explicit_ttl)
+            self.inspect_cache.ttl = inspect_ttl
+            self.inspect_cache.explicit_ttl = True
         # we support podman-0.11+
         podman_version = self.get_version()
         if podman_version:
@@ -75,75 +91,185 @@ class PodmanBackend(Backend):
             logger.error("unable to parse version from `podman version`")
             return
 
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        super(PodmanBackend, self).__exit__(exc_type, exc_val, exc_tb)
+        if self._previous_inspect_ttl is not None:
+            self.inspect_cache.ttl, self.inspect_cache.explicit_ttl = \
+                self._previous_inspect_ttl
+
     def cleanup_containers(self):
         # TODO: Test this
-        conu_containers = self._list_podman_containers(filter=CONU_ARTIFACT_TAG)
+        conu_containers = self._list_podman_containers(
+            filters=make_filters(label=CONU_ARTIFACT_TAG))
         for c in conu_containers:
-            logger.info("Trying to remove conu container: %s" % c)
-            logger.debug("Removing container %s created by conu", c)
-            run_cmd(["podman", "stop", c])
-            run_cmd(["podman", "rm", c])
+            logger.info("Trying to remove conu container: %s" % c["ID"])
+            logger.debug("Removing container %s created by conu", c["ID"])
+            run_cmd(["podman", "stop", c["ID"]])
+            run_cmd(["podman", "rm", c["ID"]])
+        self.inspect_cache.invalidate()
 
-    def list_containers(self):
+    def list_containers(self, label=None, name=None, status=None, ancestor=None):
         """
         List all available podman containers.
 
+        The filters are evaluated by podman, see `podman ps --filter` for their semantics.
+
+        :param label: str, list of str ("key" or "key=value") or dict, list only containers
+                      with these labels
+        :param name: str, list only containers whose name matches this string
+        :param status: str, e.g. created, running, exited
+        :param ancestor: str, list only containers created from this image (name or ID)
         :return: collection of instances of :class:`conu.PodmanContainer`
         """
-        containers = []
-        for container in self._list_podman_containers():
+        return list(self.iter_containers(label=label, name=name, status=status,
+                                         ancestor=ancestor))
+
+    def iter_containers(self, label=None, name=None, status=None, ancestor=None):
+        """
+        Same as list_containers, but the container objects are created lazily, one by one.
+
+        :param label: str, list of str ("key" or "key=value") or dict
+        :param name: str
+        :param status: str
+        :param ancestor: str
+        :return: generator of instances of :class:`conu.PodmanContainer`
+        """
+        filters = make_filters(label=label, name=name, status=status, ancestor=ancestor)
+        # one image handle per image; the images are used by the containers so they
+        # are present and there's no need to check it
+        images = {}
+        for container in self._list_podman_containers(filters=filters):
             identifier = container["ID"]
-            name = container["Names"]
+            container_name = container["Names"]
             image_name = container["Image"]
+            image_id = container.get("ImageID")
 
-            try:
-                image_name, image_tag = parse_reference(image_name)
-            except (IndexError, TypeError):
-                image_name, image_tag = None, None
+            image = images.get(image_id or image_name)
+            if image is None:
+                try:
+                    repository, image_tag = parse_reference(image_name)
+                except (IndexError, TypeError):
+                    repository, image_tag = None, None
+                image = PodmanImage(repository, tag=image_tag, identifier=image_id,
+                                    pull_policy=PodmanImagePullPolicy.NEVER)
+                images[image_id or image_name] = image
+            yield PodmanContainer(image, identifier, name=container_name)
 
-            image = PodmanImage(image_name, tag=image_tag, identifier=None)
-            container = PodmanContainer(image, identifier, name=name)
-            containers.append(container)
+    @staticmethod
+    def _inspect_many(object_type, identifiers):
+        """
+        inspect all the objects using a single podman invocation
 
-        return containers
+        :param object_type: str, "container" or "image"
+        :param identifiers: list of str
+        :return: list of dicts, in the order of identifiers
+        """
+        if not identifiers:
+            return []
+        cmdline = ["podman", object_type, "inspect"] + list(identifiers)
+        return json.loads(run_cmd(cmdline, return_output=True, log_output=False))
+
+    def inspect_containers(self, container_ids):
+        """
+        Inspect multiple containers using a single `podman container inspect` call. Inspect
+        data are also stored in the inspect cache, so the following calls of inspect() on
+        these containers are served from it.
+
+        :param container_ids: list of str
+        :return: list of instances of ContainerMetadata, in the order of container_ids
+        """
+        container_ids = list(container_ids)
+        images = {}
+        result = []
+        for container_id, inspect_data in zip(
+                container_ids, self._inspect_many("container", container_ids)):
+            self.inspect_cache.put(container_id, inspect_data)
+            image_id = inspect_data.get("Image")
+            if image_id not in images:
+                images[image_id] = PodmanImage(None, identifier=image_id,
+                                               pull_policy=PodmanImagePullPolicy.NEVER)
+            result.append(inspect_to_container_metadata(
+                ContainerMetadata(), inspect_data, images[image_id]))
+        return result
 
-    def list_images(self):
+    def inspect_images(self, image_ids):
+        """
+        Inspect multiple images; images which are not in the image cache yet are inspected
+        using a single `podman image inspect` call and stored in the cache.
+
+        :param image_ids: list of str
+        :return: list of instances of ImageMetadata, in the order of image_ids
+        """
+        image_ids = list(image_ids)
+        cache = get_image_cache().images
+        cached = {i: cache.lookup(i) for i in image_ids}
+        missing = [i for i in image_ids if cached[i] is None]
+        for image_id, inspect_data in zip(missing, self._inspect_many("image", missing)):
+            cache.put(image_id, inspect_data)
+            cached[image_id] = inspect_data
+        return [inspect_to_metadata(ImageMetadata(), cached[i]) for i in image_ids]
+
+    def _get_present_images(self):
+        present = set()
+        for image in self._list_all_podman_images():
+            present.add(image.get("id") or image.get("Id"))
+            present.update(image.get("names") or image.get("Names") or [])
+        return present
+
+    def list_images(self, name=None, label=None):
         """
         List all available podman images.
 
+        The filters are evaluated by podman, see `podman images --filter` for their semantics.
+
+        :param name: str, list only images matching this reference, e.g. "fedora:29"
+        :param label: str, list of str ("key" or "key=value") or dict, list only images
+                      with these labels
         :return: collection of instances of :class:`conu.PodmanImage`
         """
-        images = []
-        for image in self._list_all_podman_images():
+        return list(self.iter_images(name=name, label=label))
+
+    def iter_images(self, name=None, label=None):
+        """
+        Same as list_images, but the image objects are created lazily, one by one.
+
+        :param name: str
+        :param label: str, list of str ("key" or "key=value") or dict
+        :return: generator of instances of :class:`conu.PodmanImage`
+        """
+        filters = make_filters(reference=name, label=label)
+        for image in self._list_all_podman_images(filters=filters):
             try:
                 i_name, tag = parse_reference(image["names"][0])
             except (IndexError, TypeError):
                 i_name, tag = None, None
-            d_im = PodmanImage(i_name, tag=tag, identifier=image["id"],
-                               pull_policy=PodmanImagePullPolicy.NEVER)
-            images.append(d_im)
-
-        return images
+            yield PodmanImage(i_name, tag=tag, identifier=image["id"],
+                              pull_policy=PodmanImagePullPolicy.NEVER)
 
     @staticmethod
-    def _list_all_podman_images():
+    def _list_all_podman_images(filters=None):
         """
-        Finds all podman containers
+        Finds all podman images, or the ones matching the filters
+
+        :param filters: dict, filter name -> list of str, see make_filters
         :return: list of dicts with image info
         """
-        cmdline = ["podman", "images", "--format", "json"]
+        cmdline = ["podman", "images"] + filters_to_cli_options(filters or {}) + \
+            ["--format", "json"]
         output = run_cmd(cmdline, return_output=True)
         images = json.loads(output)
         return images
 
     @staticmethod
-    def _list_podman_containers(filter=None):
+    def _list_podman_containers(filters=None):
         """
-        Finds podman containers by filter or all containers
+        Finds all podman containers, or the ones matching the filters
+
+        :param filters: dict, filter name -> list of str, see make_filters
         :return: list of dicts with containers info
         """
-        option = ["--filter", filter] if filter else ["-a"]
-        cmdline = ["podman", "ps"] + option + ["--format", "json"]
+        cmdline = ["podman", "ps", "-a"] + filters_to_cli_options(filters or {}) + \
+            ["--format", "json"]
         output = run_cmd(cmdline, return_output=True)
         containers = json.loads(output)
         return containers
@@ -13,22 +13,44 @@ import functools
 import logging
 import json
 import subprocess
+import threading
+import time
 
 from conu.apidefs.container import Container
 from conu.apidefs.metadata import ContainerMetadata
-from conu.exceptions import ConuException
+from conu.exceptions import ConuException, ProbeTimeout
 
-from conu.backend.docker.container import DockerRunBuilder
+from conu.backend.docker.run_builder import DockerRunBuilder
 from conu.backend.podman.utils import inspect_to_container_metadata
 
 from conu.utils import check_port, run_cmd, graceful_get
-from conu.utils.probes import Probe
+from conu.utils.cache import TTLCache
+from conu.utils.exec_session import ProcessExecSession
+from conu.utils.output_sinks import ListSink, stream_cmd
+from conu.utils.probes import PauseSchedule, Probe
+from conu.utils.probe_stats import AdaptiveSchedule
 
 from conu.backend.podman.constants import CONU_ARTIFACT_TAG
 
 
 logger = logging.getLogger(__name__)
 
+inspect_cache = None
+
+
+def get_inspect_cache():
+    """
+    provide cache of `podman container inspect` data shared by all the podman containers; entries
+    are invalidated by lifecycle methods of PodmanContainer; inspect(refresh=True) always runs
+    `podman container inspect` and only stores the result here
+
+    :return: instance of :class:`conu.utils.cache.TTLCache`
+    """
+    global inspect_cache
+    if inspect_cache is None:
+        inspect_cache = TTLCache()
+    return inspect_cache
+
 
 class PodmanRunBuilder(DockerRunBuilder):
     """
@@ -96,16 +118,31 @@ class PodmanContainer(Container):
         """
         return cached metadata by default
 
-        :param refresh: bool, returns up to date metadata if set to True
+        :param refresh: bool, returns up to date metadata if set to True, unless `inspect_ttl`
+                        was set on the backend; otherwise the data may come from the inspect
+                        cache shared by all podman containers, they are at most `ttl` seconds
+                        old, see :func:`get_inspect_cache`
         :return: dict
         """
         if refresh or not self._inspect_data:
             identifier = self._id or self.name
             if not identifier:
                 raise ConuException("This container does not have a valid identifier.")
-            self._inspect_data = self._inspect(identifier)
+            cache = get_inspect_cache()
+            self._inspect_data = cache.get(identifier, self._inspect,
+                                           force=refresh and not cache.explicit_ttl)
         return self._inspect_data
 
+    def invalidate_inspect_cache(self):
+        """
+        forget cached inspect data of this container, the next call of inspect(refresh=True)
+        runs `podman container inspect`; host and port for HTTP requests are resolved again as well
+
+        :return: None
+        """
+        get_inspect_cache().invalidate(self._id, self.name)
+        self.invalidate_http_endpoint()
+
     @staticmethod
     def _inspect(identifier):
         cmdline = ["podman", "container", "inspect", identifier]
@@ -190,12 +227,11 @@ class PodmanContainer(Container):
         if not port:
             return port_mappings
 
-        if str(port) not in self.get_ports():
-            return []
-
-        for p in port_mappings:
+        # look the port up in the same inspect data, get_ports() would inspect again
+        for p in port_mappings or {}:
             if p.split("/")[0] == str(port):
                 return port_mappings[p]
+        return []
 
     def get_image_name(self):
         """
@@ -208,17 +244,32 @@ class PodmanContainer(Container):
             return metadata["Config"].get("Image", None)
         return None
 
-    def wait_for_port(self, port, timeout=10, **probe_kwargs):
+    def wait_for_port(self, port, timeout=10, adaptive=False, **probe_kwargs):
         """
         block until specified port starts accepting connections, raises an exc ProbeTimeout
         if timeout is reached
 
         :param port: int, port number
         :param timeout: int or float (seconds), time to wait for establishing the connection
-        :param probe_kwargs: arguments passed to Probe constructor
+        :param adaptive: bool, learn how long it takes until the port is open for this image
+                         and check the port mostly around that time, see
+                         :class:`conu.utils.probe_stats.AdaptiveSchedule`
+        :param probe_kwargs: arguments passed to Probe constructor, e.g.
+                             pause=conu.utils.probes.FastStart(); when only `pause` is set,
+                             the port is checked via :meth:`wait_for_ports`
         :return: None
         """
-        Probe(timeout=timeout, fnc=functools.partial(self.is_port_open, port), **probe_kwargs).run()
+        if adaptive and "pause" not in probe_kwargs:
+            probe_kwargs["pause"] = AdaptiveSchedule(self.image.get_id(), "wait_for_port:%s" % port)
+        if set(probe_kwargs) - {"pause"}:
+            Probe(timeout=timeout, fnc=functools.partial(self.is_port_open, port),
+                  **probe_kwargs).run()
+            return
+        pause = probe_kwargs.get("pause", 0.1)
+        start = time.time()
+        self.wait_for_ports([port], timeout=timeout, pause=pause)
+        if isinstance(pause, PauseSchedule):
+            pause.record(time.time() - start)
 
     def delete(self, force=False, **kwargs):
         """
@@ -230,6 +281,7 @@ class PodmanContainer(Container):
         """
         cmdline = ["podman", "rm", "--force" if force else "", self.get_name()]
         run_cmd(cmdline)
+        self.invalidate_inspect_cache()
 
     def mount(self, mount_point=None):
         """
@@ -303,7 +355,79 @@ class PodmanContainer(Container):
         """
         timeout = ["--interval=%s" % timeout] if timeout else []
         cmdline = ["podman", "wait"] + timeout + [self._id or self.get_id()]
-        return run_cmd(cmdline, return_output=True)
+        try:
+            return run_cmd(cmdline, return_output=True)
+        finally:
+            self.invalidate_inspect_cache()
+
+    def _get_health_result(self):
+        """
+        :return: None if the healthcheck didn't decide yet, bool otherwise
+        """
+        self.invalidate_inspect_cache()
+        try:
+            state = self.inspect(refresh=True)["State"]
+        except subprocess.CalledProcessError:
+            # the container was removed
+            return False
+        # older podman versions use "Healthcheck" instead of "Health"
+        health = graceful_get(state, "Health", "Status") or \
+            graceful_get(state, "Healthcheck", "Status")
+        if state.get("Status") in ("exited", "stopped", "dead"):
+            return False
+        if health in ("healthy", "unhealthy"):
+            return health == "healthy"
+        return None
+
+    def wait_for_healthy(self, timeout=None):
+        """
+        Block until the HEALTHCHECK of the container reports a result. The check is scheduled
+        by podman itself (see `--health-cmd` and friends), this method follows `podman events`
+        and inspects the container only when its health status changes.
+
+        :param timeout: int or float (seconds), None means forever
+        :return: bool, True if the container is healthy, False if it's unhealthy or it stopped
+        """
+        healthcheck = graceful_get(self.inspect(refresh=True), "Config", "Healthcheck", "Test")
+        if not healthcheck or healthcheck[0] == "NONE":
+            raise ConuException("Container %s doesn't have a healthcheck configured." % self)
+
+        cmdline = ["podman", "events", "--format", "json",
+                   "--filter", "container=%s" % self.get_id(),
+                   "--filter", "event=health_status",
+                   "--filter", "event=died",
+                   "--filter", "event=remove"]
+        logger.debug('command: "%s"', " ".join(cmdline))
+        process = subprocess.Popen(cmdline, stdout=subprocess.PIPE, universal_newlines=True)
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            process.kill()
+
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, expire)
+            timer.daemon = True
+            timer.start()
+        try:
+            # we are subscribed now, the status may have been reported already
+            result = self._get_health_result()
+            while result is None:
+                line = process.stdout.readline()
+                if not line:
+                    if expired.is_set():
+                        raise ProbeTimeout("Timeout exceeded.")
+                    raise ConuException("podman events exited unexpectedly.")
+                logger.debug("podman event: %s", line.strip())
+                result = self._get_health_result()
+            return result
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
 
     def exit_code(self):
         """
@@ -313,17 +437,39 @@ class PodmanContainer(Container):
         """
         return graceful_get(self.inspect(refresh=True), "State", "ExitCode")
 
-    def execute(self, command):
+    def execute(self, command, sink=None, stderr_sink=None, log_output=True,
+                log_rate_limit=None):
         """
         Execute a command in this container -- the container needs to be running.
 
+        Output of the command is returned as a string unless a sink is provided: then it's
+        streamed into the sink as it comes, see :mod:`conu.utils.output_sinks`.
+
         :param command: list of str, command to execute in the container
-        :return: str
+        :param sink: instance of OutputSink, receives the output
+        :param stderr_sink: instance of OutputSink, receives stderr separately from stdout
+        :param log_output: bool, log the streamed output line by line
+        :param log_rate_limit: int, maximum number of lines logged per second, no limit if None
+        :return: str, output of the command with stderr merged into stdout (only stdout if
+                 `stderr_sink` is set), or `sink` if it was provided
         """
         logger.info("running command %s", command)
         cmd = ["podman", "exec", self.get_id()] + command
-        output = run_cmd(cmd, return_output=True)
-        return output
+        if sink is None and stderr_sink is None:
+            return run_cmd(cmd, return_output=True)
+        response = ListSink() if sink is None else sink
+        stream_cmd(cmd, response, stderr_sink=stderr_sink, log_output=log_output,
+                   log_rate_limit=log_rate_limit)
+        return response.getvalue().decode("utf-8") if sink is None else sink
+
+    def session(self, shell="/bin/sh"):
+        """
+        start a persistent shell in this container via `podman exec -i`
+
+        :param shell: str, path to the shell in the container
+        :return: instance of :class:`conu.utils.exec_session.ProcessExecSession`
+        """
+        return ProcessExecSession(["podman", "exec", "-i", self.get_id(), shell], shell=shell)
 
     @property
     def metadata(self):
@@ -346,3 +492,31 @@ class PodmanContainer(Container):
         Start this podman container
         """
         run_cmd(["podman", "start", self.get_id()])
+        self.invalidate_inspect_cache()
+
+    def stop(self):
+        """
+        stop this podman container
+
+        :return: None
+        """
+        run_cmd(["podman", "stop", self.get_id()])
+        self.invalidate_inspect_cache()
+
+    def commit(self, repository, tag="latest"):
+        """
+        create an image from the current state of this container
+
+        :param repository: str, name of the new image
+        :param tag: str, tag of the new image
+        :return: instance of PodmanImage
+        """
+        # conu.backend.podman.image imports this module
+        from conu.backend.podman.image import PodmanImage, PodmanImagePullPolicy
+
+        output = run_cmd(["podman", "commit", self.get_id(), "%s:%s" % (repository, tag)],
+                         return_output=True)
+        # the ID is on the last line
+        identifier = output.strip().splitlines()[-1]
+        return PodmanImage(repository, tag=tag, identifier=identifier,
+                           pull_policy=PodmanImagePullPolicy.NEVER)
@@ -14,6 +14,7 @@ import json
 import logging
 import os
 import subprocess
+import time
 
 import six
 
@@ -22,13 +23,28 @@ from conu.apidefs.image import Image
 from conu.apidefs.metadata import ImageMetadata
 from conu.backend.podman.container import PodmanContainer, PodmanRunBuilder
 from conu.backend.podman.utils import inspect_to_metadata
-from conu.exceptions import ConuException, CountExceeded, ProbeTimeout
+from conu.exceptions import ConuException
 from conu.utils import run_cmd, random_tmp_filename, graceful_get
+from conu.utils.cache import ImageInspectCache
+from conu.utils.cidfile import parse_container_id, wait_for_cidfile
 from conu.utils.filesystem import Volume
-from conu.utils.probes import Probe
 
 logger = logging.getLogger(__name__)
 
+image_cache = None
+
+
+def get_image_cache():
+    """
+    provide cache of `podman inspect` data shared by all the podman images
+
+    :return: instance of :class:`conu.utils.cache.ImageInspectCache`
+    """
+    global image_cache
+    if image_cache is None:
+        image_cache = ImageInspectCache.for_backend("podman")
+    return image_cache
+
 
 class PodmanImagePullPolicy(enum.Enum):
     """
@@ -52,13 +68,16 @@ class PodmanImage(Image):
     """
 
     def __init__(self, repository, tag="latest", identifier=None,
-                 pull_policy=PodmanImagePullPolicy.IF_NOT_PRESENT):
+                 pull_policy=PodmanImagePullPolicy.IF_NOT_PRESENT, lazy=False):
         """
         :param repository: str, image name, examples: "fedora", "registry.fedoraproject.org/fedora",
                             "tomastomecek/sen", "docker.io/tomastomecek/sen"
         :param tag: str, tag of the image, when not specified, "latest" is implied
         :param identifier: str, unique identifier for this image
         :param pull_policy: enum, strategy to apply for pulling the image
+        :param lazy: bool, apply the pull policy once the image is used for the first time
+                     (e.g. when a container is created), not in the constructor; see also
+                     `ensure_present` method of the backend
         """
         super(PodmanImage, self).__init__(repository, tag=tag)
         if not isinstance(tag, (six.string_types, None.__class__)):
@@ -72,15 +91,9 @@ class PodmanImage(Image):
         self._inspect_data = None
         self._metadata = None
 
-        if self.pull_policy == PodmanImagePullPolicy.ALWAYS:
-            logger.debug("pull policy set to 'always', pulling the image")
-            self.pull()
-        elif self.pull_policy == PodmanImagePullPolicy.IF_NOT_PRESENT and not self.is_present():
-            logger.debug("pull policy set to 'if_not_present' and image is not present, "
-                         "pulling the image")
-            self.pull()
-        elif self.pull_policy == PodmanImagePullPolicy.NEVER:
-            logger.debug("pull policy set to 'never'")
+        self._pull_policy_pending = True
+        if not lazy:
+            self._apply_pull_policy()
 
     def __repr__(self):
         return "PodmanImage(repository=%s, tag=%s)" % (self.name, self.tag)
@@ -96,12 +109,45 @@ class PodmanImage(Image):
         """
         return "%s:%s" % (self.name, self.tag)
 
+    def _is_in(self, present):
+        """
+        :param present: set of str, names and IDs of images present on the system, or None
+        :return: bool, True if the image is present
+        """
+        if present is not None:
+            if self.get_full_name() in present or (self._id and self._id in present):
+                return True
+        # a different form of the name or a short ID may have been used, ask directly
+        return self.is_present()
+
+    def _apply_pull_policy(self, present=None):
+        """
+        apply the pull policy unless it was applied already
+
+        :param present: set of str, names and IDs of images present on the system; if it's not
+                        provided, the presence of the image is checked directly
+        :return: None
+        """
+        if not self._pull_policy_pending:
+            return
+        self._pull_policy_pending = False
+        if self.pull_policy == PodmanImagePullPolicy.ALWAYS:
+            logger.debug("pull policy set to 'always', pulling the image")
+            self.pull()
+        elif self.pull_policy == PodmanImagePullPolicy.IF_NOT_PRESENT and not self._is_in(present):
+            logger.debug("pull policy set to 'if_not_present' and image is not present, "
+                         "pulling the image")
+            self.pull()
+        elif self.pull_policy == PodmanImagePullPolicy.NEVER:
+            logger.debug("pull policy set to 'never'")
+
     def get_id(self):
         """
         get unique identifier of this image
 
         :return: str
         """
+        self._apply_pull_policy()
         if self._id is None:
             self._id = graceful_get(self.inspect(refresh=False), "Id")
         return self._id
@@ -112,8 +158,12 @@ class PodmanImage(Image):
 
         :return: bool, True if it is, False if it's not
         """
+        identifier = self._id or self.get_full_name()
+        if not identifier:
+            raise ConuException("This image does not have a valid identifier.")
         try:
-            return bool(self.inspect())
+            # the image cache can't tell whether the image is still present
+            return bool(self._inspect(identifier))
         except subprocess.CalledProcessError:
             return False
 
@@ -125,6 +175,7 @@ class PodmanImage(Image):
         :return: None
         """
         run_cmd(["podman", "pull", self.get_full_name()])
+        get_image_cache().invalidate_names(self.get_full_name())
 
     def tag_image(self, repository=None, tag=None):
         """
@@ -141,20 +192,27 @@ class PodmanImage(Image):
         t = tag or "latest"
         identifier = self._id or self.get_id()
         run_cmd(["podman", "tag", identifier, "%s:%s" % (r, t)])
+        get_image_cache().invalidate_names("%s:%s" % (r, t))
         return PodmanImage(r, tag=t)
 
     def inspect(self, refresh=True):
         """
         provide metadata about the image; flip refresh=True if cached metadata are enough
 
-        :param refresh: bool, update the metadata with up to date content
+        :param refresh: bool, update the metadata with up to date content; data of an image ID
+                        never change, so they are served from the image cache, only the name
+                        of the image is resolved to an ID again, see :func:`get_image_cache`
         :return: dict
         """
+        self._apply_pull_policy()
         if refresh or not self._inspect_data:
             identifier = self._id or self.get_full_name()
             if not identifier:
                 raise ConuException("This image does not have a valid identifier.")
-            self._inspect_data = self._inspect(identifier)
+            if self._id:
+                self._inspect_data = get_image_cache().get_by_id(self._id, self._inspect)
+            else:
+                self._inspect_data = get_image_cache().get_by_name(identifier, self._inspect)
         return self._inspect_data
 
     @staticmethod
@@ -178,6 +236,10 @@ class PodmanImage(Image):
         else:
             cmdline = ["podman", "rmi", identifier]
         run_cmd(cmdline)
+        cache = get_image_cache()
+        cache.invalidate_names(self.get_full_name())
+        # inspect() of this image must not be served from the cache anymore
+        cache.invalidate_id(self._id, graceful_get(self._inspect_data, cache.id_key))
 
     def _run_container(self, run_command_instance, callback):
         """ this is internal method """
@@ -186,30 +248,13 @@ class PodmanImage(Image):
         run_command_instance.options += ["--cidfile=%s" % tmpfile]
         logger.debug("podman command: %s" % run_command_instance)
         response = callback()
-        # and we need to wait now; inotify would be better but is way more complicated and
-        # adds dependency
         try:
-            Probe(timeout=10, count=25, pause=0.2, fnc=lambda: self._file_not_empty(tmpfile)).run()
-        except (CountExceeded, ProbeTimeout) as ex:
+            container_id = wait_for_cidfile(tmpfile, timeout=10, process=response)
+        except ConuException as ex:
             logger.info("exception while running a container: %s", ex)
             raise ConuException("Container was not created, please see the logs.")
-        with open(tmpfile, 'r') as fd:
-            container_id = fd.read()
         return container_id, response
 
-    @staticmethod
-    def _file_not_empty(tmpfile):
-        """
-        Returns True if file exists and it is not empty
-        to check if it is time to read container ID from cidfile
-        :param tmpfile: str, path to file
-        :return: bool, True if container id is written to the file
-        """
-        if os.path.exists(tmpfile):
-            return os.stat(tmpfile).st_size != 0
-        else:
-            return False
-
     def run_via_binary(self, run_command_instance=None, command=None, volumes=None,
                        additional_opts=None, **kwargs):
         """
@@ -232,6 +277,7 @@ class PodmanImage(Image):
         :param additional_opts: list of str, additional options for `podman run`
         :return: instance of PodmanContainer
         """
+        self._apply_pull_policy()
 
         logger.info("run container via binary in background")
 
@@ -263,17 +309,23 @@ class PodmanImage(Image):
         if volumes:
             run_command_instance.options += self.get_volume_options(volumes=volumes)
 
-        def callback():
-            try:
-                # FIXME: catch std{out,err}, print stdout to logger.debug, stderr to logger.error
-                run_cmd(run_command_instance.build())
-            except subprocess.CalledProcessError as ex:
-                raise ConuException("Container exited with an error: %s" % ex.returncode)
-
-        container_id, _ = self._run_container(run_command_instance, callback)
+        logger.debug("podman command: %s" % run_command_instance)
+        start = time.time()
+        try:
+            # `podman run -d` prints ID of the container once it's started
+            output = run_cmd(run_command_instance.build(), return_output=True)
+        except subprocess.CalledProcessError as ex:
+            raise ConuException("Container exited with an error: %s" % ex.returncode)
+        container_id = parse_container_id(output)
+        if not container_id:
+            logger.info("output of podman: %s", output)
+            raise ConuException("Container was not created, please see the logs.")
+        time_to_id = time.time() - start
         container_name = graceful_get(self._inspect(container_id), "Name")
 
-        return PodmanContainer(self, container_id, name=container_name)
+        container = PodmanContainer(self, container_id, name=container_name)
+        container.time_to_id = time_to_id
+        return container
 
     def run_via_binary_in_foreground(
             self, run_command_instance=None, command=None, volumes=None,
@@ -309,6 +361,7 @@ class PodmanImage(Image):
         :param container_name: str, pretty container identifier
         :return: instance of PodmanContainer
         """
+        self._apply_pull_policy()
         logger.info("run container via binary in foreground")
 
         if (command is not None or additional_opts is not None) \
@@ -345,7 +398,9 @@ class PodmanImage(Image):
         def callback():
             return subprocess.Popen(run_command_instance.build(), **popen_params)
 
+        start = time.time()
         container_id, popen_instance = self._run_container(run_command_instance, callback)
+        time_to_id = time.time() - start
 
         actual_name = graceful_get(self._inspect(container_id), "Name")
 
@@ -355,8 +410,10 @@ class PodmanImage(Image):
                 + str(container_name) + " Actual = " + str(actual_name))
         if not container_name:
             container_name = actual_name
-        return PodmanContainer(
+        container = PodmanContainer(
             self, container_id, popen_instance=popen_instance, name=container_name)
+        container.time_to_id = time_to_id
+        return container
 
     @staticmethod
     def get_volume_options(volumes):
@@ -7,4 +7,5 @@
 You can find some high-level functions defined in this submodule.
 """
 
+from conu.helpers.container_pool import ContainerPool, ContainerResetPolicy
 from conu.helpers.docker_backend import get_container_output
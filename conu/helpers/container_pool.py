@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+"""
+Pool of pre-created containers: tests which need a container of the same image with the same
+options acquire one from the pool, so the container startup is off their critical path.
+
+.. code-block:: python
+
+    with ContainerPool(image, run_spec, size=4) as pool:
+        with pool.container() as c:
+            assert c.is_running()
+"""
+
+import enum
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from six.moves import queue
+
+from conu.exceptions import ConuException, ProbeTimeout
+from conu.utils import random_str
+
+
+logger = logging.getLogger(__name__)
+
+
+class ContainerResetPolicy(enum.Enum):
+    """
+    What happens to a container when it's released back to the pool.
+
+    * RESTART - the container is stopped and started again, changes in its filesystem are kept
+    * COMMIT - the container is committed to an image and replaced by a new container created
+      from that image: changes in the filesystem are kept, running processes are not
+    * DISCARD - the container is deleted and replaced by a new container created from the
+      original image
+    """
+    RESTART = "restart"
+    COMMIT = "commit"
+    DISCARD = "discard"
+
+
+class ContainerPool(object):
+    """
+    Creates `size` containers in background threads and hands them out; released containers
+    are reset according to the reset policy and become available again.
+    """
+
+    def __init__(self, image, run_spec=None, size=2, reset=ContainerResetPolicy.DISCARD,
+                 workers=None):
+        """
+        :param image: instance of Image, e.g. DockerImage or PodmanImage
+        :param run_spec: how to run the containers, see
+                         :meth:`conu.apidefs.image.Image.run_from_spec`; the spec must not set
+                         a name of the container
+        :param size: int, number of containers in the pool
+        :param reset: ContainerResetPolicy, what to do with released containers
+        :param workers: int, number of threads creating and resetting containers, `size`
+                        by default
+        """
+        if size < 1:
+            raise ConuException("size of the pool needs to be at least 1")
+        if getattr(run_spec, "name", None) or "--name" in getattr(run_spec, "options", []):
+            raise ConuException("containers in a pool can't have the same name")
+        self.image = image
+        self.run_spec = run_spec
+        self.size = size
+        self.reset = reset
+        self._lock = threading.Lock()
+        self._closed = False
+        # containers created by the pool which were not deleted yet
+        self._containers = set()
+        # images created by ContainerResetPolicy.COMMIT
+        self._committed_images = []
+        # (container, exception) tuples
+        self._ready = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers or size)
+        for _ in range(size):
+            self._executor.submit(self._prepare, self._create, image)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _create(self, image):
+        return image.run_from_spec(self.run_spec)
+
+    def _track(self, container):
+        with self._lock:
+            self._containers.add(container)
+            closed = self._closed
+        if closed:
+            # the pool was closed while the container was being created
+            self._delete(container)
+            return None
+        return container
+
+    def _prepare(self, fnc, *args):
+        """ create or reset a container in a worker thread and make it available """
+        try:
+            container = self._track(fnc(*args))
+        except Exception as ex:
+            logger.error("can't prepare a container for the pool: %r", ex)
+            self._ready.put((None, ex))
+            return
+        if container is not None:
+            self._ready.put((container, None))
+
+    def _delete(self, container):
+        with self._lock:
+            self._containers.discard(container)
+        try:
+            container.delete(force=True)
+        except Exception as ex:
+            logger.warning("can't delete container %s: %r", container, ex)
+
+    def _restart(self, container):
+        container.stop()
+        container.start()
+        return container
+
+    def _commit(self, container):
+        image = container.commit("conu-pool-%s" % random_str(), tag="latest")
+        with self._lock:
+            self._committed_images.append(image)
+        self._delete(container)
+        return self._create(image)
+
+    def _discard(self, container):
+        self._delete(container)
+        return self._create(self.image)
+
+    def acquire(self, timeout=None):
+        """
+        provide a running container, block until one is available
+
+        :param timeout: int or float, seconds to wait, wait forever if None
+        :return: instance of Container
+        """
+        if self._closed:
+            raise ConuException("the pool is closed")
+        try:
+            container, exception = self._ready.get(timeout=timeout)
+        except queue.Empty:
+            raise ProbeTimeout("no container was available in %ss" % timeout)
+        if exception is not None:
+            # don't keep trying: the image or the spec is most likely broken
+            raise ConuException("container for the pool could not be created: %s" % exception)
+        return container
+
+    def release(self, container):
+        """
+        return the container to the pool, it's reset in background
+
+        :param container: instance of Container obtained via acquire()
+        :return: None
+        """
+        if self._closed:
+            self._delete(container)
+            return
+        reset = {
+            ContainerResetPolicy.RESTART: self._restart,
+            ContainerResetPolicy.COMMIT: self._commit,
+            ContainerResetPolicy.DISCARD: self._discard,
+        }[self.reset]
+        try:
+            self._executor.submit(self._prepare, reset, container)
+        except RuntimeError:
+            # the pool was closed in the meantime
+            self._delete(container)
+
+    @contextmanager
+    def container(self, timeout=None):
+        """
+        context manager which acquires a container and releases it afterwards:
+
+        .. code-block:: python
+
+            with pool.container() as c:
+                c.execute(["ls"])
+
+        :param timeout: int or float, seconds to wait for a container, forever if None
+        :return: context manager providing instance of Container
+        """
+        container = self.acquire(timeout=timeout)
+        try:
+            yield container
+        finally:
+            self.release(container)
+
+    def close(self):
+        """
+        wait for the background work to finish and delete all the containers of the pool
+        and images created by it
+
+        :return: None
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            containers = list(self._containers)
+            images, self._committed_images = self._committed_images, []
+        for container in containers:
+            self._delete(container)
+        # the newest images are based on the older ones
+        for image in reversed(images):
+            try:
+                image.rmi(force=True)
+            except Exception as ex:
+                logger.warning("can't remove image %s: %r", image, ex)
+
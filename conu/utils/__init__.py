@@ -10,13 +10,16 @@ import errno
 import logging
 import os
 import random
+import selectors
 import shutil
 import socket
 import string
 import subprocess
 import tempfile
+import time
 
-from conu.exceptions import ConuException
+from conu.exceptions import ConuException, ProbeTimeout
+from conu.utils.capabilities import get_capabilities
 
 
 logger = logging.getLogger(__name__)
@@ -66,16 +69,129 @@ def check_port(port, host, timeout=10):
         sock.close()
 
 
+class _PortAttempt(object):
+    """
+    state of one endpoint in iter_open_ports
+    """
+
+    def __init__(self, host, port, pauses):
+        self.host = host
+        self.port = port
+        self.pauses = pauses
+        self.sock = None
+        self.next_try = 0.0
+        self.connect_deadline = None
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def iter_open_ports(endpoints, timeout=10, pause=0.1, connect_timeout=2):
+    """
+    try to connect to all the endpoints concurrently using non-blocking sockets and a single
+    selector; yield every endpoint as soon as it accepts a connection, failed endpoints are
+    tried again after a pause
+
+    :param endpoints: list of tuples (host, port)
+    :param timeout: int or float (seconds), stop trying after this time, -1 means forever
+    :param pause: int, float or instance of :class:`conu.utils.probes.PauseSchedule`, how long
+                  to wait before another attempt on a failed endpoint
+    :param connect_timeout: int or float (seconds), abandon a single connection attempt
+                            after this time
+    :return: generator of tuples (host, port)
+    """
+    from conu.utils.probes import _pause_iterator
+
+    deadline = None if timeout == -1 else time.time() + timeout
+    pending = [_PortAttempt(host, int(port), _pause_iterator(pause)) for host, port in endpoints]
+    selector = selectors.DefaultSelector()
+
+    def fail(attempt, reason):
+        logger.debug("port %s:%s is closed: %s", attempt.host, attempt.port, reason)
+        if attempt.sock is not None:
+            selector.unregister(attempt.sock)
+            attempt.close()
+        attempt.next_try = time.time() + next(attempt.pauses)
+
+    try:
+        while pending:
+            now = time.time()
+            if deadline is not None and now >= deadline:
+                return
+            for attempt in pending:
+                if attempt.sock is None and attempt.next_try <= now:
+                    family = socket.AF_INET6 if ":" in attempt.host else socket.AF_INET
+                    attempt.sock = socket.socket(family, socket.SOCK_STREAM)
+                    attempt.sock.setblocking(False)
+                    attempt.connect_deadline = now + connect_timeout
+                    selector.register(attempt.sock, selectors.EVENT_WRITE, attempt)
+                    try:
+                        result = attempt.sock.connect_ex((attempt.host, attempt.port))
+                    except socket.error as ex:
+                        fail(attempt, ex)
+                        continue
+                    if result not in (0, errno.EINPROGRESS, errno.EAGAIN):
+                        fail(attempt, os.strerror(result))
+                elif attempt.sock is not None and attempt.connect_deadline <= now:
+                    fail(attempt, "connection timed out")
+
+            wake_ups = [attempt.connect_deadline if attempt.sock else attempt.next_try
+                        for attempt in pending]
+            if deadline is not None:
+                wake_ups.append(deadline)
+            for key, _ in selector.select(max(0.0, min(wake_ups) - time.time())):
+                attempt = key.data
+                result = attempt.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if result != 0:
+                    fail(attempt, os.strerror(result))
+                    continue
+                logger.debug("port is opened: %s:%s", attempt.host, attempt.port)
+                selector.unregister(attempt.sock)
+                attempt.close()
+                pending.remove(attempt)
+                yield attempt.host, attempt.port
+    finally:
+        for attempt in pending:
+            attempt.close()
+        selector.close()
+
+
+def wait_for_ports(endpoints, timeout=10, pause=0.1, connect_timeout=2):
+    """
+    block until all the endpoints accept connections, raises an exc ProbeTimeout if timeout
+    is reached; all the endpoints are checked concurrently from a single event loop, e.g.::
+
+        wait_for_ports([("172.17.0.2", 80), ("172.17.0.3", 5432)], timeout=30)
+
+    :param endpoints: list of tuples (host, port)
+    :param timeout: int or float (seconds), time to wait for all the endpoints, -1 means
+                    forever
+    :param pause: int, float or instance of :class:`conu.utils.probes.PauseSchedule`, how long
+                  to wait before another attempt on a failed endpoint
+    :param connect_timeout: int or float (seconds), abandon a single connection attempt
+                            after this time
+    :return: None
+    """
+    remaining = set((host, int(port)) for host, port in endpoints)
+    for endpoint in iter_open_ports(endpoints, timeout=timeout, pause=pause,
+                                    connect_timeout=connect_timeout):
+        remaining.discard(endpoint)
+    if remaining:
+        raise ProbeTimeout("Timeout exceeded, these ports are not open: %s" % ", ".join(
+            "%s:%s" % endpoint for endpoint in sorted(remaining)))
+
+
 def get_selinux_status():
     """
-    get SELinux status of host
+    get SELinux status of host, the value is probed once per process, see
+    :class:`conu.utils.capabilities.CapabilityRegistry`; raises CommandDoesNotExistException
+    if the status can't be read from /sys/fs/selinux and `getenforce` is not available
 
-    :return: string, one of Enforced, Permissive, Disabled
+    :return: string, one of Enforcing, Permissive, Disabled
     """
-    getenforce_command_exists()
-    # alternatively, we could read directly from /sys/fs/selinux/{enforce,status}, but status is
-    # empty (why?) and enforce doesn't tell whether SELinux is disabled or not
-    o = run_cmd(["getenforce"], return_output=True).strip()  # libselinux-utils
+    o = get_capabilities().selinux_status()
     logger.debug("SELinux is %r", o)
     return o
 
@@ -151,6 +267,23 @@ def mkdtemp():
     return tempfile.mkdtemp(prefix="conu-")
 
 
+def get_cache_dir():
+    """
+    provide directory for files which conu keeps across sessions: $XDG_CACHE_HOME/conu
+    (~/.cache/conu by default), the directory is created if it doesn't exist
+
+    :return: str, path to the directory
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    path = os.path.join(cache_home, "conu")
+    try:
+        os.makedirs(path)
+    except OSError as ex:
+        if ex.errno != errno.EEXIST:
+            raise
+    return path
+
+
 def random_tmp_filename():
     """ generate string which can be used as a filename for temporary file """
     return "conu-" + random_str(32)
@@ -160,31 +293,37 @@ class CommandDoesNotExistException(ConuException):
     """ Requested command is not present on the system """
 
 
+def _find_command(command, noop_invocation):
+    try:
+        return bool(shutil.which(command))  # py3 only
+    except AttributeError:  # py2 branch
+        try:
+            p = subprocess.Popen(noop_invocation, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError:
+            return False
+        stdout, stderr = p.communicate()
+        if p.returncode != 0:
+            logger.error("`%s` exited with a non-zero return code (%s)",
+                         noop_invocation, p.returncode)
+            logger.error("command stdout = %s", stdout)
+            logger.error("command stderr = %s", stderr)
+        return p.returncode == 0
+
+
 def command_exists(command, noop_invocation, exc_msg):
     """
     Verify that the provided command exists. Raise CommandDoesNotExistException in case of an
-    error or if the command does not exist.
+    error or if the command does not exist. A positive result is cached, see
+    :class:`conu.utils.capabilities.CapabilityRegistry`.
 
     :param command: str, command to check (python 3 only)
     :param noop_invocation: list of str, command to check (python 2 only)
     :param exc_msg: str, message of exception when command does not exist
     :return: bool, True if everything's all right (otherwise exception is thrown)
     """
-    try:
-        found = bool(shutil.which(command))  # py3 only
-    except AttributeError:  # py2 branch
-        try:
-            p = subprocess.Popen(noop_invocation, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        except OSError:
-            found = False
-        else:
-            stdout, stderr = p.communicate()
-            found = p.returncode == 0
-            if not found:
-                logger.error("`%s` exited with a non-zero return code (%s)",
-                             noop_invocation, p.returncode)
-                logger.error("command stdout = %s", stdout)
-                logger.error("command stderr = %s", stderr)
+    # the command may be installed later, so a missing one is probed again next time
+    found = get_capabilities().get(
+        "command:%s" % command, lambda: _find_command(command, noop_invocation), cache_if=bool)
     if not found:
         raise CommandDoesNotExistException(exc_msg)
     return True
@@ -245,25 +384,20 @@ def check_docker_command_works():
     :return: bool, True if all is good, otherwise ConuException or CommandDoesNotExistException
               is thrown
     """
-    try:
-        out = subprocess.check_output(["docker", "version"],
-                                      stderr=subprocess.STDOUT,
-                                      universal_newlines=True)
-    except OSError:
+    returncode, out = get_capabilities().command_result(["docker", "version"])
+    if returncode is None:
         logger.info("docker binary is not available")
         raise CommandDoesNotExistException(
             "docker command doesn't seem to be available on your system. "
             "Please install and configure docker."
         )
-    except subprocess.CalledProcessError as ex:
-        logger.error("exception: %s", ex)
-        logger.error("rc: %s, output: %r", ex.returncode, ex.output)
+    if returncode:
+        logger.error("rc: %s, output: %r", returncode, out)
         raise ConuException(
             "`docker version` call failed, it seems that your docker daemon is misconfigured or "
             "this user can't communicate with dockerd."
         )
-    else:
-        logger.info("docker environment info: %r", out)
+    logger.info("docker environment info: %r", out)
     return True
 
 
@@ -274,24 +408,19 @@ def check_podman_command_works():
     :return: bool, True if all is good, otherwise ConuException or CommandDoesNotExistException
               is thrown
     """
-    try:
-        out = subprocess.check_output(["podman", "version"],
-                                      stderr=subprocess.STDOUT,
-                                      universal_newlines=True)
-    except OSError:
+    returncode, out = get_capabilities().command_result(["podman", "version"])
+    if returncode is None:
         logger.error("podman binary is not available")
         raise CommandDoesNotExistException(
             "podman command doesn't seem to be available on your system. "
             "Please install and configure podman."
         )
-    except subprocess.CalledProcessError as ex:
-        logger.error("exception: %s", ex)
-        logger.error("rc: %s, output: %r", ex.returncode, ex.output)
+    if returncode:
+        logger.error("rc: %s, output: %r", returncode, out)
         raise ConuException(
             "`podman version` call failed, it seems that your installation of podman is misconfigured"
         )
-    else:
-        logger.info("podman environment info: %r", out)
+    logger.info("podman environment info: %r", out)
     return True
 
 
@@ -302,24 +431,19 @@ def check_buildah_command_works():
     :return: bool, True if all is good, otherwise ConuException or CommandDoesNotExistException
               is thrown
     """
-    try:
-        out = subprocess.check_output(["buildah", "version"],
-                                      stderr=subprocess.STDOUT,
-                                      universal_newlines=True)
-    except OSError:
+    returncode, out = get_capabilities().command_result(["buildah", "version"])
+    if returncode is None:
         logger.error("buildah binary is not available")
         raise CommandDoesNotExistException(
             "buildah command doesn't seem to be available on your system. "
             "Please install and configure buildah."
         )
-    except subprocess.CalledProcessError as ex:
-        logger.error("exception: %s", ex)
-        logger.error("rc: %s, output: %r", ex.returncode, ex.output)
+    if returncode:
+        logger.error("rc: %s, output: %r", returncode, out)
         raise ConuException(
             "`buildah version` call failed, it seems that your installation of buildah is misconfigured"
         )
-    else:
-        logger.info("buildah environment info: %r", out)
+    logger.info("buildah environment info: %r", out)
     return True
 
 
@@ -454,3 +578,56 @@ def parse_reference(reference):
 
     else:
         return reference, "latest"
+
+
+def make_filters(**kwargs):
+    """
+    create filters for listing of containers or images which are evaluated by the container
+    engine; None values are skipped, labels can be provided as a dict. Example:
+
+    ::
+
+        print(make_filters(label={"app": "db", "conu.test_artifact": None}, status="running"))
+        {'label': ['app=db', 'conu.test_artifact'], 'status': ['running']}
+
+    :param kwargs: filter name -> str, list of str or None; dict for label
+    :return: dict, filter name -> list of str
+    """
+    filters = {}
+    for key, value in kwargs.items():
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            value = [k if v is None else "%s=%s" % (k, v) for k, v in value.items()]
+        elif not isinstance(value, (list, tuple)):
+            value = [value]
+        if value:
+            filters[key] = list(value)
+    return filters
+
+
+def filters_to_cli_options(filters, option="--filter"):
+    """
+    convert filters created by make_filters to command line options
+
+    :param filters: dict, filter name -> list of str
+    :param option: str, name of the option
+    :return: list of str, e.g. ["--filter", "label=app=db", "--filter", "status=running"]
+    """
+    options = []
+    for key in sorted(filters):
+        for value in filters[key]:
+            options += [option, "%s=%s" % (key, value)]
+    return options
+
+
+def make_label_selector(label):
+    """
+    convert labels to a kubernetes label selector
+
+    :param label: str (already a selector), dict or list of str
+    :return: str or None
+    """
+    if not label or isinstance(label, str):
+        return label or None
+    return ",".join(make_filters(label=label)["label"])
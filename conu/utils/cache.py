@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Caches for data which are expensive to fetch from container engines, such as inspect output.
+"""
+from __future__ import print_function, unicode_literals
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+from conu.utils import graceful_get
+
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache(object):
+    """
+    Thread-safe cache where every entry expires after `ttl` seconds. Entries can be
+    invalidated explicitly, e.g. when the underlying object is known to have changed.
+    """
+
+    def __init__(self, ttl=1.0):
+        """
+        :param ttl: int or float, number of seconds an entry is considered up to date,
+                    0 disables caching
+        """
+        self.ttl = ttl
+        # set by owners of the cache when ttl was configured by the user: entries are then
+        # trusted for `ttl` seconds even when up to date data are requested
+        self.explicit_ttl = False
+        self._entries = {}
+        self._lock = threading.Lock()
+        # incremented on every invalidation, values fetched before it are not stored
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, fetch, force=False):
+        """
+        return the cached value for the key if it's not expired, otherwise call fetch(key),
+        store the result and return it; exceptions raised by fetch are not cached
+
+        :param key: hashable object
+        :param fetch: callable, accepts key, returns the value
+        :param force: bool, always call fetch, the result is still stored
+        :return: the value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            generation = self._generation
+        if not force and entry is not None and time.time() - entry[0] < self.ttl:
+            return entry[1]
+        fetched_at = time.time()
+        value = fetch(key)
+        if self.ttl > 0:
+            with self._lock:
+                current = self._entries.get(key)
+                # don't overwrite the value with an older one fetched by another thread
+                if generation == self._generation and (current is None or
+                                                       current[0] <= fetched_at):
+                    self._entries[key] = (fetched_at, value)
+        return value
+
+    def put(self, key, value):
+        """
+        store the value for the key
+
+        :param key: hashable object
+        :param value: the value
+        :return: None
+        """
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+
+    def invalidate(self, *keys):
+        """
+        remove the selected keys from the cache, remove everything if no key is provided
+
+        :param keys: hashable objects, None values are ignored
+        :return: None
+        """
+        with self._lock:
+            self._generation += 1
+            if not keys:
+                self._entries.clear()
+                return
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def invalidate_if(self, predicate):
+        """
+        remove the entries whose key matches the predicate
+
+        :param predicate: callable, accepts key, returns bool
+        :return: None
+        """
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._entries if predicate(k)]:
+                del self._entries[key]
+
+
+class PermanentCache(object):
+    """
+    Thread-safe cache for values which never change for a given key, e.g. inspect data of an
+    image ID. The values are kept in memory and, if a directory is set, also as JSON files in
+    that directory, so they can be reused by other processes.
+    """
+
+    def __init__(self, directory=None):
+        """
+        :param directory: str or None, directory for the on-disk layer, it's created if it
+                          doesn't exist; the on-disk layer is not used if None
+        """
+        self.directory = directory
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get_path(self, key):
+        # keys are image IDs, e.g. sha256:1234..., sanitize them anyway
+        return os.path.join(self.directory, re.sub(r"[^a-zA-Z0-9_.-]", "_", key) + ".json")
+
+    def _load(self, key):
+        try:
+            with open(self._get_path(key)) as fd:
+                return json.load(fd)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _save(self, key, value):
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            fd, tmp_path = tempfile.mkstemp(prefix=".conu-", dir=self.directory)
+        except (IOError, OSError) as ex:
+            logger.info("can't write to cache directory %s: %s", self.directory, ex)
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            # atomic, readers never see a partially written file
+            os.rename(tmp_path, self._get_path(key))
+        except (IOError, OSError, TypeError, ValueError) as ex:
+            logger.info("can't store %s in cache directory %s: %s", key, self.directory, ex)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    def lookup(self, key):
+        """
+        return the cached value for the key, None if it's not cached
+
+        :param key: str
+        :return: the value or None
+        """
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+        value = None
+        if self.directory:
+            value = self._load(key)
+            if value is not None:
+                with self._lock:
+                    self._entries[key] = value
+        return value
+
+    def get(self, key, fetch):
+        """
+        return the cached value for the key, call fetch(key) and store the result if there is
+        none; exceptions raised by fetch are not cached
+
+        :param key: str
+        :param fetch: callable, accepts key, returns the value (JSON serializable)
+        :return: the value
+        """
+        value = self.lookup(key)
+        if value is None:
+            value = fetch(key)
+            self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        """
+        store the value for the key
+
+        :param key: str
+        :param value: the value (JSON serializable)
+        :return: None
+        """
+        with self._lock:
+            known = key in self._entries
+            self._entries[key] = value
+        if self.directory and not known:
+            self._save(key, value)
+
+    def invalidate(self, *keys):
+        """
+        forget values of the keys, including the ones stored on disk
+
+        :param keys: str, None values are ignored
+        :return: None
+        """
+        keys = [k for k in keys if k]
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                if self.directory:
+                    try:
+                        os.unlink(self._get_path(key))
+                    except OSError:
+                        pass
+
+    def clear(self):
+        """
+        forget all the values, including the ones stored on disk
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            if self.directory and os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    if name.endswith(".json"):
+                        os.unlink(os.path.join(self.directory, name))
+
+
+class ImageInspectCache(object):
+    """
+    Inspect data of images: data of an image ID never change, so they are cached permanently;
+    only resolution of names (repository:tag) to image IDs is revalidated after `ttl` seconds.
+
+    The on-disk layer is enabled by setting the CONU_IMAGE_CACHE_DIR environment variable
+    or via the `directory` argument.
+
+    Note: lists of names and digests in the cached data reflect the state at the time
+    the image was inspected for the first time.
+    """
+
+    def __init__(self, id_key="Id", directory=None, ttl=1.0):
+        """
+        :param id_key: str, key of the image ID in the inspect data
+        :param directory: str or None, directory for the on-disk layer
+        :param ttl: int or float, number of seconds a name is resolved to the same image ID
+        """
+        self.id_key = id_key
+        self.images = PermanentCache(directory=directory)
+        self.names = TTLCache(ttl=ttl)
+
+    @classmethod
+    def for_backend(cls, backend_name, id_key="Id"):
+        """
+        create cache for the selected backend, the on-disk layer is used if
+        CONU_IMAGE_CACHE_DIR is set
+
+        :param backend_name: str, e.g. "docker", the on-disk data are stored in a subdirectory
+        :param id_key: str, key of the image ID in the inspect data
+        :return: instance of ImageInspectCache
+        """
+        directory = os.environ.get("CONU_IMAGE_CACHE_DIR")
+        if directory:
+            directory = os.path.join(directory, backend_name)
+        return cls(id_key=id_key, directory=directory or None)
+
+    def get_by_id(self, image_id, fetch):
+        """
+        :param image_id: str
+        :param fetch: callable, accepts image ID, returns inspect data
+        :return: dict, inspect data
+        """
+        return self.images.get(image_id, fetch)
+
+    def get_by_name(self, name, fetch):
+        """
+        :param name: str, name of the image, e.g. fedora:29
+        :param fetch: callable, accepts name of the image, returns inspect data
+        :return: dict, inspect data
+        """
+        fetched = {}
+
+        def resolve(name):
+            fetched["data"] = fetch(name)
+            return graceful_get(fetched["data"], self.id_key)
+
+        image_id = self.names.get(name, resolve)
+        if not image_id:
+            # we can't address data without an ID
+            return fetched.get("data") or fetch(name)
+        if "data" in fetched:
+            self.images.put(image_id, fetched["data"])
+        return self.images.get(image_id, fetch)
+
+    def invalidate_names(self, *names):
+        """
+        resolve the names to IDs again next time, all the names if none is provided
+
+        :param names: str
+        :return: None
+        """
+        self.names.invalidate(*names)
+
+    def invalidate_id(self, *image_ids):
+        """
+        forget inspect data of the image IDs, e.g. when the images were removed
+
+        :param image_ids: str, None values are ignored
+        :return: None
+        """
+        self.images.invalidate(*image_ids)
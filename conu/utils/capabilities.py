@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Registry of capabilities of the environment: which binaries are available, whether container
+engines work, the docker API version and SELinux state. Every capability is probed once
+per process; the results can also be persisted in an on-disk cache with a short TTL, so that
+other processes (e.g. pytest workers) don't need to probe again.
+
+The on-disk cache is enabled by setting the CONU_CAPABILITIES_TTL environment variable
+to a number of seconds.
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+SELINUX_FS = "/sys/fs/selinux"
+
+
+class CapabilityRegistry(object):
+    """
+    Thread-safe store of probed capabilities.
+    """
+
+    def __init__(self, path=None, ttl=0):
+        """
+        :param path: str, path to the JSON file of the on-disk cache,
+                     $XDG_CACHE_HOME/conu/capabilities.json by default
+        :param ttl: int or float, number of seconds the results stored on disk are valid for,
+                    0 disables the on-disk cache
+        """
+        self.path = path
+        self.ttl = ttl
+        self._values = {}
+        self._lock = threading.RLock()
+
+    def _get_path(self):
+        if self.path is None:
+            # conu.utils imports this module
+            from conu.utils import get_cache_dir
+            self.path = os.path.join(get_cache_dir(), "capabilities.json")
+        return self.path
+
+    def _load(self):
+        try:
+            with open(self._get_path()) as fd:
+                data = json.load(fd)
+        except (IOError, OSError, ValueError) as ex:
+            logger.debug("can't load capabilities from %s: %s", self.path, ex)
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save(self, data):
+        path = self._get_path()
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".capabilities-",
+                                            dir=os.path.dirname(path) or ".")
+        except (IOError, OSError) as ex:
+            logger.info("can't store capabilities to %s: %s", path, ex)
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            # atomic, readers never see a partially written file
+            os.rename(tmp_path, path)
+        except (IOError, OSError, TypeError, ValueError) as ex:
+            logger.info("can't store capabilities to %s: %s", path, ex)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    def get(self, name, probe, cache_if=None):
+        """
+        provide value of the capability, probe it if it's not known yet
+
+        :param name: str, name of the capability, e.g. "command:docker"
+        :param probe: callable, no arguments, returns the value (JSON serializable)
+        :param cache_if: callable, accepts the value, returns True if it can be cached; use it
+                         for failed probes, the failure could be temporary, e.g. a daemon
+                         which is still starting; everything is cached if None
+        :return: the value
+        """
+        with self._lock:
+            if name in self._values:
+                return self._values[name]
+            if self.ttl:
+                entry = self._load().get(name)
+                if entry and time.time() - entry[0] < self.ttl:
+                    self._values[name] = entry[1]
+                    return entry[1]
+            value = probe()
+            if cache_if is not None and not cache_if(value):
+                logger.debug("capability %s is not cached: %r", name, value)
+                return value
+            self._values[name] = value
+            if self.ttl:
+                data = self._load()
+                data[name] = [time.time(), value]
+                self._save(data)
+            return value
+
+    def invalidate(self, *names):
+        """
+        probe the selected capabilities again next time, all of them if none is provided
+
+        :param names: str
+        :return: None
+        """
+        with self._lock:
+            if names:
+                for name in names:
+                    self._values.pop(name, None)
+            else:
+                self._values.clear()
+            if self.ttl:
+                data = self._load()
+                if data:
+                    self._save({k: v for k, v in data.items() if names and k not in names})
+
+    def has_command(self, command):
+        """
+        :param command: str, name of the binary, e.g. "docker"
+        :return: bool, True if the binary is in $PATH; only positive results are cached
+        """
+        return self.get("command:%s" % command, lambda: bool(shutil.which(command)),
+                        cache_if=bool)
+
+    def command_result(self, cmd):
+        """
+        run the command and provide its return code and output, the result is cached only
+        if the command succeeded
+
+        :param cmd: list of str, e.g. ["docker", "version"]
+        :return: (int or None, str), return code (None if the binary doesn't exist) and output
+        """
+        def probe():
+            try:
+                out = subprocess.check_output(cmd, stderr=subprocess.STDOUT,
+                                              universal_newlines=True)
+            except OSError as ex:
+                return [None, str(ex)]
+            except subprocess.CalledProcessError as ex:
+                return [ex.returncode, ex.output]
+            return [0, out]
+        return tuple(self.get("run:%s" % " ".join(cmd), probe,
+                              cache_if=lambda result: result[0] == 0))
+
+    def selinux_status(self):
+        """
+        get SELinux status of host: SELinux state is read from /sys/fs/selinux, `getenforce`
+        is used only if the state can't be determined from there; raises
+        CommandDoesNotExistException if `getenforce` is needed and it's not available
+
+        :return: str, one of Enforcing, Permissive, Disabled
+        """
+        return self.get("selinux", _probe_selinux_status)
+
+
+def _probe_selinux_status():
+    try:
+        with open(os.path.join(SELINUX_FS, "enforce")) as fd:
+            enforce = fd.read().strip()
+    except (IOError, OSError):
+        enforce = None
+    if enforce == "1":
+        return "Enforcing"
+    if enforce == "0":
+        return "Permissive"
+    # conu.utils imports this module
+    from conu.utils import getenforce_command_exists
+    getenforce_command_exists()
+    return subprocess.check_output(["getenforce"], universal_newlines=True).strip()
+
+
+_registry = None
+
+
+def get_capabilities():
+    """
+    provide capability registry shared within the process
+
+    :return: instance of CapabilityRegistry
+    """
+    global _registry
+    if _registry is None:
+        ttl = float(os.environ.get("CONU_CAPABILITIES_TTL") or 0)
+        _registry = CapabilityRegistry(ttl=ttl)
+    return _registry
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Obtain IDs of containers created by container engine binaries: from the output of detached
+runs or from cidfiles. Cidfiles are watched using inotify (via ctypes, Linux only) so the ID
+is read as soon as it's written; polling is used where inotify is not available.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import re
+import select
+import time
+
+from conu.exceptions import ConuException, ProbeTimeout
+
+
+logger = logging.getLogger(__name__)
+
+CONTAINER_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# how often is the file checked when inotify is not available
+POLL_INTERVAL = 0.01
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            libc.inotify_init1
+            libc.inotify_add_watch
+        except (OSError, AttributeError) as ex:
+            logger.debug("inotify is not available: %s", ex)
+            libc = False
+        _libc = libc
+    return _libc
+
+
+class _DirectoryWatch(object):
+    """
+    inotify watch of a directory, ready() blocks until a file in the directory is written
+    """
+
+    def __init__(self, path):
+        libc = _get_libc()
+        self.fd = None
+        if not libc:
+            return
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            logger.debug("inotify_init1 failed: %s", os.strerror(ctypes.get_errno()))
+            return
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(fd, os.fsencode(path), mask) < 0:
+            logger.debug("can't watch %s: %s", path, os.strerror(ctypes.get_errno()))
+            os.close(fd)
+            return
+        self.fd = fd
+
+    def ready(self, timeout):
+        """
+        wait for an event in the directory
+
+        :param timeout: float, seconds
+        :return: None
+        """
+        if self.fd is None:
+            time.sleep(min(timeout, POLL_INTERVAL))
+            return
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            try:
+                # the events are not interesting, the file is checked by the caller
+                os.read(self.fd, 4096)
+            except OSError as ex:
+                if ex.errno != errno.EAGAIN:
+                    raise
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def _read_cidfile(path):
+    try:
+        with open(path) as fd:
+            return fd.read().strip()
+    except (IOError, OSError):
+        return ""
+
+
+def wait_for_cidfile(path, timeout=10, process=None):
+    """
+    wait until the container engine writes ID of the container to the cidfile
+
+    :param path: str, path to the cidfile
+    :param timeout: int or float, seconds
+    :param process: instance of Popen, stop waiting if the process exits without
+                    writing the file
+    :return: str, ID of the container
+    """
+    deadline = time.time() + timeout
+    # the watch needs to be created before the file is checked, so no write is missed
+    watch = _DirectoryWatch(os.path.dirname(path) or ".")
+    try:
+        while True:
+            container_id = _read_cidfile(path)
+            if container_id:
+                return container_id
+            if process is not None and process.poll() is not None:
+                container_id = _read_cidfile(path)
+                if container_id:
+                    return container_id
+                raise ConuException("The process exited with %s and the container ID was not "
+                                    "written to %s" % (process.returncode, path))
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise ProbeTimeout("Container ID was not written to %s in %ss" % (path, timeout))
+            # check whether the process is still alive from time to time
+            watch.ready(min(remaining, 0.5) if process is not None else remaining)
+    finally:
+        watch.close()
+
+
+def parse_container_id(output):
+    """
+    find ID of the container in output of a detached run, e.g. `podman run -d`: it's the
+    last line, messages written to stderr precede it
+
+    :param output: str
+    :return: str or None if there is no ID
+    """
+    for line in reversed(output.splitlines()):
+        line = line.strip()
+        if CONTAINER_ID_RE.match(line):
+            return line
+    return None
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Persistent shell sessions in containers: a single shell process runs all the commands, so
+the cost of spawning an exec process is paid only once.
+
+Every command is written to the shell's stdin followed by a command which prints a marker
+line with the exit code, e.g. for `id -u`:
+
+::
+
+    { 'id' '-u'
+    } </dev/null 2>&1; printf '\\n%s %d\\n' __conu_abcdef__ "$?"
+
+so the output of the command is everything the shell prints until the marker line.
+"""
+
+import logging
+import subprocess
+import threading
+
+import six
+from six.moves import shlex_quote
+
+from conu.exceptions import ConuException
+from conu.utils import random_str
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExecSession(object):
+    """
+    Shell running in a container, subclasses provide the transport: `_write()`, `_read()`
+    and `_close()`.
+    """
+
+    def __init__(self, shell="/bin/sh"):
+        """
+        :param shell: str, path to the shell in the container
+        """
+        self.shell = shell
+        self.marker = ("__conu_%s__" % random_str(16)).encode("ascii")
+        self.last_exit_code = None
+        self._buffer = b""
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _write(self, data):
+        """
+        :param data: bytes, data for stdin of the shell
+        """
+        raise NotImplementedError("_write method is not implemented")
+
+    def _read(self):
+        """
+        :return: bytes, next chunk of output of the shell, empty when the shell exited
+        """
+        raise NotImplementedError("_read method is not implemented")
+
+    def _close(self):
+        raise NotImplementedError("_close method is not implemented")
+
+    def _read_result(self):
+        """ read output of the shell until the marker line, :return: (int, bytes) """
+        separator = b"\n" + self.marker + b" "
+        while True:
+            start = self._buffer.find(separator)
+            if start >= 0:
+                end = self._buffer.find(b"\n", start + len(separator))
+                if end >= 0:
+                    output = self._buffer[:start]
+                    exit_code = int(self._buffer[start + len(separator):end])
+                    self._buffer = self._buffer[end + 1:]
+                    return exit_code, output
+            chunk = self._read()
+            if not chunk:
+                raise ConuException("shell %s in the container exited" % self.shell)
+            self._buffer += chunk
+
+    def run(self, command):
+        """
+        run the command in the shell, stdin of the command is /dev/null, stderr is merged
+        into stdout
+
+        :param command: list of str, command to run, or str, shell snippet, e.g. "ls | wc -l"
+        :return: (int, str), exit code and output of the command
+        """
+        if self._closed:
+            raise ConuException("the session is closed")
+        if not isinstance(command, six.string_types):
+            command = " ".join(shlex_quote(c) for c in command)
+        script = "{ %s\n} </dev/null 2>&1; printf '\\n%%s %%d\\n' %s \"$?\"\n" % (
+            command, self.marker.decode("ascii"))
+        logger.debug("running %r in the session", command)
+        with self._lock:
+            try:
+                self._write(script.encode("utf-8"))
+            except (IOError, OSError) as ex:
+                raise ConuException("can't send the command to shell %s: %s" % (self.shell, ex))
+            exit_code, output = self._read_result()
+            self.last_exit_code = exit_code
+        return exit_code, output.decode("utf-8", errors="replace")
+
+    def execute(self, command):
+        """
+        run the command in the shell, raise ConuException if it fails
+
+        :param command: list of str, command to run, or str, shell snippet, e.g. "ls | wc -l"
+        :return: str, output of the command
+        """
+        exit_code, output = self.run(command)
+        if exit_code != 0:
+            raise ConuException("failed to execute command %s, exit code %s, output: %s" % (
+                command, exit_code, output))
+        return output
+
+    def close(self):
+        """
+        exit the shell
+
+        :return: None
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._write(b"exit\n")
+        except (IOError, OSError) as ex:
+            logger.debug("can't exit the shell: %s", ex)
+        self._close()
+
+
+class ProcessExecSession(ExecSession):
+    """
+    Shell spawned by a container engine binary, e.g. `podman exec -i <container> /bin/sh`.
+    """
+
+    def __init__(self, cmd, shell="/bin/sh"):
+        """
+        :param cmd: list of str, command which starts the shell in the container and
+                    connects its stdin and stdout to ours
+        :param shell: str, path to the shell in the container, used only in messages
+        """
+        super(ProcessExecSession, self).__init__(shell=shell)
+        logger.debug("starting session: %s", cmd)
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.STDOUT, bufsize=0)
+
+    def _write(self, data):
+        self.process.stdin.write(data)
+        self.process.stdin.flush()
+
+    def _read(self):
+        # unbuffered: returns whatever is available
+        return self.process.stdout.read(65536)
+
+    def _close(self):
+        try:
+            self.process.stdin.close()
+        except (IOError, OSError):
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
@@ -3,8 +3,17 @@
 # Copyright Contributors to the Conu project.
 # SPDX-License-Identifier: MIT
 #
+import threading
+
 from requests import Session
+from requests.adapters import HTTPAdapter
 from six.moves.urllib.parse import urlunsplit
+from urllib3.util.retry import Retry
+
+
+_session = None
+_session_lock = threading.Lock()
+_session_config = {}
 
 
 def get_url(path, host, port, method="http"):
@@ -22,16 +31,103 @@ def get_url(path, host, port, method="http"):
     )
 
 
+def create_http_session(pool_size=10, keep_alive=True, retries=0, backoff_factor=0.0):
+    """
+    create requests.Session with the selected connection pooling and retry policy
+
+    :param pool_size: int, maximum number of connections kept open for a single host
+    :param keep_alive: bool, reuse connections; if False, connections are closed
+                       after every request
+    :param retries: int, number of retries of failed requests, e.g. refused connections
+    :param backoff_factor: float, sleep between retries is
+                           {backoff factor} * (2 ** ({number of retries} - 1)) seconds
+    :return: instance of requests.Session
+    """
+    session = Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size,
+        max_retries=Retry(total=retries, backoff_factor=backoff_factor, raise_on_status=False))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def configure_http_session(**kwargs):
+    """
+    set parameters of the HTTP session shared by all containers, the session is created again
+    on next use, sessions created by new_http_session() before keep the old pools; see
+    create_http_session for the accepted arguments
+
+    :return: None
+    """
+    global _session
+    with _session_lock:
+        _session_config.clear()
+        _session_config.update(kwargs)
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def get_http_session():
+    """
+    provide the HTTP session whose connection pools are shared by all containers, it's created
+    on first use; treat it as read-only: use new_http_session() to get a session which can
+    carry its own headers, auth or cookies
+
+    :return: instance of requests.Session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_http_session(**_session_config)
+        return _session
+
+
+def _share_pools(session, shared):
+    """ make the session use connection pools and headers of the shared session """
+    for prefix, adapter in shared.adapters.items():
+        session.mount(prefix, adapter)
+    session.headers.update(shared.headers)
+
+
+def new_http_session():
+    """
+    create a session which uses the connection pools and the retry policy of the shared
+    session (see get_http_session) while its headers, auth and cookies are its own
+
+    :return: instance of requests.Session
+    """
+    session = Session()
+    _share_pools(session, get_http_session())
+    return session
+
+
 class HttpClient(Session):
     """
     Utility class for easier http connection.
     """
 
     def __init__(self, host, port, session):
+        """
+        :param host: str
+        :param port: str or int
+        :param session: instance of requests.Session, its connection pools and headers are used
+        """
         super(HttpClient, self).__init__()
         self.host = host
         self.port = port
         self.session = session
+        if session is not None:
+            # share the connection pools instead of opening new connections
+            _share_pools(self, session)
+
+    def close(self):
+        # the connection pools belong to the shared session
+        if self.session is None:
+            super(HttpClient, self).close()
 
     def prepare_request(self, request):
         request.url = get_url(path=request.url,
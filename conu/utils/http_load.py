@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Simple HTTP load generator: a pool of threads sends requests over keep-alive connections and
+measures throughput, errors and latency percentiles.
+"""
+
+import array
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+from conu.exceptions import ConuException
+from conu.utils.http_client import HttpClient, create_http_session
+
+logger = logging.getLogger(__name__)
+
+
+class LatencySamples(object):
+    """
+    Thread-safe buffer of latency samples (seconds) backed by an array of doubles. When
+    `max_samples` is set and the buffer is full, reservoir sampling keeps a uniform sample
+    of all the values, so memory usage is bounded. Percentiles are computed with NumPy
+    if it's installed.
+    """
+
+    def __init__(self, max_samples=None):
+        """
+        :param max_samples: int or None, maximum number of stored samples, unlimited if None
+        """
+        self.max_samples = max_samples
+        self.count = 0
+        self.total = 0.0
+        self._samples = array.array("d")
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, value):
+        """
+        :param value: float, latency in seconds
+        :return: None
+        """
+        with self._lock:
+            self.count += 1
+            self.total += value
+            if self.max_samples is None or len(self._samples) < self.max_samples:
+                self._samples.append(value)
+            else:
+                index = random.randrange(self.count)
+                if index < self.max_samples:
+                    self._samples[index] = value
+
+    def mean(self):
+        """
+        :return: float or None if there are no samples
+        """
+        return self.total / self.count if self.count else None
+
+    def percentiles(self, percents):
+        """
+        compute percentiles using linear interpolation between the closest samples
+
+        :param percents: list of int or float, e.g. [50, 90, 99]
+        :return: dict, percent -> latency in seconds (None if there are no samples)
+        """
+        with self._lock:
+            samples = self._samples[:]
+        if not samples:
+            return {p: None for p in percents}
+        if HAS_NUMPY:
+            values = numpy.percentile(numpy.frombuffer(samples, dtype=numpy.float64), percents)
+            return {p: float(v) for p, v in zip(percents, values)}
+        samples = sorted(samples)
+        result = {}
+        for p in percents:
+            k = (len(samples) - 1) * p / 100.0
+            lower = int(math.floor(k))
+            upper = min(lower + 1, len(samples) - 1)
+            result[p] = samples[lower] + (samples[upper] - samples[lower]) * (k - lower)
+        return result
+
+
+class HttpLoadResult(object):
+    """
+    Outcome of a load test.
+    """
+
+    def __init__(self, requests, errors, error_counts, duration, latencies):
+        """
+        :param requests: int, number of completed requests, including the failed ones
+        :param errors: int, number of requests which failed or returned status >= 400
+        :param error_counts: dict, HTTP status code (int) or exception name (str) -> count
+        :param duration: float, seconds
+        :param latencies: instance of LatencySamples
+        """
+        self.requests = requests
+        self.errors = errors
+        self.error_counts = error_counts
+        self.duration = duration
+        self.latencies = latencies
+
+    def __repr__(self):
+        p = self.latency_percentiles()
+        return ("HttpLoadResult(requests=%s, errors=%s, throughput=%.1f/s, "
+                "p50=%s, p90=%s, p99=%s)" % (self.requests, self.errors, self.throughput,
+                                             p[50], p[90], p[99]))
+
+    @property
+    def throughput(self):
+        """
+        :return: float, completed requests per second
+        """
+        return self.requests / self.duration if self.duration else 0.0
+
+    @property
+    def mean_latency(self):
+        """
+        :return: float (seconds) or None
+        """
+        return self.latencies.mean()
+
+    def latency_percentiles(self, percents=(50, 90, 95, 99)):
+        """
+        :param percents: list of int or float
+        :return: dict, percent -> latency in seconds
+        """
+        return self.latencies.percentiles(list(percents))
+
+
+def run_http_load(host, port, path="/", concurrency=10, duration=None, requests=None,
+                  method="GET", data=None, timeout=10, max_samples=100000):
+    """
+    send requests to http://host:port/path from `concurrency` threads until `duration` seconds
+    elapse or `requests` requests are sent; every thread keeps its connection open
+
+    :param host: str
+    :param port: str or int
+    :param path: str, path within the request, e.g. "/api/version"
+    :param concurrency: int, number of concurrent connections
+    :param duration: int or float, seconds, the load test stops after this time
+    :param requests: int, the load test stops after this number of requests
+    :param method: str, HTTP method
+    :param data: data to send (can be dict, list, str)
+    :param timeout: int or float, timeout of a single request (seconds)
+    :param max_samples: int, maximum number of stored latency samples
+    :return: instance of HttpLoadResult
+    """
+    if duration is None and requests is None:
+        raise ConuException("either duration or number of requests needs to be set")
+    session = create_http_session(pool_size=concurrency)
+    client = HttpClient(host, port, session)
+    latencies = LatencySamples(max_samples=max_samples)
+    lock = threading.Lock()
+    counters = {"sent": 0, "errors": 0}
+    error_counts = {}
+
+    def record_error(key):
+        with lock:
+            counters["errors"] += 1
+            error_counts[key] = error_counts.get(key, 0) + 1
+
+    def worker(deadline):
+        while deadline is None or time.time() < deadline:
+            with lock:
+                if requests is not None and counters["sent"] >= requests:
+                    return
+                counters["sent"] += 1
+            start = time.time()
+            try:
+                response = client.request(method, path, data=data, timeout=timeout)
+                # read the body so the connection can be reused
+                response.content
+            except Exception as ex:
+                latencies.add(time.time() - start)
+                record_error(ex.__class__.__name__)
+                continue
+            latencies.add(time.time() - start)
+            if response.status_code >= 400:
+                record_error(response.status_code)
+
+    logger.info("sending %s requests to %s:%s%s from %d threads",
+                requests if requests is not None else "%ss of" % duration,
+                host, port, path, concurrency)
+    start = time.time()
+    deadline = None if duration is None else start + duration
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(worker, deadline) for _ in range(concurrency)]:
+                future.result()
+    finally:
+        session.close()
+    result = HttpLoadResult(latencies.count, counters["errors"], error_counts,
+                            time.time() - start, latencies)
+    logger.info("%s", result)
+    return result
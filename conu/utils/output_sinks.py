@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Sinks for output of commands executed in containers, so memory usage doesn't grow with
+the amount of output:
+
+.. code-block:: python
+
+    tail = RingBufferSink(size=4096)
+    container.execute(["make", "bench"], sink=tail, stderr_sink=FileSink("/tmp/err.log"),
+                      log_output=False)
+    print(tail.getvalue())
+"""
+
+import logging
+import os
+import selectors
+import subprocess
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class OutputSink(object):
+    """
+    Receives output of a command chunk by chunk.
+    """
+
+    def write(self, data):
+        """
+        :param data: bytes
+        :return: None
+        """
+        raise NotImplementedError("write method is not implemented")
+
+    def flush(self):
+        """
+        called when the command finishes
+
+        :return: None
+        """
+
+
+class DiscardSink(OutputSink):
+    """
+    Throws the output away, only its size is recorded.
+    """
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+class ListSink(OutputSink):
+    """
+    Keeps all the chunks -- memory usage is not bounded.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def getvalue(self):
+        """
+        :return: bytes
+        """
+        return b"".join(self.chunks)
+
+
+class RingBufferSink(OutputSink):
+    """
+    Keeps the last `size` bytes of the output.
+    """
+
+    def __init__(self, size=65536):
+        """
+        :param size: int, number of bytes to keep
+        """
+        self.size = size
+        self.total = 0
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self.total += len(data)
+        if len(data) >= self.size:
+            self._buffer = bytearray(data[-self.size:])
+            return
+        self._buffer += data
+        overflow = len(self._buffer) - self.size
+        if overflow > 0:
+            del self._buffer[:overflow]
+
+    @property
+    def truncated(self):
+        """
+        :return: bool, True if some output was dropped
+        """
+        return self.total > self.size
+
+    def getvalue(self):
+        """
+        :return: bytes, the last `size` bytes of the output
+        """
+        return bytes(self._buffer)
+
+
+class FileSink(OutputSink):
+    """
+    Writes the output to a file.
+    """
+
+    def __init__(self, path_or_file, mode="wb"):
+        """
+        :param path_or_file: str, path to the file, or a file object opened in binary mode
+        :param mode: str, mode to open the file with when a path is provided
+        """
+        if hasattr(path_or_file, "write"):
+            self.file = path_or_file
+            self._owned = False
+        else:
+            self.file = open(path_or_file, mode)
+            self._owned = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, data):
+        self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        """
+        close the file if it was opened by this sink
+
+        :return: None
+        """
+        if self._owned:
+            self.file.close()
+
+
+class CallbackSink(OutputSink):
+    """
+    Calls a function with every chunk of the output.
+    """
+
+    def __init__(self, callback):
+        """
+        :param callback: callable, accepts bytes
+        """
+        self.callback = callback
+
+    def write(self, data):
+        self.callback(data)
+
+
+class LineLogger(object):
+    """
+    Logs output line by line; when `max_lines_per_second` is set, lines above the limit are
+    dropped and their count is logged instead.
+    """
+
+    def __init__(self, level=logging.INFO, max_lines_per_second=None, log=None):
+        """
+        :param level: int, logging level
+        :param max_lines_per_second: int or None, no limit if None
+        :param log: instance of logging.Logger, logger of this module by default
+        """
+        self.level = level
+        self.max_lines_per_second = max_lines_per_second
+        self.log = log or logger
+        self._partial = b""
+        self._window = None
+        self._logged = 0
+        self._dropped = 0
+
+    def _log_line(self, line):
+        if self.max_lines_per_second is not None:
+            now = int(time.time())
+            if now != self._window:
+                self._report_dropped()
+                self._window = now
+                self._logged = 0
+            if self._logged >= self.max_lines_per_second:
+                self._dropped += 1
+                return
+            self._logged += 1
+        self.log.log(self.level, "%s", line.decode("utf-8", errors="replace").rstrip("\r"))
+
+    def _report_dropped(self):
+        if self._dropped:
+            self.log.log(self.level, "(%d lines of output were not logged)", self._dropped)
+            self._dropped = 0
+
+    def write(self, data):
+        """
+        :param data: bytes
+        :return: None
+        """
+        if not self.log.isEnabledFor(self.level):
+            return
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._log_line(line)
+
+    def flush(self):
+        """
+        log the last incomplete line
+
+        :return: None
+        """
+        if self._partial:
+            self._log_line(self._partial)
+            self._partial = b""
+        self._report_dropped()
+
+
+class OutputPump(object):
+    """
+    Dispatches output of a command to sinks and to the log.
+    """
+
+    def __init__(self, sink, stderr_sink=None, log_output=True, log_rate_limit=None,
+                 log_level=logging.INFO):
+        """
+        :param sink: instance of OutputSink, receives stdout (and stderr if `stderr_sink`
+                     is not set)
+        :param stderr_sink: instance of OutputSink or None
+        :param log_output: bool, log the output line by line
+        :param log_rate_limit: int or None, maximum number of lines logged per second
+        :param log_level: int, logging level of the output
+        """
+        self.sink = sink
+        self.stderr_sink = stderr_sink or sink
+        # {stderr: LineLogger}, every stream has its own, so an incomplete line of one
+        # stream isn't joined with output of the other one
+        self.line_loggers = {}
+        if log_output:
+            self.line_loggers = {
+                False: LineLogger(level=log_level, max_lines_per_second=log_rate_limit),
+                True: LineLogger(level=log_level, max_lines_per_second=log_rate_limit),
+            }
+
+    def write(self, data, stderr=False):
+        """
+        :param data: bytes
+        :param stderr: bool, the data comes from stderr
+        :return: None
+        """
+        (self.stderr_sink if stderr else self.sink).write(data)
+        if self.line_loggers:
+            self.line_loggers[stderr].write(data)
+
+    def close(self):
+        """
+        flush the sinks and the log
+
+        :return: None
+        """
+        self.sink.flush()
+        if self.stderr_sink is not self.sink:
+            self.stderr_sink.flush()
+        for line_logger in self.line_loggers.values():
+            line_logger.flush()
+
+
+def stream_cmd(cmd, sink, stderr_sink=None, log_output=True, log_rate_limit=None,
+               ignore_status=False, log_level=logging.DEBUG):
+    """
+    run provided command on host system and pass its output to sinks as it comes, raises
+    subprocess.CalledProcessError if it fails
+
+    :param cmd: list of str
+    :param sink: instance of OutputSink, receives stdout, and also stderr if `stderr_sink`
+                 is not set
+    :param stderr_sink: instance of OutputSink, stderr is demultiplexed if set
+    :param log_output: bool, log the output line by line
+    :param log_rate_limit: int or None, maximum number of lines logged per second
+    :param ignore_status: bool, do not fail in case nonzero return code
+    :param log_level: int, logging level of the output
+    :return: int, return code
+    """
+    logger.debug('command: "%s"' % ' '.join(cmd))
+    pump = OutputPump(sink, stderr_sink, log_output=log_output, log_rate_limit=log_rate_limit,
+                      log_level=log_level)
+    stderr = subprocess.PIPE if stderr_sink is not None else subprocess.STDOUT
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+    streams = {process.stdout: False}
+    if stderr_sink is not None:
+        streams[process.stderr] = True
+    try:
+        with selectors.DefaultSelector() as selector:
+            for f in streams:
+                selector.register(f, selectors.EVENT_READ)
+            while selector.get_map():
+                for key, _ in selector.select():
+                    data = os.read(key.fd, 65536)
+                    if not data:
+                        selector.unregister(key.fileobj)
+                        continue
+                    pump.write(data, stderr=streams[key.fileobj])
+    finally:
+        for f in streams:
+            f.close()
+        process.wait()
+        pump.close()
+    if process.returncode > 0 and not ignore_status:
+        raise subprocess.CalledProcessError(cmd=cmd, returncode=process.returncode)
+    return process.returncode
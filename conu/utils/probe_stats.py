@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Persistent statistics of how long it takes until a probe succeeds; they are used to schedule
+the attempts of future probes around the expected time.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from conu.utils import get_cache_dir
+from conu.utils.probes import PauseSchedule, FastStart
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeStatistics(object):
+    """
+    Time-to-success samples stored in a JSON file, keyed by image ID and probe kind.
+    The file is re-read before every update so that concurrent test sessions don't
+    overwrite each other's samples completely.
+    """
+
+    def __init__(self, path=None, max_samples=20):
+        """
+        :param path: str, path to the JSON file, $XDG_CACHE_HOME/conu/probe-stats.json by default
+        :param max_samples: int, how many latest samples are kept for a single key
+        """
+        self.path = path or os.path.join(get_cache_dir(), "probe-stats.json")
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._data = None
+
+    @staticmethod
+    def get_key(image_id, kind):
+        """
+        :param image_id: str, ID of the image
+        :param kind: str, what is being probed, e.g. "wait_for_port:8080"
+        :return: str
+        """
+        return "%s/%s" % (image_id, kind)
+
+    def _load(self):
+        try:
+            with open(self.path) as fd:
+                data = json.load(fd)
+        except (IOError, OSError, ValueError) as ex:
+            logger.debug("probe statistics can't be loaded from %s: %s", self.path, ex)
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return data
+
+    def _save(self, data):
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=".probe-stats-", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            # atomic, readers never see a partially written file
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError) as ex:
+            logger.info("probe statistics can't be saved to %s: %s", self.path, ex)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    def get_samples(self, key):
+        """
+        :param key: str, see get_key
+        :return: list of float, seconds until the probe succeeded
+        """
+        with self._lock:
+            if self._data is None:
+                self._data = self._load()
+            return list(self._data.get(key, []))
+
+    def record(self, key, elapsed):
+        """
+        store a new sample
+
+        :param key: str, see get_key
+        :param elapsed: float, seconds until the probe succeeded
+        :return: None
+        """
+        with self._lock:
+            data = self._load()
+            samples = data.get(key, []) + [round(elapsed, 3)]
+            data[key] = samples[-self.max_samples:]
+            self._save(data)
+            self._data = data
+
+    def clear(self):
+        """
+        forget all samples
+
+        :return: None
+        """
+        with self._lock:
+            self._data = {}
+            self._save(self._data)
+
+
+def _percentile(sorted_samples, percent):
+    index = int(round((len(sorted_samples) - 1) * percent / 100.0))
+    return sorted_samples[index]
+
+
+class AdaptiveSchedule(PauseSchedule):
+    """
+    Pause schedule which learns how long it takes until a probe succeeds: it sleeps until
+    shortly before the earliest expected time of success, polls densely until the latest
+    expected time and then falls back to the `fallback` schedule. Until there are enough
+    samples, only the `fallback` schedule is used.
+
+    ::
+
+        container.wait_for_port(
+            8080, pause=AdaptiveSchedule(container.image.get_id(), "wait_for_port:8080"))
+    """
+
+    def __init__(self, image_id, kind, statistics=None, dense_pause=0.05, margin=0.2,
+                 min_samples=3, fallback=None):
+        """
+        :param image_id: str, ID of the image the probe waits for
+        :param kind: str, what is being probed, e.g. "wait_for_port:8080"
+        :param statistics: instance of ProbeStatistics, the default store is used if not set
+        :param dense_pause: float, pause between attempts around the expected time of success
+        :param margin: float, relative widening of the expected interval
+        :param min_samples: int, number of samples needed before the learned data are used
+        :param fallback: PauseSchedule, used when the probe didn't succeed in expected time
+        """
+        self.key = ProbeStatistics.get_key(image_id, kind)
+        self.statistics = statistics or get_default_statistics()
+        self.dense_pause = dense_pause
+        self.margin = margin
+        self.min_samples = min_samples
+        self.fallback = fallback or FastStart()
+
+    def pauses(self):
+        samples = sorted(self.statistics.get_samples(self.key))
+        if len(samples) < self.min_samples:
+            logger.debug("not enough samples for %s, using fallback schedule", self.key)
+            return self.fallback.pauses()
+        earliest = _percentile(samples, 10) * (1 - self.margin)
+        latest = _percentile(samples, 90) * (1 + self.margin)
+        logger.debug("%s is expected to succeed in %.3f - %.3f seconds",
+                     self.key, earliest, latest)
+        return self._pauses(time.time(), earliest, latest)
+
+    def _pauses(self, start, earliest, latest):
+        # the first attempt was already done when this is called for the first time
+        sleep = earliest - (time.time() - start)
+        if sleep > 0:
+            yield sleep
+        while time.time() - start < latest:
+            yield self.dense_pause
+        for pause in self.fallback.pauses():
+            yield pause
+
+    def record(self, elapsed):
+        self.statistics.record(self.key, elapsed)
+
+
+_default_statistics = None
+
+
+def get_default_statistics():
+    """
+    provide the store which is shared within the process
+
+    :return: instance of ProbeStatistics
+    """
+    global _default_statistics
+    if _default_statistics is None:
+        _default_statistics = ProbeStatistics()
+    return _default_statistics
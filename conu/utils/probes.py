@@ -4,16 +4,183 @@
 # SPDX-License-Identifier: MIT
 #
 
+import enum
+import heapq
+import itertools
+import random
 import time
 import logging
+import threading
 
 from multiprocessing import Process, Queue
+from six.moves import queue as thread_queue
 
 from conu.exceptions import ConuException, CountExceeded, ProbeTimeout
 
 logger = logging.getLogger(__name__)
 
 
+class ProbeMode(enum.Enum):
+    """
+    This Enum defines how the probed function is evaluated.
+
+    * INLINE - call the function directly in the thread which runs the probe; this is the cheapest
+      mode, but timeout is only checked between two attempts, so it should be used solely for
+      functions which can't block (e.g. checking whether a file exists)
+    * THREAD - call the function in a worker thread which is reused for all the attempts; when
+      timeout is reached while the function is still running, the attempt is abandoned
+    * PROCESS - call the function in a new process for every attempt; the process is killed
+      once timeout is reached, use this when you need the hard-kill guarantee
+    """
+    INLINE = 0
+    THREAD = 1
+    PROCESS = 2
+
+
+class PauseSchedule(object):
+    """
+    Abstract schedule of pauses between attempts of a probe; pass an instance as `pause`
+    argument of :class:`Probe` instead of a number.
+    """
+
+    def pauses(self):
+        """
+        provide pauses for a single probe run
+
+        :return: infinite iterator of floats (seconds)
+        """
+        raise NotImplementedError("pauses method is not implemented")
+
+    def record(self, elapsed):
+        """
+        called once the probe succeeded; schedules can use it to learn
+
+        :param elapsed: float, seconds since the probe started
+        :return: None
+        """
+
+
+class ExponentialBackoff(PauseSchedule):
+    """
+    Pause grows exponentially from `initial` until it reaches `maximum`.
+    """
+
+    def __init__(self, initial=0.1, factor=2.0, maximum=5.0):
+        """
+        :param initial: float, the first pause in seconds
+        :param factor: float, every pause is `factor` times longer than the previous one
+        :param maximum: float, cap of the pause
+        """
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+
+    def pauses(self):
+        pause = self.initial
+        while True:
+            yield min(pause, self.maximum)
+            pause *= self.factor
+
+
+class DecorrelatedJitter(PauseSchedule):
+    """
+    Randomized exponential backoff: every pause is picked from interval
+    [base, 3 * previous pause] and capped by `maximum`. This spreads attempts of many
+    concurrent probes so they don't hit the daemon at the same time.
+    """
+
+    def __init__(self, base=0.1, maximum=5.0):
+        """
+        :param base: float, minimal pause in seconds
+        :param maximum: float, cap of the pause
+        """
+        self.base = base
+        self.maximum = maximum
+
+    def pauses(self):
+        pause = self.base
+        while True:
+            pause = min(self.maximum, random.uniform(self.base, pause * 3))
+            yield pause
+
+
+class FastStart(PauseSchedule):
+    """
+    A few very short pauses at first (the condition is frequently met right away) which then
+    grow exponentially up to `maximum`.
+    """
+
+    def __init__(self, fast_pause=0.01, fast_count=5, factor=2.0, maximum=1.0):
+        """
+        :param fast_pause: float, pause used for the first `fast_count` attempts
+        :param fast_count: int, number of the short pauses
+        :param factor: float, growth of the pause after the short ones
+        :param maximum: float, cap of the pause
+        """
+        self.fast_pause = fast_pause
+        self.fast_count = fast_count
+        self.factor = factor
+        self.maximum = maximum
+
+    def pauses(self):
+        for _ in range(self.fast_count):
+            yield self.fast_pause
+        backoff = ExponentialBackoff(initial=self.fast_pause * self.factor,
+                                     factor=self.factor, maximum=self.maximum)
+        for pause in backoff.pauses():
+            yield pause
+
+
+def _pause_iterator(pause):
+    """
+    :param pause: int, float or PauseSchedule
+    :return: infinite iterator of pauses
+    """
+    if isinstance(pause, PauseSchedule):
+        return pause.pauses()
+    return itertools.repeat(pause)
+
+
+class _AttemptWorker(object):
+    """
+    Reusable daemon thread which evaluates the probed function on request.
+    """
+
+    def __init__(self, call):
+        """
+        :param call: callable, takes no arguments, returns result of a single attempt
+        """
+        self.call = call
+        self.requests = thread_queue.Queue()
+        self.results = thread_queue.Queue()
+        self.thread = threading.Thread(target=self._loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _loop(self):
+        while True:
+            if self.requests.get() is None:
+                return
+            self.results.put(self.call())
+
+    def attempt(self):
+        self.requests.put(True)
+
+    def get_result(self, timeout):
+        """
+        :param timeout: float or None, seconds to wait for the result, None means forever
+        :return: tuple, (bool, result), the bool is False when the result is not available yet
+        """
+        try:
+            return True, self.results.get(timeout=timeout)
+        except thread_queue.Empty:
+            return False, None
+
+    def shutdown(self):
+        # the thread exits once the attempt which may be still running finishes
+        self.requests.put(None)
+
+
 class Probe(object):
     """
     Probe can be used for waiting on specific result of a function.
@@ -27,17 +194,23 @@ class Probe(object):
                  expected_exceptions=(),
                  expected_retval=True,
                  fnc=bool,
+                 mode=ProbeMode.THREAD,
                  **kwargs):
         """
         :param timeout:              Number of seconds spent on trying. Set timeout to -1 for infinite run.
         :param pause:                Number of seconds waited between multiple function result checks
+                                     or an instance of PauseSchedule, e.g. ExponentialBackoff
         :param count:                Maximum number of tries, defaults to infinite, represented by -1
         :param expected_exceptions:  When one of expected_exception is raised, probe ignores it and
                                      tries to run function again. To ignore multiple exceptions use
                                      parenthesized tuple.
         :param expected_retval:      When expected_retval is received, probe ends successfully
         :param fnc:                  Function which run is checked by probe
+        :param mode:                 ProbeMode, how the function is evaluated, the function runs
+                                     in a reusable worker thread by default
         """
+        if not isinstance(mode, ProbeMode):
+            raise ConuException("'mode' is not an instance of ProbeMode")
         self.timeout = timeout
         self.pause = pause
         self.count = count
@@ -45,27 +218,44 @@ class Probe(object):
         self.fnc = fnc
         self.kwargs = kwargs
         self.expected_retval = expected_retval
+        self.mode = mode
         self.process = None
         self.queue = None
+        self._thread = None
+        self._result = None
+        self._stop_event = threading.Event()
 
     def run(self):
-        if self.process and self.process.is_alive():
+        if self.is_alive():
             raise RuntimeError("One instance of Probe can only be probing once at any given time")
+        self._stop_event.clear()
         return self._run()
 
     def run_in_background(self):
-        if self.process and self.process.is_alive():
+        if self.is_alive():
             raise RuntimeError("One instance of Probe can only be probing once at any given time")
-        self.queue = Queue()
-        self.process = Process(target=self._run)
-        return self.process.start()
+        self._stop_event.clear()
+        if self.mode == ProbeMode.PROCESS:
+            self.queue = Queue()
+            self.process = Process(target=self._run)
+            return self.process.start()
+        self._result = None
+        self._thread = threading.Thread(target=self._run_in_thread)
+        self._thread.daemon = True
+        return self._thread.start()
 
     def terminate(self):
-        if not self.process:
-            return
-        self.process.terminate()
+        if self.process:
+            self.process.terminate()
+        self._stop_event.set()
 
     def join(self):
+        if self._thread:
+            self._thread.join()
+            result, self._result = self._result, None
+            if isinstance(result, Exception):
+                raise result
+            return
         if not self.process:
             return
         self.process.join()
@@ -75,15 +265,16 @@ class Probe(object):
                 raise result
 
     def is_alive(self):
+        if self._thread and self._thread.is_alive():
+            return True
         if not self.process:
             return False
         return self.process.is_alive()
 
-    def _wrapper(self, q, start):
+    def _call(self, start):
         """
-        _wrapper checks return status of Probe.fnc and provides the result for process managing
+        _call runs Probe.fnc once and translates its outcome
 
-        :param q:     Queue for function results
         :param start: Time of function run (used for logging)
         :return:      Return value or Exception
         """
@@ -97,16 +288,110 @@ class Probe(object):
             result = self.fnc(**self.kwargs)
             # let's log only first 50 characters of the response
             logger.debug("callback result = %s", str(result)[:50])
-            q.put(result)
+            return result
         except self.expected_exceptions as ex:
             logger.debug("expected exception was caught: %s", ex)
-            q.put(False)
+            return False
+        except Exception as ex:
+            logger.debug("function raised an exception: %s", ex)
+            return ex
+
+    def _wrapper(self, q, start):
+        """
+        _wrapper checks return status of Probe.fnc and provides the result for process managing
+
+        :param q:     Queue for function results
+        :param start: Time of function run (used for logging)
+        :return:      Return value or Exception
+        """
+        q.put(self._call(start))
+
+    def _run_in_thread(self):
+        try:
+            self._run()
         except Exception as ex:
-            logger.debug("adding exception %s to queue", ex)
-            q.put(ex)
+            self._result = ex
 
     def _run(self):
+        if self.mode == ProbeMode.PROCESS:
+            return self._run_in_processes()
+        return self._run_in_threads()
+
+    def _record_success(self, start):
+        if isinstance(self.pause, PauseSchedule):
+            self.pause.record(time.time() - start)
+
+    def _remaining(self, start):
+        """ seconds left until timeout, None when there is no timeout """
+        if self.timeout == -1:
+            return None
+        return max(self.timeout - (time.time() - start), 0)
+
+    def _run_in_threads(self):
+        start = time.time()
+        logger.debug("starting probe (mode=%s)", self.mode.name)
+        pauses = _pause_iterator(self.pause)
+        worker = None
+        if self.mode == ProbeMode.THREAD:
+            worker = _AttemptWorker(lambda: self._call(start))
+        tries = 0
+        timed_out = False
+        try:
+            while tries < self.count or self.count == -1:
+                elapsed = time.time() - start
+                if self.timeout != -1 and elapsed > self.timeout:
+                    logger.info("timeout was reached, elapsed: %s", elapsed)
+                    timed_out = True
+                    break
+                tries += 1
+                logger.debug("attempt no. %s", tries)
+                if worker is None:
+                    result = self._call(start)
+                else:
+                    worker.attempt()
+                    done = False
+                    while not done and not self._stop_event.is_set():
+                        remaining = self._remaining(start)
+                        if remaining == 0:
+                            break
+                        # wake up regularly so that terminate() is noticed
+                        wait = 0.1 if remaining is None else min(remaining, 0.1)
+                        done, result = worker.get_result(max(wait, 0.01))
+                    if self._stop_event.is_set():
+                        logger.debug("probe was terminated")
+                        return False
+                    if not done:
+                        logger.info("timeout was reached while waiting for the function result")
+                        timed_out = True
+                        break
+                logger.debug("result = %s", result)
+                if isinstance(result, Exception):
+                    raise result
+                elif result == self.expected_retval:
+                    self._record_success(start)
+                    return True
+                if -1 < self.count <= tries:
+                    break
+                remaining = self._remaining(start)
+                pause = next(pauses)
+                pause = pause if remaining is None else min(remaining, pause)
+                logger.debug("pausing for %s before next try", pause)
+                if self._stop_event.wait(pause):
+                    logger.debug("probe was terminated")
+                    return False
+        finally:
+            if worker is not None:
+                worker.shutdown()
+        if timed_out or -1 == self.count or tries < self.count:
+            e = ProbeTimeout("Timeout exceeded.")
+        else:
+            e = CountExceeded()
+        logger.warning("probe is unsuccessful: %s", e)
+        raise e
+
+    def _run_in_processes(self):
         start = time.time()
+        pauses = _pause_iterator(self.pause)
         fnc_queue = Queue()
         logger.debug("starting probe")
         p = Process(target=self._wrapper, args=(fnc_queue, start))
@@ -119,8 +404,9 @@ class Probe(object):
                 logger.info("timeout was reached, elapsed: %s", elapsed)
                 break
             if p.is_alive():
-                logger.debug("pausing for %s before next try", self.pause)
-                time.sleep(self.pause)
+                pause = next(pauses)
+                logger.debug("pausing for %s before next try", pause)
+                time.sleep(pause)
             else:
                 logger.debug("waiting for process to end...")
                 p.join()
@@ -142,6 +428,7 @@ class Probe(object):
                     tries += 1
                     logger.debug("attempt no. %s started, pid: %s", tries, p.pid)
                 else:
+                    self._record_success(start)
                     return True
         p.terminate()
         p.join()
@@ -154,3 +441,185 @@ class Probe(object):
             self.queue.put(e)
         else:
             raise e
+
+
+class _ProbeState(object):
+    """
+    Bookkeeping of a single probe within ProbeGroup.
+    """
+
+    def __init__(self, probe, start):
+        self.probe = probe
+        self.start = start
+        self.tries = 0
+        self.pauses = _pause_iterator(probe.pause)
+
+    def is_expired(self, now):
+        return self.probe.timeout != -1 and now - self.start > self.probe.timeout
+
+    def deadline(self):
+        if self.probe.timeout == -1:
+            return None
+        return self.start + self.probe.timeout
+
+
+class _WorkerPool(object):
+    """
+    Fixed set of daemon threads which evaluate probed functions for ProbeGroup.
+    """
+
+    def __init__(self, size):
+        self.tasks = thread_queue.Queue()
+        self.results = thread_queue.Queue()
+        self.threads = []
+        for _ in range(size):
+            t = threading.Thread(target=self._loop)
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+
+    def _loop(self):
+        while True:
+            state = self.tasks.get()
+            if state is None:
+                return
+            self.results.put((state, state.probe._call(state.start)))
+
+    def submit(self, state):
+        self.tasks.put(state)
+
+    def shutdown(self):
+        for _ in self.threads:
+            self.tasks.put(None)
+
+
+class ProbeGroup(object):
+    """
+    ProbeGroup waits on many probes at once: the probes are kept in a heap keyed by the time
+    of their next attempt and a single loop in the calling thread dispatches the attempts
+    to a small pool of worker threads. Timeout, pause, count, expected_exceptions and
+    expected_retval of every probe are honored.
+
+    ::
+
+        group = ProbeGroup([
+            Probe(timeout=10, pause=0.1, fnc=c.is_port_open, port=8080) for c in containers
+        ])
+        group.wait_all()
+    """
+
+    def __init__(self, probes=None, workers=4):
+        """
+        :param probes: list of Probe instances
+        :param workers: int, number of threads which evaluate the probed functions
+        """
+        if workers < 1:
+            raise ConuException("ProbeGroup needs at least one worker")
+        self.workers = workers
+        self.probes = []
+        for probe in probes or []:
+            self.add(probe)
+
+    def __len__(self):
+        return len(self.probes)
+
+    def add(self, probe):
+        """
+        add a probe to this group, probes in mode ProbeMode.PROCESS are not supported
+
+        :param probe: instance of Probe
+        :return: the probe
+        """
+        if not isinstance(probe, Probe):
+            raise ConuException("%r is not an instance of Probe" % probe)
+        if probe.mode == ProbeMode.PROCESS:
+            raise ConuException("probes in mode PROCESS can't be part of a ProbeGroup")
+        self.probes.append(probe)
+        return probe
+
+    def as_completed(self):
+        """
+        run all the probes and yield them as they finish
+
+        :return: iterator of tuples (probe, exception), exception is None when the probe
+                 was successful
+        """
+        start = time.time()
+        counter = itertools.count()
+        heap = [(start, next(counter), _ProbeState(p, start)) for p in self.probes]
+        heapq.heapify(heap)
+        running = set()
+        pool = _WorkerPool(min(self.workers, len(self.probes) or 1))
+        try:
+            while heap or running:
+                now = time.time()
+                while heap and heap[0][0] <= now:
+                    _, _, state = heapq.heappop(heap)
+                    probe = state.probe
+                    if state.is_expired(now):
+                        yield probe, ProbeTimeout("Timeout exceeded.")
+                    elif -1 < probe.count <= state.tries:
+                        yield probe, CountExceeded()
+                    else:
+                        state.tries += 1
+                        running.add(state)
+                        pool.submit(state)
+
+                # attempts which take too long are abandoned
+                for state in [x for x in running if x.is_expired(now)]:
+                    logger.info("timeout was reached while waiting for the function result")
+                    running.remove(state)
+                    yield state.probe, ProbeTimeout("Timeout exceeded.")
+
+                if not (heap or running):
+                    break
+                wake_ups = [heap[0][0]] if heap else []
+                wake_ups += [x.deadline() for x in running if x.deadline() is not None]
+                wait = max(min(wake_ups) - time.time(), 0) if wake_ups else None
+                try:
+                    state, result = pool.results.get(timeout=wait)
+                except thread_queue.Empty:
+                    continue
+                if state not in running:
+                    # result of an abandoned attempt
+                    continue
+                running.remove(state)
+                probe = state.probe
+                logger.debug("result = %s", result)
+                if isinstance(result, Exception):
+                    yield probe, result
+                elif result == probe.expected_retval:
+                    probe._record_success(state.start)
+                    yield probe, None
+                elif -1 < probe.count <= state.tries:
+                    yield probe, CountExceeded()
+                else:
+                    heapq.heappush(heap, (time.time() + next(state.pauses), next(counter), state))
+        finally:
+            pool.shutdown()
+
+    def wait_all(self):
+        """
+        block until all the probes succeed; the first failure is raised right away
+
+        :return: True
+        """
+        for probe, error in self.as_completed():
+            if error is not None:
+                logger.warning("probe is unsuccessful: %s", error)
+                raise error
+        return True
+
+    def wait_any(self):
+        """
+        block until one of the probes succeeds; when all of them fail, the last failure
+        is raised
+
+        :return: Probe instance which succeeded
+        """
+        error = ProbeTimeout("No probe to wait for.")
+        for probe, error in self.as_completed():
+            if error is None:
+                return probe
+        logger.warning("all probes are unsuccessful: %s", error)
+        raise error
@@ -303,6 +303,38 @@ def test_wait_for_status():
             cont.delete(force=True)
 
 
+def test_wait_for_exit():
+    with DockerBackend() as backend:
+        image = backend.ImageClass(FEDORA_MINIMAL_REPOSITORY, tag=FEDORA_MINIMAL_REPOSITORY_TAG)
+        conts = [image.run_via_binary(command=['bash', '-c', 'sleep 1; exit 3'])
+                 for _ in range(3)]
+        try:
+            backend.wait_all(conts, status="running", timeout=10)
+            assert [c.wait_for_exit(timeout=10) for c in conts] == [3, 3, 3]
+        finally:
+            for c in conts:
+                c.delete(force=True)
+
+
+def test_wait_for_healthy():
+    with DockerBackend() as backend:
+        image = backend.ImageClass(FEDORA_MINIMAL_REPOSITORY, tag=FEDORA_MINIMAL_REPOSITORY_TAG)
+        opts = ["--health-cmd", "test -f /tmp/ready", "--health-interval", "1s"]
+        cmd = ['bash', '-c', 'sleep 1; touch /tmp/ready; sleep infinity']
+        cont = image.run_via_binary(command=cmd, additional_opts=opts)
+        try:
+            assert cont.wait_for_healthy(timeout=30)
+        finally:
+            cont.delete(force=True)
+
+        cont = image.run_via_binary(command=['sleep', 'infinity'])
+        try:
+            with pytest.raises(ConuException):
+                cont.wait_for_healthy(timeout=1)
+        finally:
+            cont.delete(force=True)
+
+
 def test_exit_code():
     with DockerBackend() as backend:
         image = backend.ImageClass(FEDORA_MINIMAL_REPOSITORY, tag=FEDORA_MINIMAL_REPOSITORY_TAG)
@@ -452,6 +484,40 @@ def test_list_containers():
             container.delete(force=True)
 
 
+def test_list_containers_shares_images():
+    with DockerBackend() as backend:
+        image = backend.ImageClass(FEDORA_MINIMAL_REPOSITORY, tag=FEDORA_MINIMAL_REPOSITORY_TAG,
+                                   pull_policy=DockerImagePullPolicy.NEVER)
+        containers = [image.run_via_binary(command=["sleep", "infinity"]) for _ in range(3)]
+        try:
+            # listing must not touch the images
+            flexmock(backend.ImageClass).should_receive("is_present").never()
+            listed = [c for c in backend.list_containers()
+                      if c.get_id() in [x.get_id() for x in containers]]
+            assert len(listed) == 3
+            assert len(set(id(c.image) for c in listed)) == 1
+        finally:
+            for c in containers:
+                c.delete(force=True)
+
+
+def test_inspect_many():
+    with DockerBackend() as backend:
+        image = backend.ImageClass(FEDORA_MINIMAL_REPOSITORY, tag=FEDORA_MINIMAL_REPOSITORY_TAG,
+                                   pull_policy=DockerImagePullPolicy.NEVER)
+        containers = [image.run_via_binary(command=["sleep", "infinity"]) for _ in range(3)]
+        try:
+            metadata = backend.inspect_containers([c.get_id() for c in containers])
+            assert [m.identifier for m in metadata] == [c.get_id() for c in containers]
+            assert all(m.status == ContainerStatus.RUNNING for m in metadata)
+
+            image_metadata = backend.inspect_images([image.get_id()])
+            assert image.get_id().endswith(image_metadata[0].identifier)
+        finally:
+            for c in containers:
+                c.delete(force=True)
+
+
 def test_list_images():
     with DockerBackend() as backend:
         image_list = backend.list_images()
@@ -621,3 +687,34 @@ def test_run_via_api():
             assert isinstance(c.get_id(), string_types)
         finally:
             c.delete(force=True)
+
+
+def test_run_via_binary_via_api():
+    with DockerBackend() as backend:
+        image = backend.ImageClass(FEDORA_MINIMAL_REPOSITORY, tag=FEDORA_MINIMAL_REPOSITORY_TAG)
+        c = image.run_via_binary(command=["sleep", "infinity"],
+                                 additional_opts=["-e", "HELLO=there", "-p", "12345"],
+                                 via_api=True)
+        try:
+            assert c.is_running()
+            assert c.name == c.inspect()["Name"][1:]
+            assert "HELLO=there" in c.inspect()["Config"]["Env"]
+            assert c.get_port_mappings(12345)
+            labeled = backend.list_containers(label="conu.test_artifact")
+            assert c.get_id() in [x.get_id() for x in labeled]
+        finally:
+            c.delete(force=True)
+
+
+def test_session():
+    with DockerBackend() as backend:
+        image = backend.ImageClass(FEDORA_MINIMAL_REPOSITORY, tag=FEDORA_MINIMAL_REPOSITORY_TAG)
+        c = image.run_via_binary(command=["sleep", "infinity"])
+        try:
+            with c.session() as s:
+                assert s.execute(["id", "-u"]) == "0\n"
+                assert s.run(["ls", "/nonexistent"])[0] == 2
+                for _ in range(50):
+                    assert s.execute("test -d /etc && echo yes") == "yes\n"
+        finally:
+            c.delete(force=True)
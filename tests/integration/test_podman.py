@@ -83,6 +83,7 @@ def test_container(podman_backend, podman_run_builder):
         assert c.get_id() == str(c)
         assert repr(c)
         assert isinstance(c.get_id(), string_types)
+        assert 0 < c.time_to_id < 10
     finally:
         c.delete(force=True)
 
@@ -192,6 +193,24 @@ def test_wait_for_status(podman_backend):
         cont.delete(force=True)
 
 
+def test_wait_for_healthy(podman_backend):
+    image = podman_backend.ImageClass(FEDORA_MINIMAL_REPOSITORY, tag=FEDORA_MINIMAL_REPOSITORY_TAG)
+    opts = ["--health-cmd", "test -f /tmp/ready", "--health-interval", "1s"]
+    cmd = ['bash', '-c', 'sleep 1; touch /tmp/ready; sleep infinity']
+    cont = image.run_via_binary(command=cmd, additional_opts=opts)
+    try:
+        assert cont.wait_for_healthy(timeout=30)
+    finally:
+        cont.delete(force=True)
+
+    cont = image.run_via_binary(command=['sleep', 'infinity'])
+    try:
+        with pytest.raises(ConuException):
+            cont.wait_for_healthy(timeout=1)
+    finally:
+        cont.delete(force=True)
+
+
 def test_exit_code(podman_backend):
     image = podman_backend.ImageClass(FEDORA_MINIMAL_REPOSITORY, tag=FEDORA_MINIMAL_REPOSITORY_TAG)
     cmd = ['sleep', '0.3']
@@ -318,6 +337,22 @@ def test_list_containers(podman_backend):
         container.delete(force=True)
 
 
+def test_inspect_many(podman_backend):
+    image = podman_backend.ImageClass(FEDORA_MINIMAL_REPOSITORY, tag=FEDORA_MINIMAL_REPOSITORY_TAG,
+                                      pull_policy=PodmanImagePullPolicy.NEVER)
+    containers = [image.run_via_binary(command=["sleep", "infinity"]) for _ in range(3)]
+    try:
+        metadata = podman_backend.inspect_containers([c.get_id() for c in containers])
+        assert [m.identifier for m in metadata] == [c.get_id() for c in containers]
+        assert all(m.status == ContainerStatus.RUNNING for m in metadata)
+
+        image_metadata = podman_backend.inspect_images([image.get_id()])
+        assert image.get_id().endswith(image_metadata[0].identifier)
+    finally:
+        for c in containers:
+            c.delete(force=True)
+
+
 def test_list_images(podman_backend):
     image_list = podman_backend.list_images()
     assert len(image_list) > 0
@@ -370,3 +405,14 @@ def test_container_metadata(podman_backend):
         assert container_metadata.status == ContainerStatus.RUNNING
     finally:
         c.delete(force=True)
+
+
+def test_run_many(podman_backend):
+    image = podman_backend.ImageClass(FEDORA_MINIMAL_REPOSITORY, tag=FEDORA_MINIMAL_REPOSITORY_TAG)
+    run_spec = PodmanRunBuilder(command=["sleep", "infinity"])
+    containers = image.run_many(4, run_spec, max_parallel=4, ready=lambda c: c.is_running())
+    try:
+        assert len(set(c.get_id() for c in containers)) == 4
+    finally:
+        for c in containers:
+            c.delete(force=True)
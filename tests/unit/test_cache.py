@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+from __future__ import print_function, unicode_literals
+
+import time
+
+from conu.utils.cache import TTLCache, PermanentCache, ImageInspectCache
+
+
+class Fetcher(object):
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, key):
+        self.calls += 1
+        return {"key": key, "call": self.calls}
+
+
+def test_ttl_cache():
+    fetch = Fetcher()
+    cache = TTLCache(ttl=0.3)
+    assert cache.get("a", fetch) == {"key": "a", "call": 1}
+    assert cache.get("a", fetch) == {"key": "a", "call": 1}
+    assert cache.get("b", fetch)["call"] == 2
+    time.sleep(0.4)
+    assert cache.get("a", fetch)["call"] == 3
+
+
+def test_ttl_cache_invalidate():
+    fetch = Fetcher()
+    cache = TTLCache(ttl=100)
+    cache.get("a", fetch)
+    cache.get("b", fetch)
+    cache.invalidate("a", None)
+    assert len(cache) == 1
+    assert cache.get("a", fetch)["call"] == 3
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_ttl_cache_invalidate_if():
+    fetch = Fetcher()
+    cache = TTLCache(ttl=100)
+    for key in ("abc", "abcdef", "xyz"):
+        cache.get(key, fetch)
+    cache.invalidate_if(lambda key: "abcdef0123".startswith(key))
+    assert len(cache) == 1
+    assert cache.get("xyz", fetch)["call"] == 3
+
+
+def test_ttl_cache_force():
+    fetch = Fetcher()
+    cache = TTLCache(ttl=100)
+    cache.get("a", fetch)
+    assert cache.get("a", fetch, force=True)["call"] == 2
+    # the forced value is stored
+    assert cache.get("a", fetch)["call"] == 2
+
+
+def test_ttl_cache_disabled():
+    fetch = Fetcher()
+    cache = TTLCache(ttl=0)
+    cache.get("a", fetch)
+    cache.get("a", fetch)
+    assert fetch.calls == 2
+    assert len(cache) == 0
+
+
+def test_ttl_cache_invalidated_during_fetch():
+    cache = TTLCache(ttl=100)
+
+    def fetch(key):
+        # the object changes while its stale state is being fetched
+        cache.invalidate(key)
+        return "stale"
+
+    assert cache.get("a", fetch) == "stale"
+    assert cache.get("a", lambda key: "fresh") == "fresh"
+
+
+def test_permanent_cache(tmpdir):
+    fetch = Fetcher()
+    cache = PermanentCache(directory=str(tmpdir))
+    assert cache.get("sha256:abc", fetch)["call"] == 1
+    assert cache.get("sha256:abc", fetch)["call"] == 1
+
+    # another process reads the data from disk
+    other = PermanentCache(directory=str(tmpdir))
+    assert other.get("sha256:abc", fetch)["call"] == 1
+    assert fetch.calls == 1
+
+    other.clear()
+    assert other.get("sha256:abc", fetch)["call"] == 2
+
+
+def test_permanent_cache_invalidate(tmpdir):
+    fetch = Fetcher()
+    cache = PermanentCache(directory=str(tmpdir))
+    cache.get("sha256:abc", fetch)
+    cache.get("sha256:def", fetch)
+    cache.invalidate("sha256:abc", None)
+    assert len(cache) == 1
+    assert PermanentCache(directory=str(tmpdir)).lookup("sha256:abc") is None
+    assert cache.get("sha256:abc", fetch)["call"] == 3
+
+
+def test_image_inspect_cache():
+    fetched = []
+    images = {"fedora:29": "sha256:29", "sha256:29": "sha256:29", "sha256:30": "sha256:30"}
+
+    def fetch(identifier):
+        fetched.append(identifier)
+        return {"Id": images[identifier]}
+
+    cache = ImageInspectCache(ttl=100)
+    assert cache.get_by_name("fedora:29", fetch) == {"Id": "sha256:29"}
+    assert cache.get_by_name("fedora:29", fetch) == {"Id": "sha256:29"}
+    assert cache.get_by_id("sha256:29", fetch) == {"Id": "sha256:29"}
+    assert fetched == ["fedora:29"]
+
+    # the tag is moved to a different image
+    images["fedora:29"] = "sha256:30"
+    cache.invalidate_names("fedora:29")
+    assert cache.get_by_name("fedora:29", fetch) == {"Id": "sha256:30"}
+    assert fetched == ["fedora:29", "fedora:29"]
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+from __future__ import print_function, unicode_literals
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from conu import ConuException, ProbeTimeout
+from conu.utils import cidfile
+from conu.utils.cidfile import parse_container_id, wait_for_cidfile
+
+
+CONTAINER_ID = "4f2b" * 16
+
+
+def write_later(path, delay):
+    def write():
+        time.sleep(delay)
+        with open(path, "w") as fd:
+            fd.write(CONTAINER_ID + "\n")
+    t = threading.Thread(target=write)
+    t.start()
+    return t
+
+
+@pytest.mark.parametrize("inotify", [True, False])
+def test_wait_for_cidfile(tmpdir, monkeypatch, inotify):
+    if not inotify:
+        monkeypatch.setattr(cidfile, "_libc", False)
+    elif not cidfile._get_libc():
+        pytest.skip("inotify is not available")
+    path = str(tmpdir.join("cid"))
+    t = write_later(path, 0.2)
+    start = time.time()
+    assert wait_for_cidfile(path, timeout=5) == CONTAINER_ID
+    # no artificial latency
+    assert time.time() - start < 0.4
+    t.join()
+    # the file exists already
+    assert wait_for_cidfile(path, timeout=0) == CONTAINER_ID
+
+
+def test_wait_for_cidfile_failures(tmpdir):
+    path = str(tmpdir.join("cid"))
+    with pytest.raises(ProbeTimeout):
+        wait_for_cidfile(path, timeout=0.1)
+
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    start = time.time()
+    with pytest.raises(ConuException):
+        wait_for_cidfile(path, timeout=10, process=process)
+    assert time.time() - start < 2
+    assert not os.path.exists(path)
+
+
+def test_parse_container_id():
+    assert parse_container_id("%s\n" % CONTAINER_ID) == CONTAINER_ID
+    assert parse_container_id("Trying to pull...\nWriting manifest\n%s\n" % CONTAINER_ID) == \
+        CONTAINER_ID
+    assert parse_container_id("Error: no such image\n") is None
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+from __future__ import print_function, unicode_literals
+
+import threading
+import time
+
+import pytest
+
+from conu import ContainerPool, ContainerResetPolicy, ConuException, ProbeTimeout
+from conu.apidefs.image import Image
+from conu.apidefs.metadata import ContainerMetadata
+
+
+class FakeContainer(object):
+    def __init__(self, image, spec):
+        self.image = image
+        self.spec = spec
+        self.running = False
+        self.deleted = False
+        self.starts = 0
+
+    def start(self):
+        self.running = True
+        self.starts += 1
+
+    def stop(self):
+        self.running = False
+
+    def delete(self, force=False):
+        self.deleted = True
+
+    def commit(self, repository, tag="latest"):
+        return FakeImage(repository, layers=self.image.layers + 1)
+
+
+class FakeImage(Image):
+    def __init__(self, name, layers=0, delay=0, fail=False):
+        super(FakeImage, self).__init__(name)
+        self.layers = layers
+        self.delay = delay
+        self.fail = fail
+        self.created = []
+        self.removed = False
+        self.lock = threading.Lock()
+
+    def run_via_api(self, spec):
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConuException("no such image")
+        container = FakeContainer(self, spec)
+        with self.lock:
+            self.created.append(container)
+        return container
+
+    def rmi(self, force=False):
+        self.removed = True
+
+
+def test_pool_discard():
+    image = FakeImage("fedora", delay=0.1)
+    spec = ContainerMetadata(command=["sleep", "infinity"])
+    with ContainerPool(image, run_spec=spec, size=3) as pool:
+        start = time.time()
+        containers = [pool.acquire(timeout=5) for _ in range(3)]
+        # the containers are created in parallel
+        assert time.time() - start < 0.3
+        assert all(c.running for c in containers)
+        assert all(c.spec.command == spec.command and c.spec is not spec for c in containers)
+
+        with pytest.raises(ProbeTimeout):
+            pool.acquire(timeout=0.01)
+
+        pool.release(containers[0])
+        replacement = pool.acquire(timeout=5)
+        assert replacement not in containers
+        assert containers[0].deleted
+    assert all(c.deleted for c in image.created)
+    assert len(image.created) == 4
+
+
+def test_pool_restart():
+    image = FakeImage("fedora")
+    with ContainerPool(image, size=1, reset=ContainerResetPolicy.RESTART) as pool:
+        with pool.container(timeout=5) as c:
+            pass
+        with pool.container(timeout=5) as c2:
+            assert c2 is c
+            assert c.starts == 2
+    assert c.deleted
+
+
+def test_pool_commit():
+    image = FakeImage("fedora")
+    with ContainerPool(image, size=1, reset=ContainerResetPolicy.COMMIT) as pool:
+        with pool.container(timeout=5) as c:
+            pass
+        with pool.container(timeout=5) as c2:
+            assert c2 is not c
+            assert c2.image.layers == 1
+        committed = c2.image
+    assert c.deleted and c2.deleted
+    assert committed.removed
+
+
+def test_pool_failure():
+    with ContainerPool(FakeImage("fedora", fail=True), size=1) as pool:
+        with pytest.raises(ConuException):
+            pool.acquire(timeout=5)
+
+    with pytest.raises(ConuException):
+        ContainerPool(FakeImage("fedora"), size=0)
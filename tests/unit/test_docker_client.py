@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+from __future__ import print_function, unicode_literals
+
+import gc
+import threading
+
+import pytest
+
+from conu.backend.docker import client as docker_client
+from conu.backend.docker.client import DockerClientPool, DockerClientProxy
+from conu.utils.capabilities import CapabilityRegistry
+
+
+class FakeAPIClient(object):
+    created = []
+
+    def __init__(self, version=None, timeout=None, max_pool_size=None):
+        self.api_version = "1.40" if version == "auto" else version
+        self.max_pool_size = max_pool_size
+        self.closed = False
+        self.created.append(self)
+
+    def close(self):
+        self.closed = True
+
+    def version(self):
+        return self
+
+
+@pytest.fixture()
+def pool(monkeypatch):
+    FakeAPIClient.created = []
+    monkeypatch.setattr(docker_client.docker, "APIClient", FakeAPIClient)
+    monkeypatch.setattr(docker_client, "check_docker_command_works", lambda: True)
+    registry = CapabilityRegistry()
+    monkeypatch.setattr(docker_client, "get_capabilities", lambda: registry)
+    return DockerClientPool(max_connections=3)
+
+
+def in_thread(fnc):
+    result = []
+    t = threading.Thread(target=lambda: result.append(fnc()))
+    t.start()
+    t.join()
+    return result[0]
+
+
+def test_client_per_thread(pool):
+    proxy = DockerClientProxy(pool)
+    main_client = proxy.version()
+    assert main_client is pool.get()
+    assert main_client.max_pool_size == 3
+
+    thread_client = in_thread(lambda: proxy.version())
+    assert thread_client is not main_client
+    assert thread_client.api_version == "1.40"
+    gc.collect()
+    # the client of the finished thread is reused
+    assert in_thread(lambda: proxy.version()) is thread_client
+    assert len(FakeAPIClient.created) == 2
+
+
+def test_configure(pool):
+    old_client = pool.get()
+    pool.configure(max_connections=5)
+    new_client = pool.get()
+    assert new_client is not old_client
+    assert new_client.max_pool_size == 5
+    gc.collect()
+    assert old_client.closed
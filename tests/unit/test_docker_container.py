@@ -6,8 +6,18 @@
 
 from __future__ import print_function, unicode_literals
 
+import socket
+import subprocess
+
+import docker.errors
+import pytest
+from flexmock import flexmock
+
 from ..constants import FEDORA_MINIMAL_REPOSITORY, FEDORA_MINIMAL_REPOSITORY_TAG
-from conu import DockerRunBuilder, DockerImage
+from conu import (ConuException, CountExceeded, DockerBackend, DockerRunBuilder, DockerImage,
+                  DockerImagePullPolicy)
+from conu.backend.docker.container import DockerContainer
+from conu.backend.docker.container_parameters import DockerContainerParameters
 from conu.backend.docker.constants import CONU_ARTIFACT_TAG
 
 
@@ -55,3 +65,186 @@ def test_get_port_mappings():
         assert not mappings
     finally:
         container.delete(force=True)
+
+
+def test_get_parameters_strict():
+    builder = DockerRunBuilder(additional_opts=["-e", "A=b", "--shm-size", "1g"])
+    assert builder.get_parameters().env_variables == ["A=b"]
+    with pytest.raises(ConuException):
+        builder.get_parameters(strict=True)
+
+
+def test_get_parameters_health_durations():
+    builder = DockerRunBuilder(additional_opts=["--health-cmd", "true",
+                                                "--health-interval=1m30s",
+                                                "--health-timeout", "500ms"])
+    healthcheck = builder.get_parameters(strict=True).healthcheck
+    assert healthcheck["Interval"] == 90 * 10 ** 9
+    assert healthcheck["Timeout"] == 500 * 10 ** 6
+
+    # docker requires a unit; argparse must not exit the process
+    for opts in (["--health-interval", "5"], ["--pids-limit", "many"]):
+        with pytest.raises(ConuException):
+            DockerRunBuilder(additional_opts=opts).get_parameters(strict=True)
+
+
+def test_run_via_binary_via_api_falls_back():
+    image = DockerImage("fedora", identifier="sha256:1234",
+                        pull_policy=DockerImagePullPolicy.NEVER)
+    image.d = FakeAPIClient()
+    builder = DockerRunBuilder(additional_opts=["--health-interval", "5"])
+    assert image._run_via_api_fast(builder) is None
+    assert image.d.calls == []
+
+
+class FakeAPIClient(object):
+    def __init__(self):
+        self.calls = []
+
+    def create_host_config(self, **kwargs):
+        self.calls.append(("create_host_config", kwargs))
+        return kwargs
+
+    def create_container(self, image, **kwargs):
+        self.calls.append(("create_container", kwargs))
+        return {"Id": "c0ffee", "Warnings": []}
+
+    def start(self, container_id):
+        self.calls.append(("start", container_id))
+
+
+def test_run_via_binary_via_api():
+    image = DockerImage("fedora", identifier="sha256:1234",
+                        pull_policy=DockerImagePullPolicy.NEVER)
+    image.d = FakeAPIClient()
+    flexmock(subprocess).should_receive("Popen").never()
+
+    container = image.run_via_binary(additional_opts=["-p", "8080:80", "-l", "a=b"],
+                                     volumes=("/srv", "/data", "Z"), command=["sleep", "1"],
+                                     via_api=True)
+    assert container.get_id() == "c0ffee"
+    assert container.name.startswith("conu-")
+    assert container.time_to_id >= 0
+    (_, host_config), (_, create), start = image.d.calls
+    assert host_config["binds"] == ["/srv:/data:Z"]
+    assert host_config["port_bindings"] == {"80": 8080}
+    assert create["ports"] == ["80"]
+    assert create["volumes"] == ["/data"]
+    assert create["labels"] == {"a": "b", CONU_ARTIFACT_TAG: ""}
+    assert create["command"] == ["sleep", "1"]
+    assert start == ("start", "c0ffee")
+
+
+def test_run_via_api_passes_parameters_as_they_are():
+    image = DockerImage("fedora", identifier="sha256:1234",
+                        pull_policy=DockerImagePullPolicy.NEVER)
+    image.d = FakeAPIClient()
+    params = DockerContainerParameters(volumes=["/data"], port_mappings={"80": 8080},
+                                       network="host", name="web")
+    container = image.run_via_api(params)
+    assert container.get_id() == "c0ffee"
+    (_, host_config), (_, create) = image.d.calls
+    assert "binds" not in host_config
+    assert "network_mode" not in host_config
+    assert host_config["port_bindings"] == {"80": 8080}
+    assert create["ports"] == params.exposed_ports == []
+    assert create["volumes"] == ["/data"]
+
+
+def test_wait_for_port_probe_kwargs():
+    image = DockerImage("fedora", identifier="sha256:1234",
+                        pull_policy=DockerImagePullPolicy.NEVER)
+    container = DockerContainer(image, "c0ffee")
+    flexmock(container).should_receive("wait_for_ports").never()
+    flexmock(container).should_receive("is_port_open").with_args(8080) \
+        .and_raise(socket.error).and_return(False).and_return(True).times(3)
+    container.wait_for_port(8080, count=5, pause=0.01, expected_exceptions=(socket.error,))
+
+    flexmock(container).should_receive("is_port_open").and_return(False)
+    with pytest.raises(CountExceeded):
+        container.wait_for_port(8080, count=2, pause=0.01)
+
+
+def test_wait_for_port_fast_path():
+    image = DockerImage("fedora", identifier="sha256:1234",
+                        pull_policy=DockerImagePullPolicy.NEVER)
+    container = DockerContainer(image, "c0ffee")
+    flexmock(container).should_receive("wait_for_ports").with_args([8080], timeout=3, pause=0.5) \
+        .once()
+    container.wait_for_port(8080, timeout=3, pause=0.5)
+
+
+def test_inspect_refresh_without_events():
+    image = DockerImage("fedora", identifier="sha256:1234",
+                        pull_policy=DockerImagePullPolicy.NEVER)
+    container = DockerContainer(image, "c0ffee")
+    states = [{"Id": "c0ffee", "State": {"Running": True}},
+              {"Id": "c0ffee", "State": {"Running": False}}]
+    container.d = flexmock(inspect_container=lambda container_id: states.pop(0))
+    assert container.is_running()
+    # e.g. the main process was killed via execute()
+    assert not container.is_running()
+    assert not container.inspect(refresh=False)["State"]["Running"]
+
+
+def test_get_port_mappings_inspects_once():
+    image = DockerImage("fedora", identifier="sha256:1234",
+                        pull_policy=DockerImagePullPolicy.NEVER)
+    container = DockerContainer(image, "c0ffee")
+    ports = {"123/tcp": [{"HostIp": "0.0.0.0", "HostPort": "321"}]}
+    inspected = []
+
+    def inspect_container(container_id):
+        inspected.append(container_id)
+        return {"Id": "c0ffee", "NetworkSettings": {"Ports": ports}}
+
+    container.d = flexmock(inspect_container=inspect_container)
+    assert container.get_port_mappings(123) == [{"HostIp": "0.0.0.0", "HostPort": "321"}]
+    assert len(inspected) == 1
+    assert container.get_port_mappings(124) == []
+    assert len(inspected) == 2
+
+
+def test_inspect_refresh_honors_explicit_ttl():
+    image = DockerImage("fedora", identifier="sha256:1234",
+                        pull_policy=DockerImagePullPolicy.NEVER)
+    container = DockerContainer(image, "c0ffee")
+    inspected = []
+
+    def inspect_container(container_id):
+        inspected.append(container_id)
+        return {"Id": "c0ffee", "State": {"Running": True}}
+
+    container.d = flexmock(inspect_container=inspect_container)
+    with DockerBackend(inspect_ttl=60):
+        container.invalidate_inspect_cache()
+        assert container.is_running()
+        assert container.is_running()
+        assert len(inspected) == 1
+        # lifecycle methods still invalidate the cache
+        container.invalidate_inspect_cache()
+        assert container.is_running()
+        assert len(inspected) == 2
+    # the backend restored the default, so refresh asks the daemon again
+    assert container.is_running()
+    assert len(inspected) == 3
+
+
+def test_rmi_invalidates_image_cache():
+    image_id = "sha256:" + "1" * 64
+    image = DockerImage("fedora", identifier=image_id, pull_policy=DockerImagePullPolicy.NEVER)
+    present = {image_id: True}
+
+    def inspect_image(identifier):
+        if not present.get(identifier):
+            raise docker.errors.NotFound("no such image")
+        return {"Id": identifier}
+
+    def remove_image(identifier, force=False):
+        present.pop(identifier)
+
+    image.d = flexmock(inspect_image=inspect_image, remove_image=remove_image)
+    assert image.inspect()["Id"] == image_id
+    image.rmi()
+    with pytest.raises(docker.errors.NotFound):
+        image.inspect(refresh=True)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+from __future__ import print_function, unicode_literals
+
+import threading
+
+import docker.errors
+import pytest
+from flexmock import flexmock
+from six.moves import queue
+
+from conu import DockerImage, DockerImagePullPolicy, ProbeTimeout
+from conu.backend.docker import container as docker_container
+from conu.backend.docker.events import DockerEventMonitor
+
+
+class FakeEventStream(object):
+    def __init__(self):
+        self.q = queue.Queue()
+
+    def __iter__(self):
+        while True:
+            event = self.q.get()
+            if event is None:
+                return
+            yield event
+
+    def send(self, container_id, action, **attributes):
+        self.q.put({"Type": "container", "Action": action,
+                    "Actor": {"ID": container_id, "Attributes": attributes}})
+
+    def close(self):
+        self.q.put(None)
+
+
+class FakeClient(object):
+    def __init__(self, statuses):
+        self.statuses = statuses
+        # {container_id: health status}
+        self.health = {}
+        self.stream = None
+        self.subscriptions = 0
+
+    def events(self, decode=False, filters=None):
+        self.subscriptions += 1
+        self.stream = FakeEventStream()
+        return self.stream
+
+    def inspect_container(self, container_id):
+        for full_id, status in self.statuses.items():
+            data = {"State": {"Status": status, "ExitCode": 0}}
+            if full_id in self.health:
+                data["State"]["Health"] = {"Status": self.health[full_id]}
+                data["Config"] = {"Healthcheck": {"Test": ["CMD-SHELL", "true"]}}
+            if full_id == container_id:
+                return data
+            if full_id.startswith(container_id):
+                data["Id"] = full_id
+                return data
+        raise docker.errors.NotFound("no such container")
+
+
+def test_wait_for_status():
+    client = FakeClient({"a": "created", "b": "created"})
+    monitor = DockerEventMonitor(client=client)
+    try:
+        def emit():
+            client.stream.send("a", "start")
+            client.stream.send("b", "start")
+        threading.Timer(0.2, emit).start()
+        states = monitor.wait_for(["a", "b"], lambda s: s.status == "running", timeout=5)
+        assert sorted(states) == ["a", "b"]
+        assert client.subscriptions == 1
+
+        threading.Timer(0.2, client.stream.send, args=("a", "die"),
+                        kwargs={"exitCode": "3"}).start()
+        states = monitor.wait_for(["a"], lambda s: s.status == "exited", timeout=5)
+        assert states["a"].exit_code == 3
+        assert client.subscriptions == 1
+    finally:
+        monitor.stop()
+
+
+def test_wait_for_timeout():
+    monitor = DockerEventMonitor(client=FakeClient({"a": "created"}))
+    try:
+        with pytest.raises(ProbeTimeout):
+            monitor.wait_for(["a"], lambda s: s.status == "running", timeout=0.3)
+    finally:
+        monitor.stop()
+
+
+def test_resubscribe():
+    client = FakeClient({"a": "created"})
+    monitor = DockerEventMonitor(client=client)
+    try:
+        def interrupt():
+            client.statuses["a"] = "running"
+            client.stream.close()
+        threading.Timer(0.2, interrupt).start()
+        states = monitor.wait_for(["a"], lambda s: s.status == "running", timeout=5)
+        assert states["a"].status == "running"
+        assert client.subscriptions == 2
+    finally:
+        monitor.stop()
+
+
+def test_health_and_callbacks():
+    client = FakeClient({"a": "running"})
+    monitor = DockerEventMonitor(client=client)
+    seen = []
+    monitor.add_callback(lambda cid, event: seen.append((cid, event["Action"])))
+    try:
+        monitor.start()
+        threading.Timer(0.2, client.stream.send, args=("a", "health_status: healthy")).start()
+        states = monitor.wait_for(["a"], lambda s: s.health == "healthy", timeout=5)
+        assert states["a"].status == "running"
+        assert seen == [("a", "health_status: healthy")]
+    finally:
+        monitor.stop()
+
+
+def test_short_id_and_destroy():
+    full_id = "a" * 64
+    client = FakeClient({full_id: "created"})
+    monitor = DockerEventMonitor(client=client)
+    try:
+        monitor.start()
+        threading.Timer(0.2, client.stream.send, args=(full_id, "start")).start()
+        states = monitor.wait_for(["aaaa"], lambda s: s.status == "running", timeout=5)
+        assert states["aaaa"].status == "running"
+
+        threading.Timer(0.2, client.stream.send, args=(full_id, "destroy")).start()
+        states = monitor.wait_for(["aaaa"], lambda s: s.status == "removed", timeout=5)
+        assert states["aaaa"].status == "removed"
+        assert not monitor._states and not monitor._aliases
+        assert monitor.get_state("aaaa").status == "removed"
+    finally:
+        monitor.stop()
+
+
+def test_exec_event_of_running_container():
+    client = FakeClient({"a": "running"})
+    monitor = DockerEventMonitor(client=client)
+    processed = threading.Event()
+    monitor.add_callback(lambda cid, event: event["Action"] == "exec_die" and processed.set())
+    try:
+        monitor.start()
+        # the first events seen for a container which was started before we subscribed
+        client.stream.send("a", "exec_start: /bin/sh -c true")
+        client.stream.send("a", "exec_die", exitCode="0")
+        assert processed.wait(5)
+        states = monitor.wait_for(["a"], lambda s: s.status == "running", timeout=1)
+        assert states["a"].status == "running"
+    finally:
+        monitor.stop()
+
+
+def test_wait_for_healthy_first_seen_via_health_event():
+    client = FakeClient({"a": "running"})
+    client.health["a"] = "starting"
+    monitor = DockerEventMonitor(client=client)
+    flexmock(docker_container).should_receive("get_event_monitor").and_return(monitor)
+    image = DockerImage("fedora", identifier="sha256:1234",
+                        pull_policy=DockerImagePullPolicy.NEVER)
+    container = docker_container.DockerContainer(image, "a")
+    container.d = client
+    processed = threading.Event()
+    monitor.add_callback(
+        lambda cid, event: event["Action"].startswith("health_status") and processed.set())
+    try:
+        monitor.start()
+        # the healthcheck runs as an exec, these are the first events of the container
+        client.stream.send("a", "exec_start: /bin/sh -c true")
+        client.stream.send("a", "health_status: starting")
+        assert processed.wait(5)
+
+        def become_healthy():
+            client.health["a"] = "healthy"
+            client.stream.send("a", "health_status: healthy")
+        threading.Timer(0.2, become_healthy).start()
+        assert container.wait_for_healthy(timeout=5)
+    finally:
+        monitor.stop()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+from __future__ import print_function, unicode_literals
+
+from socket import socketpair
+import struct
+import subprocess
+import threading
+
+import pytest
+
+from conu import ConuException
+from conu.backend.docker.exec_session import DockerExecSession
+from conu.utils.exec_session import ProcessExecSession
+
+
+class FakeAPIClient(object):
+    """ exec API backed by a local shell, its output is sent in docker frames """
+
+    def exec_create(self, container_id, cmd, **kwargs):
+        self.cmd = cmd
+        return {"Id": "1234"}
+
+    def exec_start(self, exec_id, socket=False):
+        ours, theirs = socketpair()
+        process = subprocess.Popen(self.cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   bufsize=0)
+
+        def forward_stdin():
+            while True:
+                data = theirs.recv(4096)
+                if not data:
+                    process.stdin.close()
+                    return
+                process.stdin.write(data)
+
+        def forward_stdout():
+            while True:
+                # small frames, so the output is split into many of them
+                data = process.stdout.read(7)
+                if not data:
+                    theirs.close()
+                    return
+                theirs.sendall(struct.pack(">BxxxL", 1, len(data)) + data)
+
+        for fnc in (forward_stdin, forward_stdout):
+            t = threading.Thread(target=fnc)
+            t.daemon = True
+            t.start()
+        return ours
+
+
+@pytest.fixture(params=["process", "docker"])
+def session(request):
+    if request.param == "process":
+        s = ProcessExecSession(["/bin/sh"])
+    else:
+        s = DockerExecSession(FakeAPIClient(), "c0ffee")
+    yield s
+    s.close()
+
+
+def test_session(session):
+    assert session.run(["echo", "hello world"]) == (0, "hello world\n")
+    assert session.run(["printf", "no newline"]) == (0, "no newline")
+    assert session.run("echo out; echo err >&2; exit_code=3; (exit $exit_code)") == \
+        (3, "out\nerr\n")
+    assert session.last_exit_code == 3
+    # stdin of the commands is not the stream of the commands
+    assert session.run(["cat"]) == (0, "")
+    # state of the shell is kept
+    session.execute("cd /tmp")
+    assert session.execute(["pwd"]) == "/tmp\n"
+    for i in range(100):
+        assert session.execute(["echo", str(i)]) == "%d\n" % i
+    with pytest.raises(ConuException):
+        session.execute(["false"])
+
+
+def test_session_exit():
+    s = ProcessExecSession(["/bin/sh"])
+    with pytest.raises(ConuException):
+        s.run("exit 1")
+    s.close()
+    with pytest.raises(ConuException):
+        s.run(["true"])
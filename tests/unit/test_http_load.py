@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+from __future__ import print_function, unicode_literals
+
+import threading
+
+import pytest
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler
+from six.moves.socketserver import ThreadingMixIn, TCPServer
+
+from conu import ConuException
+from conu.utils import http_load
+from conu.utils.http_load import LatencySamples, run_http_load
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        status = 404 if self.path == "/missing" else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+@pytest.fixture()
+def server():
+    s = Server(("127.0.0.1", 0), Handler)
+    t = threading.Thread(target=s.serve_forever)
+    t.daemon = True
+    t.start()
+    yield s
+    s.shutdown()
+    s.server_close()
+
+
+def test_run_http_load(server):
+    port = server.server_address[1]
+    result = run_http_load("127.0.0.1", port, concurrency=4, requests=200)
+    assert result.requests == 200
+    assert result.errors == 0
+    assert result.throughput > 0
+    p = result.latency_percentiles()
+    assert 0 < p[50] <= p[90] <= p[99]
+
+    result = run_http_load("127.0.0.1", port, path="/missing", concurrency=2, duration=0.3)
+    assert result.requests > 0
+    assert result.errors == result.requests
+    assert result.error_counts == {404: result.requests}
+
+    with pytest.raises(ConuException):
+        run_http_load("127.0.0.1", port)
+
+
+@pytest.mark.parametrize("has_numpy", [True, False])
+def test_latency_percentiles(has_numpy, monkeypatch):
+    if has_numpy and not http_load.HAS_NUMPY:
+        pytest.skip("numpy is not installed")
+    monkeypatch.setattr(http_load, "HAS_NUMPY", has_numpy)
+    samples = LatencySamples()
+    for value in range(1, 102):
+        samples.add(float(value))
+    assert samples.percentiles([0, 50, 99.5, 100]) == {0: 1.0, 50: 51.0, 99.5: 100.5,
+                                                       100: 101.0}
+    assert samples.mean() == 51.0
+    assert LatencySamples().percentiles([50]) == {50: None}
+
+
+def test_latency_samples_bounded():
+    samples = LatencySamples(max_samples=100)
+    for value in range(10000):
+        samples.add(float(value))
+    assert len(samples) == 100
+    assert samples.count == 10000
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+from __future__ import print_function, unicode_literals
+
+import threading
+import time
+
+import pytest
+from flexmock import flexmock
+
+from conu import ConuException
+from conu.apidefs.backend import Backend
+from conu.apidefs.image import Image
+from conu.backend.podman.image import PodmanImage, PodmanImagePullPolicy
+
+
+class FakeBackend(Backend):
+    def __init__(self, present):
+        super(FakeBackend, self).__init__()
+        self.present = present
+        self.listings = 0
+
+    def _get_present_images(self):
+        self.listings += 1
+        return self.present
+
+
+def test_lazy_pull_policy():
+    flexmock(PodmanImage).should_receive("is_present").never()
+    flexmock(PodmanImage).should_receive("pull").never()
+    images = [PodmanImage("fedora", tag=str(v), lazy=True) for v in range(30, 40)]
+    assert all(i._pull_policy_pending for i in images)
+
+
+def test_ensure_present():
+    present = set("fedora:%s" % v for v in range(30, 38))
+    images = [PodmanImage("fedora", tag=str(v), lazy=True) for v in range(30, 40)]
+    images.append(PodmanImage("fedora", tag="40", lazy=True,
+                              pull_policy=PodmanImagePullPolicy.NEVER))
+    flexmock(PodmanImage).should_receive("is_present").and_return(False).times(2)
+    flexmock(PodmanImage).should_receive("pull").times(2)
+
+    backend = FakeBackend(present)
+    backend.ensure_present(images)
+    assert backend.listings == 1
+    assert not any(i._pull_policy_pending for i in images)
+
+    # the policy is applied only once
+    backend.ensure_present(images)
+    assert backend.listings == 1
+
+
+class FakeContainer(object):
+    def __init__(self, ready_at):
+        self.ready_at = ready_at
+        self.running = False
+        self.deleted = False
+
+    def start(self):
+        self.running = True
+
+    def delete(self, force=False):
+        self.deleted = True
+
+
+class FakeImage(Image):
+    def __init__(self, delay=0.1, fail_at=None):
+        super(FakeImage, self).__init__("fedora")
+        self.delay = delay
+        self.fail_at = fail_at
+        self.started = []
+        self.lock = threading.Lock()
+
+    def run_via_api(self, container_params):
+        time.sleep(self.delay)
+        with self.lock:
+            if len(self.started) == self.fail_at:
+                raise ConuException("can't start the container")
+            container = FakeContainer(time.time() + 0.1 * len(self.started))
+            self.started.append(container)
+        return container
+
+
+def test_run_many():
+    image = FakeImage()
+    start = time.time()
+    containers = image.run_many(6, max_parallel=3)
+    assert time.time() - start < 0.5
+    assert len(containers) == 6
+    assert all(c.running for c in containers)
+
+    ready_order = list(image.run_many(4, ready=lambda c: time.time() >= c.ready_at,
+                                      as_completed=True))
+    assert ready_order == sorted(ready_order, key=lambda c: c.ready_at)
+
+
+def test_run_many_failure():
+    image = FakeImage(fail_at=2)
+    with pytest.raises(ConuException):
+        image.run_many(5, max_parallel=2)
+    assert image.started and all(c.deleted for c in image.started)
+
+    image = FakeImage()
+    with pytest.raises(ConuException):
+        image.run_many(3, ready=lambda c: False, timeout=0.3)
+    assert all(c.deleted for c in image.started)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+"""
+`import conu` should stay cheap: backends and their SDKs are loaded on first access
+"""
+from __future__ import print_function, unicode_literals
+
+import subprocess
+import sys
+
+import pytest
+
+
+HEAVY_MODULES = ("docker", "kubernetes", "requests", "yaml")
+
+
+def run_python(code, *options):
+    return subprocess.run([sys.executable] + list(options) + ["-c", code],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+
+
+def loaded_modules(statement):
+    code = "import sys; %s; print(' '.join(m for m in %r if m in sys.modules))" % (
+        statement, HEAVY_MODULES)
+    return run_python(code).stdout.split()
+
+
+@pytest.mark.parametrize("statement", [
+    "import conu",
+    "from conu import Probe, ProbeTimeout, ConuException, run_cmd",
+    "import conu.utils.probes",
+])
+def test_no_heavy_imports(statement):
+    assert loaded_modules(statement) == []
+
+
+def test_importtime_has_no_heavy_modules():
+    # `-X importtime` lists every module imported by the interpreter on stderr as
+    # "import time: self [us] | cumulative | <indented module name>"
+    stderr = run_python("import conu", "-X", "importtime").stderr
+    imported = [line.rsplit("|", 1)[1].strip() for line in stderr.splitlines()
+                if line.startswith("import time:") and "|" in line]
+    assert "conu" in imported
+    heavy = [m for m in imported if m.split(".")[0] in HEAVY_MODULES]
+    assert heavy == []
+
+
+def test_podman_backend_without_sdks():
+    assert loaded_modules("from conu import PodmanBackend") == []
+    assert "kubernetes" not in loaded_modules("from conu import DockerBackend")
+
+
+def test_lazy_attributes():
+    import conu
+    assert conu.DockerBackend.__module__ == "conu.backend.docker.backend"
+    assert conu.CleanupPolicy.NOTHING
+    assert "K8sBackend" in dir(conu)
+    assert set(conu.__all__) <= set(dir(conu))
+    with pytest.raises(AttributeError):
+        conu.DoesNotExist
@@ -8,6 +8,14 @@
 Tests for Kubernetes backend
 """
 
+import pytest
+from flexmock import flexmock
+from kubernetes.client import V1ListMeta, V1ObjectMeta, V1Pod, V1PodList, V1PodSpec
+
+import conu.backend.k8s.client as k8s_client
+import conu.backend.origin.backend as origin_backend
+from conu import ConuException, ProbeTimeout
+from conu.backend.k8s.backend import K8sBackend
 from conu.backend.k8s.utils import k8s_ports_to_metadata_ports, metadata_ports_to_k8s_ports
 
 
@@ -17,3 +25,59 @@ def test_port_conversion():
     k8s_ports = metadata_ports_to_k8s_ports(test_ports)
 
     assert test_ports == k8s_ports_to_metadata_ports(k8s_ports)
+
+
+class FakeCoreApi(object):
+    """ serves pods in pages of two items """
+
+    def __init__(self, names):
+        self.names = names
+        self.calls = []
+
+    def list_namespaced_pod(self, namespace, **kwargs):
+        self.calls.append((namespace, kwargs))
+        start = int(kwargs.get("_continue") or 0)
+        end = start + 2
+        items = [V1Pod(metadata=V1ObjectMeta(name=n, namespace=namespace), spec=V1PodSpec(
+            containers=[])) for n in self.names[start:end]]
+        _continue = str(end) if end < len(self.names) else None
+        return V1PodList(items=items, metadata=V1ListMeta(_continue=_continue))
+
+    def list_pod_for_all_namespaces(self, **kwargs):
+        raise AssertionError("pods are listed in a single namespace")
+
+
+def test_iter_pods(monkeypatch):
+    api = FakeCoreApi(["a", "b", "c"])
+    monkeypatch.setattr(k8s_client, "core_api", api)
+    monkeypatch.setattr(k8s_client, "apps_api", object())
+    backend = K8sBackend()
+
+    pods = backend.iter_pods(namespace="ns", label_selector={"app": "db", "tier": None})
+    assert next(pods).name == "a"
+    # the next page is not requested until it's needed
+    assert len(api.calls) == 1
+    assert [p.name for p in pods] == ["b", "c"]
+
+    assert len(api.calls) == 2
+    assert api.calls[0] == ("ns", {"watch": False, "limit": 500,
+                                   "label_selector": "app=db,tier"})
+    assert api.calls[1][1]["_continue"] == "2"
+
+
+def test_openshift_service_port(monkeypatch):
+    monkeypatch.setattr(k8s_client, "core_api", object())
+    monkeypatch.setattr(k8s_client, "apps_api", object())
+    backend = origin_backend.OpenshiftBackend(project="ns")
+    service = flexmock(name="app", get_ip=lambda: "172.30.0.1")
+    flexmock(backend).should_receive("list_services").and_return([service])
+
+    # a single attempt, request_service is retried by callers
+    flexmock(origin_backend).should_receive("check_port").with_args(
+        8080, host="172.30.0.1").and_return(False).once()
+    assert not backend.request_service("app", "8080")
+
+    flexmock(origin_backend).should_receive("wait_for_ports").with_args(
+        [("172.30.0.1", 8080)], timeout=3).and_raise(ProbeTimeout("closed")).once()
+    with pytest.raises(ConuException):
+        backend.wait_for_service("app", 8080, timeout=3)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+"""
+Tests for lazy metadata objects
+"""
+
+from __future__ import print_function, unicode_literals
+
+import copy
+import time
+import tracemalloc
+
+import pytest
+
+from conu.apidefs.metadata import ContainerMetadata, ContainerStatus
+from conu.backend.docker.utils import (DockerContainerMetadata, DockerImageMetadata,
+                                       inspect_to_container_metadata, inspect_to_metadata)
+
+
+CONTAINER_INSPECT = {
+    "Id": "a3c2463d82da24e9442fc097dddaa5f800df7129",
+    "Name": "/pensive_euler",
+    "Created": "2019-03-12T10:46:42.5468215Z",
+    "Image": "sha256:8f0e66c924c0c169352de487a3c2463d82da24e9442fc097dddaa5f800df7129",
+    "State": {"Status": "running", "ExitCode": 0},
+    "Config": {
+        "Hostname": "a3c2463d82da",
+        "Env": ["DISTTAG=f29container", "FGC=f29", "EMPTY"],
+        "Cmd": ["python3", "-m", "http.server"],
+        "Labels": {"app": "web"},
+        "ExposedPorts": {"8000/tcp": {}},
+    },
+    "HostConfig": {"PortBindings": {"8000/tcp": [{"HostIp": "", "HostPort": "8080"}]}},
+    "NetworkSettings": {"Networks": {"bridge": {"IPAddress": "172.17.0.2",
+                                                "GlobalIPv6Address": ""}}},
+}
+
+IMAGE_INSPECT = {
+    "Id": "sha256:8f0e66c924c0c169352de487a3c2463d82da24e9442fc097dddaa5f800df7129",
+    "RepoTags": ["fedora:29"],
+    "RepoDigests": ["fedora@sha256:1234"],
+    "Created": "2019-03-01T10:00:00Z",
+    "Config": {"Env": ["FGC=f29"], "Cmd": ["/bin/bash"], "Labels": None},
+}
+
+CONTAINER_ATTRIBUTES = ["identifier", "name", "labels", "command", "creation_timestamp",
+                        "env_variables", "exposed_ports", "port_mappings", "hostname",
+                        "ipv4_addresses", "ipv6_addresses", "status"]
+
+
+class FakeImage(object):
+    identifier = None
+
+
+def test_lazy_container_metadata():
+    eager = inspect_to_container_metadata(ContainerMetadata(), CONTAINER_INSPECT, FakeImage())
+    image = FakeImage()
+    lazy = DockerContainerMetadata(CONTAINER_INSPECT, image)
+
+    assert image.identifier == "8f0e66c924c0c169352de487a3c2463d82da24e9442fc097dddaa5f800df7129"
+    assert lazy.image is image
+    for attr in CONTAINER_ATTRIBUTES:
+        assert getattr(lazy, attr) == getattr(eager, attr), attr
+    assert lazy.status == ContainerStatus.RUNNING
+    assert lazy.port_mappings == {"8000/tcp": [8080]}
+    assert lazy.env_variables == {"DISTTAG": "f29container", "FGC": "f29"}
+
+    # attributes can be overridden and the object can be reloaded
+    lazy.hostname = "set"
+    assert lazy.hostname == "set"
+    changed = copy.deepcopy(CONTAINER_INSPECT)
+    changed["State"]["Status"] = "exited"
+    inspect_to_container_metadata(lazy, changed, image)
+    assert lazy.status == ContainerStatus.NOT_RUNNING
+    assert lazy.hostname == "a3c2463d82da"
+
+
+def test_lazy_image_metadata():
+    lazy = DockerImageMetadata(IMAGE_INSPECT)
+    assert lazy.identifier == "8f0e66c924c0c169352de487a3c2463d82da24e9442fc097dddaa5f800df7129"
+    assert lazy.name == "fedora:29"
+    assert lazy.digest == "fedora@sha256:1234"
+    assert lazy.env_variables == {"FGC": "f29"}
+    assert lazy.exposed_ports == []
+    assert lazy.raw is IMAGE_INSPECT
+    assert inspect_to_metadata(lazy, {"Id": "123"}) is lazy
+    assert lazy.name is None
+    assert lazy.identifier == "123"
+
+
+def test_metadata_extra_attributes():
+    # slots don't prevent setting other attributes
+    metadata = DockerContainerMetadata(CONTAINER_INSPECT, FakeImage())
+    metadata.custom = 1
+    assert metadata.custom == 1
+
+
+class RecordingDict(dict):
+    """ inspect data which remember which of their keys were read """
+
+    def __init__(self, *args):
+        super(RecordingDict, self).__init__(*args)
+        self.accessed = set()
+
+    def __getitem__(self, key):
+        self.accessed.add(key)
+        return super(RecordingDict, self).__getitem__(key)
+
+
+def test_lazy_fields_decoded_on_access():
+    raw = RecordingDict(copy.deepcopy(CONTAINER_INSPECT))
+    metadata = DockerContainerMetadata(raw, FakeImage())
+    # only the image ID is read when the object is created
+    assert raw.accessed == {"Image"}
+    for name in ("name", "env_variables", "port_mappings", "ipv4_addresses", "status"):
+        with pytest.raises(AttributeError):
+            # the slot is empty, nothing was decoded
+            DockerContainerMetadata.__dict__[name].slot.__get__(metadata)
+
+    assert metadata.identifier == CONTAINER_INSPECT["Id"]
+    assert raw.accessed == {"Image", "Id"}
+
+    assert metadata.env_variables["FGC"] == "f29"
+    assert raw.accessed == {"Image", "Id", "Config"}
+    # the decoded value is stored
+    assert DockerContainerMetadata.__dict__["env_variables"].slot.__get__(metadata) \
+        is metadata.env_variables
+
+
+@pytest.mark.benchmark
+def test_benchmark_list_10k_containers():
+    """
+    compare eager and lazy processing of 10k listed containers where only the identifier
+    is read; deselected by default, run it with `make benchmark`
+    """
+    payloads = []
+    for i in range(10000):
+        payload = copy.deepcopy(CONTAINER_INSPECT)
+        payload["Id"] = "%040d" % i
+        payloads.append(payload)
+
+    def measure(build):
+        tracemalloc.start()
+        start = time.process_time()
+        objects = [build(p) for p in payloads]
+        ids = [o.identifier for o in objects]
+        cpu_time = time.process_time() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert ids == [p["Id"] for p in payloads]
+        return peak, cpu_time
+
+    eager_peak, eager_cpu_time = measure(
+        lambda p: inspect_to_container_metadata(ContainerMetadata(), p, FakeImage()))
+    lazy_peak, lazy_cpu_time = measure(lambda p: DockerContainerMetadata(p, FakeImage()))
+    print("eager: peak %d kB, CPU %.3f s; lazy: peak %d kB, CPU %.3f s" % (
+        eager_peak / 1024, eager_cpu_time, lazy_peak / 1024, lazy_cpu_time))
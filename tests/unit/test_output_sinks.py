@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright Contributors to the Conu project.
+# SPDX-License-Identifier: MIT
+#
+
+from __future__ import print_function, unicode_literals
+
+import io
+import logging
+import subprocess
+
+import pytest
+from flexmock import flexmock
+
+from conu import ConuException, DockerImage, DockerImagePullPolicy
+from conu.backend.docker.container import DockerContainer
+from conu.utils import output_sinks
+from conu.utils.output_sinks import (CallbackSink, DiscardSink, FileSink, LineLogger,
+                                     OutputPump, RingBufferSink, stream_cmd)
+
+
+def test_ring_buffer():
+    sink = RingBufferSink(size=8)
+    sink.write(b"abc")
+    assert sink.getvalue() == b"abc"
+    assert not sink.truncated
+    sink.write(b"defghij")
+    assert sink.getvalue() == b"cdefghij"
+    sink.write(b"0123456789")
+    assert sink.getvalue() == b"23456789"
+    assert sink.total == 20
+    assert sink.truncated
+
+
+def test_file_and_callback_sinks(tmpdir):
+    path = str(tmpdir.join("output"))
+    with FileSink(path) as sink:
+        sink.write(b"hello ")
+        sink.write(b"world")
+    with open(path, "rb") as f:
+        assert f.read() == b"hello world"
+
+    chunks = []
+    sink = CallbackSink(chunks.append)
+    sink.write(b"a")
+    sink.write(b"b")
+    assert chunks == [b"a", b"b"]
+
+
+def test_line_logger(caplog):
+    flexmock(output_sinks.time).should_receive("time").and_return(1000.0)
+    log = logging.getLogger("conu.test")
+    line_logger = LineLogger(level=logging.INFO, max_lines_per_second=2, log=log)
+    with caplog.at_level(logging.INFO, logger="conu.test"):
+        line_logger.write(b"one\ntw")
+        line_logger.write(b"o\nthree\nfour\nfive")
+        line_logger.flush()
+    messages = [r.getMessage() for r in caplog.records]
+    assert messages == ["one", "two", "(3 lines of output were not logged)"]
+
+
+def test_pump_logs_streams_separately(caplog):
+    stdout, stderr = RingBufferSink(), RingBufferSink()
+    pump = OutputPump(stdout, stderr)
+    with caplog.at_level(logging.INFO, logger="conu.utils.output_sinks"):
+        pump.write(b"progress: 1")
+        pump.write(b"warning\n", stderr=True)
+        pump.write(b"0%\n")
+        pump.close()
+    assert [r.getMessage() for r in caplog.records] == ["warning", "progress: 10%"]
+
+
+def test_stream_cmd():
+    stdout, stderr = RingBufferSink(size=16), RingBufferSink()
+    cmd = ["sh", "-c", "seq 1 10000; echo oops >&2"]
+    assert stream_cmd(cmd, stdout, stderr_sink=stderr, log_output=False) == 0
+    assert stdout.getvalue() == b"9998\n9999\n10000\n"
+    assert stderr.getvalue() == b"oops\n"
+
+    merged = DiscardSink()
+    stream_cmd(cmd, merged)
+    assert merged.size == stdout.total + stderr.total
+
+    with pytest.raises(subprocess.CalledProcessError):
+        stream_cmd(["false"], DiscardSink())
+    assert stream_cmd(["false"], DiscardSink(), ignore_status=True) == 1
+
+
+class FakeExecAPIClient(object):
+    def __init__(self, exit_code=0):
+        self.exit_code = exit_code
+
+    def exec_create(self, container_id, cmd, **kwargs):
+        return {"Id": "1234"}
+
+    def exec_start(self, exec_id, stream=False, demux=False):
+        assert stream
+        frames = [(b"out\n", None), (None, b"err\n"), (b"out again\n", None)]
+        if demux:
+            return iter(frames)
+        return iter(o or e for o, e in frames)
+
+    def exec_inspect(self, exec_id):
+        return {"ExitCode": self.exit_code}
+
+
+def test_docker_execute():
+    image = DockerImage("fedora", identifier="sha256:1234",
+                        pull_policy=DockerImagePullPolicy.NEVER)
+    container = DockerContainer(image, "c0ffee")
+    container.d = FakeExecAPIClient()
+
+    assert container.execute(["ls"]) == [b"out\n", b"err\n", b"out again\n"]
+
+    stdout, stderr = RingBufferSink(), RingBufferSink()
+    assert container.execute(["ls"], sink=stdout, stderr_sink=stderr) is stdout
+    assert stdout.getvalue() == b"out\nout again\n"
+    assert stderr.getvalue() == b"err\n"
+
+    f = io.BytesIO()
+    container.execute(["ls"], sink=FileSink(f), log_output=False)
+    assert f.getvalue() == b"out\nerr\nout again\n"
+
+    container.d = FakeExecAPIClient(exit_code=2)
+    with pytest.raises(ConuException):
+        container.execute(["ls"], sink=DiscardSink())
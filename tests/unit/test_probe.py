@@ -6,8 +6,13 @@
 import logging
 import time
 
-from conu import Probe, ProbeTimeout, CountExceeded
+from conu import (
+    Probe, ProbeGroup, ProbeMode, ProbeTimeout, CountExceeded,
+    ExponentialBackoff, DecorrelatedJitter, FastStart
+)
 from conu.apidefs.backend import set_logging
+from conu.exceptions import ConuException
+from conu.utils.probe_stats import AdaptiveSchedule, ProbeStatistics
 
 import pytest
 
@@ -169,3 +174,169 @@ class TestProbe(object):
 
         for p in pool:
             assert not p.is_alive()
+
+    @pytest.mark.parametrize("mode", [ProbeMode.INLINE, ProbeMode.THREAD, ProbeMode.PROCESS])
+    def test_modes(self, mode):
+        probe = Probe(timeout=5, pause=0.1, fnc=snoozer, seconds=0.1, mode=mode)
+        assert probe.run()
+
+        probe = Probe(timeout=5, count=2, pause=0.1, fnc=lambda: False, mode=mode)
+        with pytest.raises(CountExceeded):
+            probe.run()
+
+        probe = Probe(timeout=1, pause=0.2, expected_exceptions=ValueError,
+                      fnc=value_err_raise, mode=mode)
+        with pytest.raises(ProbeTimeout):
+            probe.run()
+
+        probe = Probe(timeout=1, pause=0.2, fnc=value_err_raise, mode=mode)
+        with pytest.raises(ValueError):
+            probe.run()
+
+    def test_thread_mode_is_quick(self):
+        calls = []
+
+        def third_time_lucky():
+            calls.append(1)
+            return len(calls) == 3
+
+        # the state of the function is shared with the caller: no process is forked
+        start = time.time()
+        probe = Probe(timeout=5, pause=0.01, fnc=third_time_lucky)
+        assert probe.run()
+        assert len(calls) == 3
+        assert (time.time() - start) < 0.5
+
+    def test_thread_mode_abandons_attempt(self):
+        start = time.time()
+        probe = Probe(timeout=0.5, pause=0.1, fnc=snoozer, seconds=5, mode=ProbeMode.THREAD)
+        with pytest.raises(ProbeTimeout):
+            probe.run()
+        assert (time.time() - start) < 2, "Probe should not wait for the running function"
+
+    def test_wrong_mode(self):
+        with pytest.raises(ConuException):
+            Probe(mode="thread")
+
+
+class TestProbeGroup(object):
+    def test_wait_all(self):
+        start = time.time()
+        group = ProbeGroup([Probe(timeout=5, pause=0.1, fnc=snoozer, seconds=0.5)
+                            for _ in range(20)], workers=20)
+        assert group.wait_all()
+        assert (time.time() - start) < 3, "Probes should be evaluated concurrently"
+
+        group = ProbeGroup([
+            Probe(timeout=5, pause=0.1, fnc=snoozer, seconds=0.1),
+            Probe(timeout=5, pause=0.1, fnc=value_err_raise),
+        ])
+        with pytest.raises(ValueError):
+            group.wait_all()
+
+    def test_wait_any(self):
+        fast = Probe(timeout=5, pause=0.1, fnc=snoozer, seconds=0.1)
+        slow = Probe(timeout=5, pause=0.1, fnc=snoozer, seconds=2)
+        start = time.time()
+        assert ProbeGroup([slow, fast]).wait_any() is fast
+        assert (time.time() - start) < 1.5
+
+        group = ProbeGroup([
+            Probe(timeout=0.5, pause=0.1, fnc=lambda: False),
+            Probe(timeout=5, count=2, pause=0.1, fnc=lambda: False),
+        ])
+        with pytest.raises((ProbeTimeout, CountExceeded)):
+            group.wait_any()
+
+    def test_as_completed(self):
+        lie = Probe(timeout=0.5, pause=0.1, fnc=lambda: "nope")
+        counted = Probe(timeout=5, count=3, pause=0.1, fnc=lambda: False)
+        hanging = Probe(timeout=0.5, pause=0.1, fnc=snoozer, seconds=10)
+        truth = Probe(timeout=5, pause=0.1, fnc=lambda: MESSAGE, expected_retval=MESSAGE)
+        ignored = Probe(timeout=0.5, pause=0.1, expected_exceptions=ValueError,
+                        fnc=value_err_raise)
+
+        start = time.time()
+        results = dict(ProbeGroup([lie, counted, hanging, truth, ignored]).as_completed())
+        assert (time.time() - start) < 3, "Hanging attempt should be abandoned"
+        assert results[truth] is None
+        assert isinstance(results[lie], ProbeTimeout)
+        assert isinstance(results[hanging], ProbeTimeout)
+        assert isinstance(results[ignored], ProbeTimeout)
+        assert isinstance(results[counted], CountExceeded)
+
+    def test_process_mode_rejected(self):
+        with pytest.raises(ConuException):
+            ProbeGroup([Probe(mode=ProbeMode.PROCESS)])
+
+
+def take(schedule, n):
+    pauses = schedule.pauses()
+    return [next(pauses) for _ in range(n)]
+
+
+def test_exponential_backoff():
+    assert take(ExponentialBackoff(initial=0.1, factor=2, maximum=0.5), 5) == \
+        [0.1, 0.2, 0.4, 0.5, 0.5]
+
+
+def test_decorrelated_jitter():
+    pauses = take(DecorrelatedJitter(base=0.1, maximum=1), 100)
+    assert all(0.1 <= p <= 1 for p in pauses)
+    assert len(set(pauses)) > 1
+
+
+def test_fast_start():
+    assert take(FastStart(fast_pause=0.01, fast_count=3, factor=10, maximum=0.5), 6) == \
+        [0.01, 0.01, 0.01, 0.1, 0.5, 0.5]
+
+
+@pytest.mark.parametrize("mode", [ProbeMode.INLINE, ProbeMode.THREAD, ProbeMode.PROCESS])
+def test_probe_with_schedule(mode):
+    start = time.time()
+    probe = Probe(timeout=5, count=4, pause=ExponentialBackoff(initial=0.05, maximum=0.2),
+                  fnc=lambda: False, mode=mode)
+    with pytest.raises(CountExceeded):
+        probe.run()
+    assert (time.time() - start) < 2
+
+    probe = Probe(timeout=1, pause=FastStart(), fnc=lambda: False, mode=mode)
+    with pytest.raises(ProbeTimeout):
+        probe.run()
+
+    group = ProbeGroup([Probe(timeout=5, count=3, pause=DecorrelatedJitter(maximum=0.2),
+                              fnc=lambda: False)])
+    with pytest.raises(CountExceeded):
+        group.wait_all()
+
+
+def test_adaptive_schedule(tmpdir):
+    path = str(tmpdir.join("stats.json"))
+    stats = ProbeStatistics(path=path)
+    schedule = AdaptiveSchedule("123abc", "kind", statistics=stats, dense_pause=0.01,
+                                min_samples=2, fallback=ExponentialBackoff(initial=0.3))
+
+    # not enough data, fallback is used
+    assert take(schedule, 2) == [0.3, 0.6]
+
+    ready_at = time.time() + 0.3
+    probe = Probe(timeout=5, pause=schedule, fnc=lambda: time.time() > ready_at)
+    assert probe.run()
+    samples = ProbeStatistics(path=path).get_samples(ProbeStatistics.get_key("123abc", "kind"))
+    assert len(samples) == 1
+    assert 0.3 <= samples[0] < 1.0
+
+    schedule.record(0.5)
+    pauses = take(schedule, 3)
+    # sleep until shortly before the expected time, then poll densely
+    assert 0.2 < pauses[0] < 0.5
+    assert pauses[1:] == [0.01, 0.01]
+
+    # statistics survive across sessions
+    stats = ProbeStatistics(path=path, max_samples=2)
+    assert len(stats.get_samples(schedule.key)) == 2
+    stats.record(schedule.key, 1)
+    stats.record(schedule.key, 2)
+    assert stats.get_samples(schedule.key) == [1, 2]
+    stats.clear()
+    assert ProbeStatistics(path=path).get_samples(schedule.key) == []
@@ -6,14 +6,24 @@
 from __future__ import print_function, unicode_literals
 
 import os
+import shutil
+import socket
 import subprocess
+import threading
+import time
 
 import pytest
 
-from conu import ConuException, random_str, Directory
-from conu.utils import graceful_get
+from conu import ConuException, ProbeTimeout, random_str, Directory
+from conu.utils import (graceful_get, iter_open_ports, wait_for_ports, make_filters,
+                        filters_to_cli_options, make_label_selector,
+                        CommandDoesNotExistException)
+from conu.utils.capabilities import CapabilityRegistry
 from conu.utils.filesystem import Volume
-from conu.utils.http_client import get_url
+from conu.utils.http_client import (configure_http_session, get_http_session, get_url,
+                                    new_http_session)
+from conu.apidefs.container import Container
+from conu.apidefs.image import Image
 
 
 def test_random_str():
@@ -134,6 +144,53 @@ def test_graceful_get():
     assert graceful_get({"a": [{1: 2}, {"b": "c"}]}, "a", 1, "b") == "c"
 
 
+def _listen(port=0):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", port))
+    sock.listen(5)
+    return sock
+
+
+def _free_port():
+    sock = _listen()
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_wait_for_ports():
+    servers = [_listen() for _ in range(20)]
+    late_port = _free_port()
+    late_servers = []
+    threading.Timer(0.5, lambda: late_servers.append(_listen(late_port))).start()
+    endpoints = [("127.0.0.1", s.getsockname()[1]) for s in servers] + [("127.0.0.1", late_port)]
+    try:
+        start = time.time()
+        opened = list(iter_open_ports(endpoints, timeout=10, pause=0.05))
+        assert time.time() - start < 5
+        assert sorted(opened) == sorted(endpoints)
+        # the port which was opened last is reported last
+        assert opened[-1] == ("127.0.0.1", late_port)
+    finally:
+        for s in servers + late_servers:
+            s.close()
+
+
+def test_wait_for_ports_timeout():
+    server = _listen()
+    closed_port = _free_port()
+    try:
+        start = time.time()
+        with pytest.raises(ProbeTimeout) as ex:
+            wait_for_ports([("127.0.0.1", server.getsockname()[1]), ("127.0.0.1", closed_port)],
+                           timeout=0.5, pause=0.05)
+        assert time.time() - start < 2
+        assert str(closed_port) in str(ex.value)
+    finally:
+        server.close()
+
+
 def test_http_client_get_url():
     assert get_url(path="/", host="172.1.1.1", port=80) == "http://172.1.1.1:80/"
     assert get_url(path="/app",
@@ -174,3 +231,114 @@ def test_volume_init(source, target, mode, result):
 ])
 def test_volume_init_raw(instance, result):
     assert str(instance) == result
+
+
+def test_filters():
+    filters = make_filters(label={"app": "db", "conu.test_artifact": None}, name=None,
+                           status="running", ancestor=["fedora", "centos"])
+    assert filters == {"label": ["app=db", "conu.test_artifact"], "status": ["running"],
+                       "ancestor": ["fedora", "centos"]}
+    assert filters_to_cli_options(filters) == [
+        "--filter", "ancestor=fedora", "--filter", "ancestor=centos",
+        "--filter", "label=app=db", "--filter", "label=conu.test_artifact",
+        "--filter", "status=running"]
+    assert make_label_selector(["app=db", "tier"]) == "app=db,tier"
+    assert make_label_selector("app=db") == "app=db"
+    assert make_label_selector(None) is None
+
+
+class EndpointContainer(Container):
+    def __init__(self):
+        super(EndpointContainer, self).__init__(Image("fake"), "123", "fake")
+        self.resolved = 0
+
+    def get_IPv4s(self):
+        self.resolved += 1
+        return ["127.0.0.1"]
+
+    def get_ports(self):
+        self.resolved += 1
+        return [8080]
+
+
+def test_shared_http_session():
+    configure_http_session(pool_size=2, keep_alive=False, retries=3)
+    try:
+        session = get_http_session()
+        assert session is get_http_session()
+        assert session.headers["Connection"] == "close"
+        assert session.get_adapter("http://localhost").max_retries.total == 3
+
+        container = EndpointContainer()
+        own = container.http_session
+        assert own is container.http_session
+        assert own is not session
+        assert own.get_adapter("http://localhost") is session.get_adapter("http://x")
+        assert own.headers["Connection"] == "close"
+        # headers of one container don't leak into others
+        own.headers["Authorization"] = "Bearer secret"
+        assert "Authorization" not in session.headers
+        assert "Authorization" not in EndpointContainer().http_session.headers
+        assert "Authorization" not in new_http_session().headers
+        assert container.get_http_endpoint() == ("127.0.0.1", 8080)
+        assert container.get_http_endpoint(port=80) == ("127.0.0.1", 80)
+        assert container.resolved == 2
+        container.invalidate_http_endpoint()
+        with container.http_client() as client:
+            assert (client.host, client.port) == ("127.0.0.1", 8080)
+            # connections are pooled by the shared session
+            assert client.get_adapter("http://localhost") is session.get_adapter("http://x")
+        assert container.resolved == 4
+    finally:
+        configure_http_session()
+    assert get_http_session() is not session
+
+
+def test_capability_registry(tmpdir):
+    path = str(tmpdir.join("capabilities.json"))
+    registry = CapabilityRegistry(path=path, ttl=60)
+    calls = []
+
+    def probe():
+        calls.append(1)
+        return len(calls)
+
+    assert registry.get("x", probe) == 1
+    assert registry.get("x", probe) == 1
+    # another process reads the value from disk
+    assert CapabilityRegistry(path=path, ttl=60).get("x", probe) == 1
+    assert CapabilityRegistry(path=path, ttl=0).get("x", probe) == 2
+    registry.invalidate("x")
+    assert registry.get("x", probe) == 3
+    registry.invalidate()
+    assert CapabilityRegistry(path=path, ttl=60).get("x", probe) == 4
+
+    assert registry.has_command("sh")
+    assert not registry.has_command("conu-does-not-exist")
+    assert registry.command_result(["conu-does-not-exist"])[0] is None
+    assert registry.command_result(["sh", "-c", "echo hi; exit 3"]) == (3, "hi\n")
+    if os.path.exists("/sys/fs/selinux/enforce") or shutil.which("getenforce"):
+        assert registry.selinux_status() in ("Enforcing", "Permissive", "Disabled")
+    else:
+        with pytest.raises(CommandDoesNotExistException):
+            registry.selinux_status()
+
+
+def test_capability_registry_failures(tmpdir):
+    path = str(tmpdir.join("capabilities.json"))
+    registry = CapabilityRegistry(path=path, ttl=60)
+    flag = str(tmpdir.join("ready"))
+    cmd = ["sh", "-c", "test -e %s" % flag]
+    # e.g. a daemon which is still starting
+    assert registry.command_result(cmd)[0] == 1
+    open(flag, "w").close()
+    assert registry.command_result(cmd)[0] == 0
+    os.unlink(flag)
+    # success is cached
+    assert registry.command_result(cmd)[0] == 0
+
+    assert registry.get("y", lambda: False, cache_if=bool) is False
+    assert registry.get("y", lambda: True, cache_if=bool) is True
+    assert registry.get("y", lambda: False, cache_if=bool) is True
+    assert registry.command_result(["conu-does-not-exist"])[0] is None
+    assert sorted(CapabilityRegistry(path=path, ttl=60)._load()) == ["run:" + " ".join(cmd), "y"]